@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+import uproot
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.lines import Line2D
+
+from event_reader import add_reader_arguments, read_branches, tree_name
+from hist2d import Histogram2D
+from kinematics import four_vectors, pair_dr, pt
+from observables import gamma_slots
+from prefetch import Prefetcher, chunk_ranges
+from result_cache import cache_path
+from samples import discover_groups, file_label, rootfile_dir, sample_colors
+from validate import ValidationCache
+
+# Two-dimensional acceptance maps: fraction of events passing
+# "subleading photon pT > x and ΔR(γγ) > y" on a grid of (x, y) cuts. The
+# events are filled once into a fine 2D histogram (overflow in the last
+# bins); reversed 2D cumulative sums then give the passing events of every
+# grid cell at once, so each cut pair costs one array lookup.
+
+output_dir = "pic"
+plt.rcParams['xtick.labelsize'] = 20
+plt.rcParams['ytick.labelsize'] = 20
+
+# Cut grid: thresholds are the lower bin edges
+pt_cut_bins = (60, (0, 30))
+dr_cut_bins = (100, (0, 1))
+iso_efficiencies = [0.5, 0.7, 0.9]
+# Working point printed per mass point (the gamma_pt / gamma_dr cuts of cutflow.py)
+working_point = (5.0, 0.1)
+
+
+def new_histogram():
+    (x_bins, x_range), (y_bins, y_range) = pt_cut_bins, dr_cut_bins
+    return Histogram2D(np.linspace(x_range[0], x_range[1], x_bins + 1), np.linspace(y_range[0], y_range[1], y_bins + 1))
+
+
+def cut_values(branches, validated=()):
+    # Subleading photon pT and ΔR(γγ) of the 8 / 9 particle events; NaN without a second photon
+    p, _, _ = four_vectors(branches, validated)
+    gammas = p[:, gamma_slots]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pt(gammas).min(axis=1), pair_dr(gammas[:, 0], gammas[:, 1])
+
+
+def fill_file(file_path, chunk_size=100000, roles="fixed", validated=()):
+    # (Histogram2D, number of events) of one file; validated: ValidationCache.validated_branches of the file
+    with uproot.open(file_path) as file:
+        n_entries = file[tree_name].num_entries
+    hist = new_histogram()
+    prefetcher = Prefetcher(lambda r: read_branches(file_path, entry_start=r[0], entry_stop=r[1], roles=roles),
+                            chunk_ranges(n_entries, chunk_size))
+    for _, branches, error in prefetcher:
+        if error is not None:
+            raise error
+        gamma_pt, gamma_dr = cut_values(branches, validated)
+        # Overflow into the last bin: such events pass every cut of the grid
+        hist.fill(np.minimum(gamma_pt, hist.x_edges[-1]), np.minimum(gamma_dr, hist.y_edges[-1]))
+    return hist, n_entries
+
+
+def acceptance_map(hist, n_events):
+    # (n_x, n_y) fraction of all events with x >= x_edges[i] and y >= y_edges[j]
+    passing = hist.counts[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+    return passing / n_events if n_events > 0 else np.zeros_like(passing)
+
+
+def acceptance_at(acceptance, hist, x_cut, y_cut):
+    # Acceptance of one cut pair, rounded up to the next grid cut
+    i = min(np.searchsorted(hist.x_edges, x_cut), len(hist.x_edges) - 2)
+    j = min(np.searchsorted(hist.y_edges, y_cut), len(hist.y_edges) - 2)
+    return acceptance[i, j]
+
+
+def save_maps(path, maps):
+    # maps: {label: (Histogram2D, number of events)}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({label: {"events": n, "hist": hist.to_dict()} for label, (hist, n) in maps.items()}, f)
+    print(f"Saved acceptance histograms: {path}")
+
+
+def load_maps(path):
+    with open(path) as f:
+        return {label: (Histogram2D.from_dict(data["hist"]), data["events"]) for label, data in json.load(f).items()}
+
+
+def plot_acceptance(maps, output_filename):
+    # One heatmap page with iso-efficiency contours per mass point, then one contour of all mass points
+    colors = sample_colors(len(maps))
+    with PdfPages(os.path.join(output_dir, output_filename)) as pdf:
+        for label, (hist, n_events) in maps.items():
+            acceptance = acceptance_map(hist, n_events)
+            x_cuts, y_cuts = hist.x_edges[:-1], hist.y_edges[:-1]
+            fig, ax = plt.subplots(figsize=(10, 8))
+            mesh = ax.pcolormesh(x_cuts, y_cuts, acceptance.T, shading="nearest", cmap="viridis", vmin=0, vmax=1)
+            fig.colorbar(mesh, ax=ax).set_label("Acceptance", fontsize=20)
+            contours = ax.contour(x_cuts, y_cuts, acceptance.T, levels=iso_efficiencies, colors="white")
+            ax.clabel(contours, fontsize=14)
+            ax.set_title(label, fontsize=24)
+            ax.set_xlabel(r"subleading $\gamma$ pT cut (GeV)", fontsize=24)
+            ax.set_ylabel(r"$\Delta R(\gamma1, \gamma2)$ cut", fontsize=24)
+            plt.tight_layout()
+            pdf.savefig(fig)
+            plt.close(fig)
+        fig, ax = plt.subplots(figsize=(10, 8))
+        handles = []
+        for i, (label, (hist, n_events)) in enumerate(maps.items()):
+            acceptance = acceptance_map(hist, n_events)
+            if acceptance.max() >= iso_efficiencies[0]:
+                ax.contour(hist.x_edges[:-1], hist.y_edges[:-1], acceptance.T, levels=[iso_efficiencies[0]],
+                           colors=[colors[i]], linewidths=2.0)
+                handles.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=label))
+        ax.set_title(f"Acceptance = {iso_efficiencies[0]}", fontsize=24)
+        ax.set_xlabel(r"subleading $\gamma$ pT cut (GeV)", fontsize=24)
+        ax.set_ylabel(r"$\Delta R(\gamma1, \gamma2)$ cut", fontsize=24)
+        ax.legend(handles=handles, fontsize=14, handlelength=2, ncol=2)
+        plt.tight_layout()
+        pdf.savefig(fig)
+        plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    add_reader_arguments(parser)
+    args = parser.parse_args()
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    os.makedirs(output_dir, exist_ok=True)
+    validation = ValidationCache(args.campaign)
+    for group, file_list in discover_groups(base_path).items():
+        maps = {}
+        for filename in file_list:
+            file_path = os.path.join(base_path, filename)
+            try:
+                hist, n_events = fill_file(file_path, args.chunk_size, args.roles,
+                                           validation.validated_branches(file_path))
+            except Exception as e:
+                print(f"Error processing {filename}: {e}")
+                continue
+            maps[file_label(filename)] = (hist, n_events)
+            accepted = acceptance_at(acceptance_map(hist, n_events), hist, *working_point)
+            print(f"{file_label(filename)}: acceptance {accepted:.3f} at pT > {working_point[0]} GeV, "
+                  f"ΔR > {working_point[1]} ({n_events} events)")
+        if not maps:
+            continue
+        save_maps(cache_path(args.campaign, f"{group}_acceptance", fmt="json"), maps)
+        plot_acceptance(maps, f"acceptance_{group}.pdf")
+    validation.save()
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import uproot
+
+from event_reader import kinematic_branches, read_branches, tree_name
+from flat_store import source_stamp
+from observables import classify_leptons, event_counts, lepton_slots, pad_events, select_events
+from result_cache import cache_dir
+from samples import discover_files, file_label, rootfile_dir
+
+# Index of anomalous events per file: event number, anomaly category and a
+# key value, stored as a small .npz next to the histogram caches. Tools load
+# the index and read only those entries from the ROOT file by position
+# (consecutive entries in one range), instead of rescanning the file.
+#
+# Categories (value column):
+#   mismatched      branch lengths differ         (number of masses)
+#   multiplicity    not 8 or 9 particles          (number of particles)
+#   eight_particle  8 particles, no second photon (number of particles)
+#   unknown_lepton  lepton mass outside e/μ/τ      (lepton mass in GeV)
+
+categories = ["mismatched", "multiplicity", "eight_particle", "unknown_lepton"]
+
+
+def index_path(campaign, filename, directory=cache_dir):
+    return os.path.join(directory, campaign, "anomalies", f"{file_label(filename)}.npz")
+
+
+def build_index(branches, validated=()):
+    # -> {"event", "category", "value"} arrays sorted by event number; validated as in observables.event_counts
+    counts, consistent = event_counts(branches, validated)
+    selected = select_events(counts, consistent)
+    events, category, value = [], [], []
+
+    def add(name, event, values):
+        events.append(event)
+        category.append(np.full(len(event), categories.index(name), dtype=np.int8))
+        value.append(np.asarray(values, dtype=float))
+
+    add("mismatched", np.flatnonzero(~consistent), counts[~consistent])
+    other = consistent & ~selected
+    add("multiplicity", np.flatnonzero(other), counts[other])
+    eight = selected & (counts == 8)
+    add("eight_particle", np.flatnonzero(eight), counts[eight])
+    lepton_mass = pad_events(branches["mass"], counts, selected)[:, lepton_slots]
+    unknown = classify_leptons(lepton_mass) == -1
+    lepton_event = np.repeat(np.flatnonzero(selected)[:, None], len(lepton_slots), axis=1)
+    add("unknown_lepton", lepton_event[unknown], lepton_mass[unknown])
+
+    events = np.concatenate(events).astype(np.int64)
+    order = np.argsort(events, kind="stable")
+    return {"event": events[order], "category": np.concatenate(category)[order], "value": np.concatenate(value)[order]}
+
+
+def save_index(path, index, file_path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(path, **index, stamp=np.array(json.dumps(source_stamp(file_path))))
+
+
+def load_index(path, file_path=None):
+    # None if missing, or if file_path is given and has changed since the index was built
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if file_path is not None and json.loads(str(data["stamp"])) != source_stamp(file_path):
+            return None
+        return {key: data[key] for key in ("event", "category", "value")}
+
+
+def select(index, category=None):
+    # Event numbers of one category (all anomalies if None), without duplicates
+    mask = np.ones(len(index["event"]), dtype=bool) if category is None else index["category"] == categories.index(category)
+    return np.unique(index["event"][mask])
+
+
+def entry_ranges(events):
+    # Sorted event numbers -> [(start, stop)] ranges of consecutive entries
+    if len(events) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(events) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    stops = np.concatenate((breaks, [len(events)]))
+    return [(int(events[a]), int(events[b - 1]) + 1) for a, b in zip(starts, stops)]
+
+
+def extract_events(file_path, events, branches=kinematic_branches):
+    # {branch: object array} of only the given entries, read range by range
+    parts = [read_branches(file_path, branches, start, stop) for start, stop in entry_ranges(np.unique(events))]
+    if not parts:
+        return {branch: np.empty(0, dtype=object) for branch in branches}
+    extracted = {}
+    for branch in branches:
+        # Filled element by element: concatenating one-entry object arrays would stack them as 2D
+        extracted[branch] = np.empty(sum(len(part[branch]) for part in parts), dtype=object)
+        extracted[branch][:] = [event for part in parts for event in part[branch]]
+    return extracted
+
+
+def index_file(file_path, filename, campaign, branches=None, validated=()):
+    # Cached index if the file is unchanged, otherwise built and saved; branches: the file's
+    # read_branches dict if already in memory, validated as in observables.event_counts
+    index = load_index(index_path(campaign, filename), file_path)
+    if index is None:
+        index = build_index(read_branches(file_path) if branches is None else branches, validated)
+        save_index(index_path(campaign, filename), index, file_path)
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--show", default=None, help="print the anomalous events of this file (e.g. ALP_M5.root)")
+    parser.add_argument("--category", choices=categories, default=None, help="with --show: only this category")
+    parser.add_argument("--max-events", type=int, default=10)
+    args = parser.parse_args()
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    filenames = [args.show] if args.show else discover_files(base_path)
+    for filename in filenames:
+        file_path = os.path.join(base_path, filename)
+        try:
+            index = index_file(file_path, filename, args.campaign)
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+            continue
+        with uproot.open(file_path) as file:
+            n_events = file[tree_name].num_entries
+        summary = ", ".join(f"{np.sum(index['category'] == i)} {name}" for i, name in enumerate(categories))
+        print(f"{filename}: {n_events} events, {summary}")
+        if args.show:
+            events = select(index, args.category)[:args.max_events]
+            extracted = extract_events(file_path, events)
+            for k, event in enumerate(events):
+                rows = index["category"][index["event"] == event]
+                print(f"Event {event} ({', '.join(categories[c] for c in rows)}):")
+                for branch in kinematic_branches:
+                    print(f"  {branch}: {np.round(extracted[branch][k], 4)}")
@@ -0,0 +1,98 @@
+import argparse
+import os
+import zlib
+
+import numpy as np
+import uproot
+
+from event_reader import add_reader_arguments, read_branches, tree_name
+from hist_fill import fill_weighted
+from kinematics import event_observables
+from prefetch import Prefetcher, chunk_ranges
+from render import figure_filenames, render_group
+from result_cache import cache_path, save_results
+from samples import discover_groups, file_label, groups, observable_specs, rootfile_dir
+from validate import ValidationCache
+
+# Poisson-bootstrap uncertainty bands of the normalised ("A.U.") histograms.
+# Every event gets a row of Poisson(1) replica weights; the replica weight
+# matrix is filled together with the nominal weight in one pass per chunk
+# (hist_fill.fill_weighted), so hundreds of replicas cost about as much as a
+# few plain fills. The replica sums are stored with the histograms
+# ("replicas") and render.py draws the 16-84 % band of the replica shapes.
+
+n_replicas = 200
+chunk_size = 100000
+
+
+def replica_seed(label):
+    # Fixed per mass point, so bands are reproducible between runs
+    return zlib.crc32(label.encode())
+
+
+def bootstrap_file(file_path, label, specs, replicas=n_replicas, chunk=chunk_size, roles="fixed", validated=()):
+    # {observable: (nominal counts, replica sums (n_bins, replicas), entries)} of one file;
+    # validated: ValidationCache.validated_branches of the file
+    with uproot.open(file_path) as file:
+        n_entries = file[tree_name].num_entries
+    rng = np.random.default_rng(replica_seed(label))
+    sums = {name: 0.0 for name in specs}
+    entries = dict.fromkeys(specs, 0)
+    edges = {name: np.linspace(r[0], r[1], bins + 1) for name, (bins, r) in specs.items()}
+    prefetcher = Prefetcher(lambda r: read_branches(file_path, entry_start=r[0], entry_stop=r[1], roles=roles),
+                            chunk_ranges(n_entries, chunk))
+    for (start, stop), branches, error in prefetcher:
+        if error is not None:
+            raise error
+        observables, _ = event_observables(branches, validated)
+        # Column 0: nominal, columns 1..: replicas
+        weights = np.column_stack([np.ones(stop - start), rng.poisson(1.0, (stop - start, replicas))])
+        for name in specs:
+            values, event_index = observables[name]
+            sums[name] = sums[name] + fill_weighted(values, weights[event_index], edges[name])
+            entries[name] += int(np.isfinite(values).sum())
+    return {name: (sums[name][:, 0], sums[name][:, 1:], entries[name]) for name in specs}
+
+
+def bootstrap_results(base_path, file_list, specs, replicas=n_replicas, roles="fixed", validation=None):
+    # validation: ValidationCache, files with a clean verdict skip the per-event length check
+    results = {name: {"edges": np.linspace(r[0], r[1], bins + 1), "counts": {}, "entries": {}, "replicas": {}}
+               for name, (bins, r) in specs.items()}
+    for filename in file_list:
+        label = file_label(filename)
+        file_path = os.path.join(base_path, filename)
+        try:
+            validated = validation.validated_branches(file_path) if validation is not None else ()
+            filled = bootstrap_file(file_path, label, specs, replicas, roles=roles, validated=validated)
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+            continue
+        print(f"Processing {filename}: {replicas} replicas")
+        for name, (counts, replica_sums, entries) in filled.items():
+            results[name]["counts"][label] = counts
+            results[name]["replicas"][label] = replica_sums
+            results[name]["entries"][label] = entries
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--replicas", type=int, default=n_replicas)
+    add_reader_arguments(parser)
+    args = parser.parse_args()
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    validation = ValidationCache(args.campaign)
+    for group, file_list in discover_groups(base_path).items():
+        if not file_list:
+            continue
+        results = bootstrap_results(base_path, file_list, observable_specs(groups[group]["alp_mass_range"]),
+                                    args.replicas, args.roles, validation)
+        save_results(cache_path(args.campaign, f"{group}_bootstrap"), results,
+                     meta={"campaign": args.campaign, "group": group, "ma_range": groups[group]["ma_range"],
+                           "replicas": args.replicas})
+        render_group(results, figure_filenames(f"mass_distributions_{group}_bootstrap.pdf",
+                                               f"pt_distributions_{group}_bootstrap.pdf",
+                                               f"dr_distributions_{group}_bootstrap.pdf"))
+    validation.save()
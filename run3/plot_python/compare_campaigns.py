@@ -0,0 +1,127 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.lines import Line2D
+
+from hist_stats import chi2_test, ks_test
+from result_cache import cache_dir, cache_formats, cache_path, find_cache, load_results
+
+# Compare two or three campaigns (run2 / run2_zebing / run3) from their cached
+# histograms (written by plot_all_mass_pT_dR.py), without touching any events.
+# The first campaign is the reference of the ratio panels and the statistics.
+
+output_dir = "pic"
+campaign_colors = ['#1f77b4', '#d62728', '#2ca02c']
+ncols = 5
+
+
+def normalise(counts, edges):
+    total = counts.sum()
+    if total == 0:
+        return np.zeros(len(counts))
+    return counts / (total * np.diff(edges))
+
+
+def compare_statistics(campaign_results, campaigns):
+    # One row per (observable, mass point, campaign) against the reference campaign
+    rows = []
+    reference = campaign_results[campaigns[0]]
+    for name, hist in reference.items():
+        for label, ref_counts in hist["counts"].items():
+            for other in campaigns[1:]:
+                other_hist = campaign_results[other].get(name)
+                if other_hist is None or label not in other_hist["counts"]:
+                    continue
+                if not np.array_equal(hist["edges"], other_hist["edges"]):
+                    print(f"Warning: {name} has different binning in {campaigns[0]} and {other}, skipping.")
+                    continue
+                counts = other_hist["counts"][label]
+                chi2, ndf, chi2_p = chi2_test(ref_counts, counts)
+                ks_distance, ks_p = ks_test(ref_counts, counts)
+                rows.append({
+                    "observable": name, "mass_point": label,
+                    "reference": campaigns[0], "campaign": other,
+                    "chi2": chi2, "ndf": ndf, "chi2_ndf": chi2 / ndf if ndf > 0 else np.nan, "chi2_p": chi2_p,
+                    "ks_distance": ks_distance, "ks_p": ks_p,
+                })
+    return rows
+
+
+def plot_observable(pdf, name, campaign_results, campaigns, stats):
+    reference = campaign_results[campaigns[0]][name]
+    edges = reference["edges"]
+    labels = [label for label in reference["counts"]
+              if all(label in campaign_results[c].get(name, {}).get("counts", {}) for c in campaigns)]
+    if not labels:
+        return
+    nrows = (len(labels) + ncols - 1) // ncols
+    fig = plt.figure(figsize=(5 * ncols, 5 * nrows))
+    grid = fig.add_gridspec(2 * nrows, ncols, height_ratios=[3, 1] * nrows, hspace=0.05)
+    for k, label in enumerate(labels):
+        row, col = divmod(k, ncols)
+        ax = fig.add_subplot(grid[2 * row, col])
+        ax_ratio = fig.add_subplot(grid[2 * row + 1, col], sharex=ax)
+        ref_density = normalise(reference["counts"][label], edges)
+        for i, c in enumerate(campaigns):
+            density = normalise(campaign_results[c][name]["counts"][label], edges)
+            ax.hist(edges[:-1], bins=edges, weights=density, histtype='step', color=campaign_colors[i], linewidth=2.0)
+            if i > 0:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    ratio = np.where(ref_density > 0, density / ref_density, np.nan)
+                ax_ratio.stairs(ratio, edges, color=campaign_colors[i], linewidth=2.0)
+        text = [label]
+        for row_stats in stats:
+            if row_stats["observable"] == name and row_stats["mass_point"] == label:
+                text.append(f"{row_stats['campaign']}: χ²/ndf={row_stats['chi2_ndf']:.2f}, KS p={row_stats['ks_p']:.2f}")
+        ax.text(0.03, 0.97, "\n".join(text), transform=ax.transAxes, va="top", fontsize=10)
+        ax.set_ylabel("A.U.", fontsize=14)
+        ax.tick_params(labelbottom=False, labelsize=12)
+        ax_ratio.axhline(1.0, color="black", linewidth=1.0)
+        ax_ratio.set_ylim(0.5, 1.5)
+        ax_ratio.set_ylabel(f"/ {campaigns[0]}", fontsize=12)
+        ax_ratio.set_xlabel(name, fontsize=14)
+        ax_ratio.tick_params(labelsize=12)
+    handles = [Line2D([0], [0], color=campaign_colors[i], linewidth=2.0, label=c) for i, c in enumerate(campaigns)]
+    fig.legend(handles=handles, loc="upper center", ncol=len(campaigns), fontsize=16)
+    pdf.savefig(fig)
+    plt.close(fig)
+
+
+def compare_campaigns(campaigns, group, directory=cache_dir, formats=cache_formats):
+    campaign_results = {}
+    for c in campaigns:
+        # The campaigns may have been cached in different formats
+        path = find_cache(c, group, directory, formats) or cache_path(c, group, directory)
+        campaign_results[c], _ = load_results(path)
+    stats = compare_statistics(campaign_results, campaigns)
+
+    os.makedirs(output_dir, exist_ok=True)
+    stem = f"compare_{'_vs_'.join(campaigns)}_{group}"
+    with PdfPages(os.path.join(output_dir, f"{stem}.pdf")) as pdf:
+        for name in campaign_results[campaigns[0]]:
+            plot_observable(pdf, name, campaign_results, campaigns, stats)
+    with open(os.path.join(output_dir, f"{stem}_stats.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["observable", "mass_point", "reference", "campaign",
+                                               "chi2", "ndf", "chi2_ndf", "chi2_p", "ks_distance", "ks_p"])
+        writer.writeheader()
+        writer.writerows(stats)
+    print(f"Saved {stem}.pdf and {stem}_stats.csv ({len(stats)} comparisons)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("campaigns", nargs="+", help="two or three of run2, run2_zebing, run3 (first = reference)")
+    parser.add_argument("--group", action="append", help="mass-point group (default: ma_0p1_0p9 and ma_1_30)")
+    parser.add_argument("--cache-dir", default=cache_dir)
+    parser.add_argument("--format", choices=cache_formats, default=None,
+                        help="only use caches of this format (default: the first one found)")
+    args = parser.parse_args()
+    if not 2 <= len(args.campaigns) <= 3:
+        parser.error("give two or three campaigns")
+    for group in args.group or ["ma_0p1_0p9", "ma_1_30"]:
+        compare_campaigns(args.campaigns, group, args.cache_dir, [args.format] if args.format else cache_formats)
@@ -0,0 +1,238 @@
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+import uproot
+
+from event_reader import add_reader_arguments, read_branches, tree_name
+from hist_fill import fill_weighted
+from kinematics import eta, event_observables, four_vectors, pair_dr, pt
+from observables import gamma_slots, lepton_slots
+from prefetch import Prefetcher, chunk_ranges
+from render import add_output_arguments, configure_output, figure_filenames, finish_output, render_group
+from result_cache import cache_path, save_results
+from samples import discover_groups, file_label, groups, observable_specs, rootfile_dir
+from validate import ValidationCache
+
+# Generator-level cut flow. Every cut is evaluated once per chunk into one bit
+# of a per-event mask (bit 0: 8 / 9 particle event), so the sequential and
+# N-1 tables and the histograms after any subset of cuts only combine bits.
+# Histograms of several stages are filled in one pass: each stage is a 0 / 1
+# weight column of hist_fill.fill_weighted.
+
+output_dir = "pic"
+chunk_size = 100000
+
+# 截斷條件 {name: (quantity, min, max)}; None = 無限制, 依序套用
+cuts = {
+    "lepton_pt": ("lepton_min_pt", 10.0, None),
+    "lepton_eta": ("lepton_max_abs_eta", None, 2.5),
+    "gamma_pt": ("gamma_min_pt", 5.0, None),
+    "gamma_eta": ("gamma_max_abs_eta", None, 2.5),
+    "gamma_dr": ("gamma_dr", 0.1, None),
+    "lepton_dr": ("lepton_dr", 0.3, None),
+}
+preselection_bit = 1
+
+
+def load_cuts(path):
+    # JSON file {"name": [quantity, min, max], ...} (null = no limit), in cut order
+    with open(path) as f:
+        return {name: tuple(cut) for name, cut in json.load(f).items()}
+
+
+def cut_quantities(p):
+    # Per-event quantities the cuts can use; NaN (missing second photon) fails every cut
+    leptons, gammas = p[:, lepton_slots], p[:, gamma_slots]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "lepton_min_pt": pt(leptons).min(axis=1),
+            "lepton_max_abs_eta": np.abs(eta(leptons)).max(axis=1),
+            "gamma_min_pt": pt(gammas).min(axis=1),
+            "gamma_max_abs_eta": np.abs(eta(gammas)).max(axis=1),
+            "gamma_dr": pair_dr(gammas[:, 0], gammas[:, 1]),
+            "lepton_dr": pair_dr(leptons[:, 0], leptons[:, 1]),
+        }
+
+
+def cut_bit(name, cut_config=cuts):
+    return 1 << (list(cut_config).index(name) + 1)
+
+
+def required_bits(names, cut_config=cuts):
+    # Mask bits of preselection plus the given cuts
+    bits = preselection_bit
+    for name in names:
+        bits |= cut_bit(name, cut_config)
+    return bits
+
+
+def evaluate_cuts(n_events, p, event_index, cut_config=cuts):
+    # (n_events,) bit mask of all events of a chunk; unselected events only lack bit 0
+    mask = np.zeros(n_events, dtype=np.uint32)
+    passed = np.full(len(event_index), preselection_bit, dtype=np.uint32)
+    quantities = cut_quantities(p)
+    for name, (quantity, low, high) in cut_config.items():
+        values = quantities[quantity]
+        ok = np.isfinite(values)
+        if low is not None:
+            ok &= values > low
+        if high is not None:
+            ok &= values < high
+        passed[ok] |= cut_bit(name, cut_config)
+    mask[event_index] = passed
+    return mask
+
+
+def passes(mask, bits):
+    return (mask & bits) == bits
+
+
+def sequential_stages(cut_config=cuts):
+    # [(name, bits)]: preselection, then one cut more per row
+    names = list(cut_config)
+    return [("preselection", preselection_bit)] + [(name, required_bits(names[:i + 1], cut_config))
+                                                    for i, name in enumerate(names)]
+
+
+def n_minus_one_stages(cut_config=cuts):
+    # [(name, bits)]: all cuts except name
+    return [(name, required_bits([other for other in cut_config if other != name], cut_config))
+            for name in cut_config]
+
+
+def histogram_stages(cut_config=cuts):
+    # Stages available for histograms: preselection, all cuts and every N-1 selection
+    stages = {"preselection": preselection_bit, "selected": required_bits(cut_config, cut_config)}
+    stages.update({f"no_{name}": bits for name, bits in n_minus_one_stages(cut_config)})
+    return stages
+
+
+def count_stages(mask, stages):
+    return {name: int(passes(mask, bits).sum()) for name, bits in stages}
+
+
+def cutflow_file(file_path, specs, stages, cut_config=cuts, chunk=chunk_size, roles="fixed", validated=()):
+    # -> (sequential counts, N-1 counts, total events, {stage: {observable: (counts, entries)}});
+    # validated: ValidationCache.validated_branches of the file
+    with uproot.open(file_path) as file:
+        n_entries = file[tree_name].num_entries
+    sequential = {name: 0 for name, _ in sequential_stages(cut_config)}
+    n_minus_one = {name: 0 for name, _ in n_minus_one_stages(cut_config)}
+    all_stages = histogram_stages(cut_config)
+    stage_bits = np.array([all_stages[stage] for stage in stages], dtype=np.uint32)
+    edges = {name: np.linspace(r[0], r[1], bins + 1) for name, (bins, r) in specs.items()}
+    sums = {name: np.zeros((bins, len(stages))) for name, (bins, _) in specs.items()}
+    entries = {name: np.zeros(len(stages), dtype=np.int64) for name in specs}
+    prefetcher = Prefetcher(lambda r: read_branches(file_path, entry_start=r[0], entry_stop=r[1], roles=roles),
+                            chunk_ranges(n_entries, chunk))
+    for (start, stop), branches, error in prefetcher:
+        if error is not None:
+            raise error
+        p, _, event_index = four_vectors(branches, validated)
+        mask = evaluate_cuts(stop - start, p, event_index, cut_config)
+        for name, n in count_stages(mask, sequential_stages(cut_config)).items():
+            sequential[name] += n
+        for name, n in count_stages(mask, n_minus_one_stages(cut_config)).items():
+            n_minus_one[name] += n
+        if not stages:
+            continue
+        observables, _ = event_observables(branches, validated)
+        for name in specs:
+            values, value_event = observables[name]
+            # One 0 / 1 weight column per stage
+            weights = passes(mask[value_event][:, None], stage_bits[None, :]).astype(float)
+            sums[name] += fill_weighted(values, weights, edges[name])
+            entries[name] += (np.isfinite(values)[:, None] & (weights > 0)).sum(axis=0)
+    filled = {stage: {name: (sums[name][:, i], int(entries[name][i])) for name in specs}
+              for i, stage in enumerate(stages)}
+    return sequential, n_minus_one, n_entries, filled
+
+
+def cutflow_rows(label, sequential, n_minus_one, n_events):
+    # Sequential table (efficiency relative to the previous row and to all events) and N-1 table
+    rows, previous = [], n_events
+    for name, n in sequential.items():
+        rows.append({"mass_point": label, "table": "sequential", "cut": name, "events": n,
+                     "efficiency": n / previous if previous else np.nan,
+                     "cumulative_efficiency": n / n_events if n_events else np.nan})
+        previous = n
+    selected = list(sequential.values())[-1]
+    for name, n in n_minus_one.items():
+        # Efficiency of the cut on events passing all other cuts
+        rows.append({"mass_point": label, "table": "n-1", "cut": name, "events": n,
+                     "efficiency": selected / n if n else np.nan,
+                     "cumulative_efficiency": n / n_events if n_events else np.nan})
+    return rows
+
+
+def export_cutflow(rows, output_filename):
+    with open(os.path.join(output_dir, output_filename), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def cutflow_group(base_path, file_list, specs, stages, cut_config=cuts, roles="fixed", validation=None):
+    # -> (table rows, {stage: histogram results}); validation: ValidationCache, files with a clean
+    # verdict skip the per-event length check
+    rows = []
+    results = {stage: {name: {"edges": np.linspace(r[0], r[1], bins + 1), "counts": {}, "entries": {}}
+                       for name, (bins, r) in specs.items()} for stage in stages}
+    for filename in file_list:
+        label = file_label(filename)
+        file_path = os.path.join(base_path, filename)
+        try:
+            validated = validation.validated_branches(file_path) if validation is not None else ()
+            sequential, n_minus_one, n_events, filled = cutflow_file(file_path, specs, stages, cut_config,
+                                                                     roles=roles, validated=validated)
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+            continue
+        print(f"{label}: " + " -> ".join(f"{name} {n}" for name, n in sequential.items())
+              + f" ({n_events} events)")
+        rows += cutflow_rows(label, sequential, n_minus_one, n_events)
+        for stage, histograms in filled.items():
+            for name, (counts, n) in histograms.items():
+                results[stage][name]["counts"][label] = counts
+                results[stage][name]["entries"][label] = n
+    return rows, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--cuts", default=None, help="JSON file of cuts (default: cutflow.cuts)")
+    parser.add_argument("--stages", nargs="*", default=["selected"],
+                        help="histogram stages: preselection, selected or no_<cut> (N-1)")
+    add_output_arguments(parser)
+    add_reader_arguments(parser)
+    args = parser.parse_args()
+    configure_output(args)
+    cut_config = load_cuts(args.cuts) if args.cuts else cuts
+    unknown = set(args.stages) - set(histogram_stages(cut_config))
+    if unknown:
+        parser.error(f"unknown stages {sorted(unknown)}, choose from {list(histogram_stages(cut_config))}")
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    os.makedirs(output_dir, exist_ok=True)
+    validation = ValidationCache(args.campaign)
+    for group, file_list in discover_groups(base_path).items():
+        if not file_list:
+            continue
+        rows, results = cutflow_group(base_path, file_list, observable_specs(groups[group]["alp_mass_range"]),
+                                      args.stages, cut_config, args.roles, validation)
+        if rows:
+            export_cutflow(rows, f"cutflow_{args.campaign}_{group}.csv")
+            print(f"Saved cutflow_{args.campaign}_{group}.csv")
+        for stage, stage_results in results.items():
+            save_results(cache_path(args.campaign, f"{group}_{stage}"), stage_results,
+                         meta={"campaign": args.campaign, "group": group, "ma_range": groups[group]["ma_range"],
+                               "stage": stage, "cuts": {name: list(cut) for name, cut in cut_config.items()}})
+            render_group(stage_results, figure_filenames(f"mass_distributions_{group}_{stage}.pdf",
+                                                         f"pt_distributions_{group}_{stage}.pdf",
+                                                         f"dr_distributions_{group}_{stage}.pdf"))
+    validation.save()
+    finish_output()
@@ -0,0 +1,191 @@
+import math
+
+import numpy as np
+
+from observables import electron_mass_range, muon_mass_range, tau_mass_range
+
+try:
+    from numba import njit
+    have_numba = True
+except ImportError:  # fall back to the same kernels run by the interpreter
+    have_numba = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+# Compiled version of the per-event loops of plot_mass_and_pt_distributions
+# (plot_all_mass_pT_dR.py) and plot_gamma_dr_events_and_bins (plot_dR_effi.py).
+# The kernels work on the flat representation (offsets + values per branch)
+# and keep the loops' branching (8 / 9 particles, lepton flavour by mass), so
+# their output is identical to the Python path. Without numba the kernels run
+# as plain Python.
+
+# Event status codes of the kernels
+status_nine, status_eight, status_mismatch, status_other = 0, 1, 2, 3
+# Lepton flavour codes
+flavour_unknown, flavour_electron, flavour_muon, flavour_tau = -1, 0, 1, 2
+
+
+def flatten(jagged, offsets=None):
+    # Object array of per-event arrays (library="np") -> (offsets, values); offsets: known offsets
+    # of a branch with the same per-event lengths, which are then not counted again
+    if offsets is None:
+        counts = np.fromiter((len(event) for event in jagged), dtype=np.int64, count=len(jagged))
+        offsets = np.zeros(len(jagged) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+    values = np.concatenate(jagged).astype(np.float64) if len(jagged) else np.zeros(0)
+    return offsets, values
+
+
+@njit(cache=True)
+def pseudo_rapidity(px, py, pz):
+    # As TVector3::PseudoRapidity
+    p = math.sqrt(px * px + py * py + pz * pz)
+    cos_theta = pz / p if p != 0.0 else 1.0
+    if cos_theta * cos_theta < 1.0:
+        return -0.5 * math.log((1.0 - cos_theta) / (1.0 + cos_theta))
+    if pz == 0.0:
+        return 0.0
+    return 10e10 if pz > 0 else -10e10
+
+
+@njit(cache=True)
+def delta_r(px1, py1, pz1, px2, py2, pz2):
+    # As TLorentzVector::DeltaR (Δφ folded into [-π, π))
+    deta = pseudo_rapidity(px1, py1, pz1) - pseudo_rapidity(px2, py2, pz2)
+    dphi = math.atan2(py1, px1) - math.atan2(py2, px2)
+    while dphi >= math.pi:
+        dphi -= 2.0 * math.pi
+    while dphi < -math.pi:
+        dphi += 2.0 * math.pi
+    return math.sqrt(deta * deta + dphi * dphi)
+
+
+@njit(cache=True)
+def lepton_flavour(mass, e_low, e_high, mu_low, mu_high, tau_low, tau_high):
+    if tau_low <= mass <= tau_high:
+        return 2
+    mass_mev = mass * 1000
+    if e_low <= mass_mev <= e_high:
+        return 0
+    if mu_low <= mass_mev <= mu_high:
+        return 1
+    return -1
+
+
+@njit(cache=True)
+def mass_pt_kernel(o_m, o_px, o_py, o_pz, o_e, m, px, py, pz, ranges,
+                   status, boson_mass, boson_pt, lepton_mass, lepton_pt, flavour, gamma_mass, gamma_pt, gamma_dr, lepton_dr):
+    # Per event i: boson_* (i, 0..2) = Higgs / ALP / Z, lepton_* / flavour (i, 0..1),
+    # gamma_* (i, 0..1), gamma_dr / lepton_dr (i)
+    for i in range(len(status)):
+        n = o_m[i + 1] - o_m[i]
+        if (o_px[i + 1] - o_px[i] != n or o_py[i + 1] - o_py[i] != n
+                or o_pz[i + 1] - o_pz[i] != n or o_e[i + 1] - o_e[i] != n):
+            status[i] = 2
+            continue
+        if n != 8 and n != 9:
+            status[i] = 3
+            continue
+        status[i] = 0 if n == 9 else 1
+        b_m, b_p = o_m[i], o_px[i]
+        for k in range(3):
+            boson_mass[i, k] = m[b_m + 2 + k]
+            boson_pt[i, k] = math.sqrt(px[b_p + 2 + k] ** 2 + py[o_py[i] + 2 + k] ** 2)
+        for k in range(2):
+            mass = m[b_m + 5 + k]
+            lepton_mass[i, k] = mass
+            lepton_pt[i, k] = math.sqrt(px[b_p + 5 + k] ** 2 + py[o_py[i] + 5 + k] ** 2)
+            flavour[i, k] = lepton_flavour(mass, ranges[0], ranges[1], ranges[2], ranges[3], ranges[4], ranges[5])
+        gamma_mass[i, 0] = m[b_m + 7]
+        gamma_pt[i, 0] = math.sqrt(px[b_p + 7] ** 2 + py[o_py[i] + 7] ** 2)
+        if n == 9:
+            gamma_mass[i, 1] = m[b_m + 8]
+            gamma_pt[i, 1] = math.sqrt(px[b_p + 8] ** 2 + py[o_py[i] + 8] ** 2)
+            gamma_dr[i] = delta_r(px[b_p + 7], py[o_py[i] + 7], pz[o_pz[i] + 7],
+                                  px[b_p + 8], py[o_py[i] + 8], pz[o_pz[i] + 8])
+        else:
+            gamma_mass[i, 1] = 0.0
+            gamma_pt[i, 1] = 0.0
+            gamma_dr[i] = np.nan
+        if flavour[i, 0] == flavour[i, 1] and (flavour[i, 0] == 0 or flavour[i, 0] == 1):
+            lepton_dr[i] = delta_r(px[b_p + 5], py[o_py[i] + 5], pz[o_pz[i] + 5],
+                                   px[b_p + 6], py[o_py[i] + 6], pz[o_pz[i] + 6])
+
+
+@njit(cache=True)
+def gamma_dr_kernel(o_px, o_py, o_pz, px, py, pz, status, gamma_dr):
+    # plot_dR_effi.py: only the px multiplicity decides (8 / 9 particles)
+    for i in range(len(status)):
+        n = o_px[i + 1] - o_px[i]
+        if n != 8 and n != 9:
+            status[i] = 3
+            continue
+        status[i] = 0 if n == 9 else 1
+        if n == 9:
+            gamma_dr[i] = delta_r(px[o_px[i] + 7], py[o_py[i] + 7], pz[o_pz[i] + 7],
+                                  px[o_px[i] + 8], py[o_py[i] + 8], pz[o_pz[i] + 8])
+        else:
+            gamma_dr[i] = np.nan
+
+
+def jit_observables(masses, px, py, pz, energy, validated=()):
+    # Same (observables, summary) as observables.extract_observables, from the kernel; validated as in
+    # observables.event_counts: the validated branches share the offsets of the first one
+    branches = {"mass": masses, "px": px, "py": py, "pz": pz, "energy": energy}
+    flat, known = {}, None
+    for name, jagged in branches.items():
+        flat[name] = flatten(jagged, known if name in validated else None)
+        if name in validated and known is None:
+            known = flat[name][0]
+    (o_m, v_m), (o_px, v_px), (o_py, v_py), (o_pz, v_pz), (o_e, _) = flat.values()
+    n = len(o_m) - 1
+    status = np.full(n, -1, dtype=np.int64)
+    boson_mass, boson_pt = np.full((n, 3), np.nan), np.full((n, 3), np.nan)
+    lepton_mass, lepton_pt = np.full((n, 2), np.nan), np.full((n, 2), np.nan)
+    flavour = np.full((n, 2), flavour_unknown, dtype=np.int64)
+    gamma_mass, gamma_pt = np.full((n, 2), np.nan), np.full((n, 2), np.nan)
+    gamma_dr, lepton_dr = np.full(n, np.nan), np.full(n, np.nan)
+    ranges = np.array(electron_mass_range + muon_mass_range + tau_mass_range, dtype=np.float64)
+    mass_pt_kernel(o_m, o_px, o_py, o_pz, o_e, v_m, v_px, v_py, v_pz, ranges,
+                   status, boson_mass, boson_pt, lepton_mass, lepton_pt, flavour, gamma_mass, gamma_pt, gamma_dr, lepton_dr)
+
+    selected = (status == status_nine) | (status == status_eight)
+    event_index = np.flatnonzero(selected)
+    observables = {}
+    for k, name in enumerate(["higgs", "alp", "z"]):
+        observables[f"{name}_mass"] = (boson_mass[selected, k], event_index)
+        observables[f"{name}_pt"] = (boson_pt[selected, k], event_index)
+    lepton_event = np.repeat(event_index[:, None], 2, axis=1)
+    for name, code, scale in [("electron", flavour_electron, 1000), ("muon", flavour_muon, 1000), ("tau", flavour_tau, 1)]:
+        is_flavour = flavour[selected] == code
+        observables[f"{name}_mass"] = (lepton_mass[selected][is_flavour] * scale, lepton_event[is_flavour])
+        observables[f"{name}_pt"] = (lepton_pt[selected][is_flavour], lepton_event[is_flavour])
+    observables["gamma_mass"] = (gamma_mass[selected].ravel(), lepton_event.ravel())
+    observables["gamma_pt"] = (gamma_pt[selected].ravel(), lepton_event.ravel())
+    observables["gamma_dr"] = (gamma_dr[selected], event_index)
+    for name, code in [("electron", flavour_electron), ("muon", flavour_muon)]:
+        same_flavour = (flavour[selected, 0] == code) & (flavour[selected, 1] == code)
+        observables[f"{name}_dr"] = (lepton_dr[selected][same_flavour], event_index[same_flavour])
+    observables["gamma_dr_zoom"] = observables["gamma_dr"]
+    summary = {
+        "total_events": n,
+        "skipped_events": int(n - selected.sum()),
+        "mismatched_events": int((status == status_mismatch).sum()),
+        "eight_particle_events": int((status == status_eight).sum()),
+        "unknown_lepton_count": int((flavour[selected] == flavour_unknown).sum()),
+    }
+    return observables, summary
+
+
+def jit_gamma_dr(px, py, pz):
+    # gamma_dr of the 8 / 9 particle events (NaN for 8) and the number of skipped events
+    (o_px, v_px), (o_py, v_py), (o_pz, v_pz) = [flatten(b) for b in (px, py, pz)]
+    n = len(o_px) - 1
+    status = np.full(n, -1, dtype=np.int64)
+    gamma_dr = np.full(n, np.nan)
+    gamma_dr_kernel(o_px, o_py, o_pz, v_px, v_py, v_pz, status, gamma_dr)
+    selected = (status == status_nine) | (status == status_eight)
+    return gamma_dr[selected], int(n - selected.sum())
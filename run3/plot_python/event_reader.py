@@ -0,0 +1,61 @@
+import numpy as np
+import uproot
+
+from topology import topology_branches
+
+# Reading of the "events" tree written by LHEReader.py
+tree_name = "events"
+kinematic_branches = ["mass", "px", "py", "pz", "energy"]
+
+# Particle roles of the observables: "fixed" instance positions (2 = Higgs,
+# 3 = ALP, ...) or "resolved" from the pdgid / mother1 columns (topology.py).
+# With roles="resolved" read_branches also reads the topology branches, and
+# kinematics.four_vectors / event_observables place every particle by its role.
+role_choices = ["fixed", "resolved"]
+
+# LHE event weights: nominal XWGTUP and the <rwgt> scale / PDF variations,
+# stored as one entry per variation in the same order for every event.
+weight_branch = "weight"
+variation_branch = "weights"
+
+
+def event_branches(roles="fixed"):
+    # Branches read for the observables with the given particle roles
+    return kinematic_branches + topology_branches if roles == "resolved" else kinematic_branches
+
+
+def add_reader_arguments(parser):
+    parser.add_argument("--roles", choices=role_choices, default="fixed",
+                        help="particle roles: fixed instance positions or resolved from pdgid / mother1")
+
+
+def read_branches(file_path, branches=None, entry_start=None, entry_stop=None, roles="fixed"):
+    # branches: default event_branches(roles)
+    branches = event_branches(roles) if branches is None else branches
+    with uproot.open(file_path) as file:
+        tree = file[tree_name]
+        return {
+            branch: tree[branch].array(library="np", entry_start=entry_start, entry_stop=entry_stop)
+            for branch in branches
+        }
+
+
+def read_weights(file_path, entry_start=None, entry_stop=None):
+    # Dense weight matrix (n_events, 1 + n_variations); column 0 is the nominal weight.
+    # Files without weight branches get unit nominal weights and no variations.
+    with uproot.open(file_path) as file:
+        tree = file[tree_name]
+        n_events = tree.num_entries
+        start = 0 if entry_start is None else entry_start
+        stop = n_events if entry_stop is None else min(entry_stop, n_events)
+        n_events = max(stop - start, 0)
+        if weight_branch in tree.keys():
+            nominal = tree[weight_branch].array(library="np", entry_start=start, entry_stop=stop).astype(float)
+        else:
+            nominal = np.ones(n_events)
+        if variation_branch in tree.keys() and n_events > 0:
+            variations = tree[variation_branch].array(library="np", entry_start=start, entry_stop=stop)
+            variations = np.stack(variations).astype(float)
+        else:
+            variations = np.empty((n_events, 0))
+    return np.column_stack([nominal, variations])
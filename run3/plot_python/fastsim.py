@@ -0,0 +1,195 @@
+import argparse
+import os
+import time
+import zlib
+
+import numpy as np
+import matplotlib.pyplot as plt
+import uproot
+
+from event_reader import add_reader_arguments, read_branches, tree_name
+from kinematics import E, PX, PY, PZ, eta, four_vectors, mass, mass_squared, pair_dr, phi, pt, system
+from observables import gamma_slots, lepton_slots
+from prefetch import Prefetcher, chunk_ranges
+from render import add_output_arguments, configure_output, finish_output, render_group, save_figure
+from result_cache import cache_path, histogram_results, merge_results, save_results
+from samples import discover_groups, file_label, groups, mass_from_label, rootfile_dir
+from validate import ValidationCache
+
+# Fast detector simulation of the LHE final state: Gaussian smearing of the
+# energy, η and φ of the leptons and photons, then the two photons are merged
+# into one object when their smeared ΔR is below merge_dr (a single
+# calorimeter cluster). All events of a chunk are smeared at once on the
+# (n_events, n_slots, 4) arrays of kinematics.py. The random stream of a chunk
+# depends only on (seed, mass point, first entry), so every shard can be
+# simulated separately and reproduces the same events as a full run with the
+# same chunk size.
+
+output_dir = "pic"
+chunk_size = 200000
+seed = 2024
+
+# 解析度: σ(E)/E = stochastic/√E ⊕ constant, σ(η), σ(φ)
+resolutions = {
+    "gamma": {"slots": gamma_slots, "stochastic": 0.03, "constant": 0.005, "eta": 0.003, "phi": 0.003},
+    "lepton": {"slots": lepton_slots, "stochastic": 0.0, "constant": 0.01, "eta": 0.0005, "phi": 0.0005},
+}
+merge_dr = 0.02  # ~ one ECAL crystal
+
+# 重建後的觀測量 (bins, range); smeared_gg_mass 的範圍依分組而定 (alp_mass_range)
+fastsim_hist_specs = {
+    "smeared_gamma_pt": (25, (0, 30)),
+    "smeared_gamma_dr": (25, (0, 1)),
+    "smeared_ll_mass": (25, (70, 110)),
+    "smeared_llgg_mass": (50, (110, 140)),
+    "reco_photons": (2, (0.5, 2.5)),
+}
+
+
+def fastsim_specs(alp_mass_range):
+    return dict(fastsim_hist_specs, smeared_gg_mass=(100, alp_mass_range))
+
+
+def shard_rng(label, entry_start, base_seed=seed):
+    return np.random.default_rng([base_seed, zlib.crc32(label.encode()), entry_start])
+
+
+def smear(p, slots, resolution, rng):
+    # Smeared copy of p (n_events, n_slots, 4); the particle masses are kept.
+    # Random numbers are drawn for every event (also NaN slots), so the stream
+    # does not depend on the event content
+    smeared = p.copy()
+    particles = p[:, slots]
+    noise = rng.standard_normal((len(p), len(slots), 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        energy = particles[..., E]
+        sigma = np.hypot(resolution["stochastic"] / np.sqrt(energy), resolution["constant"])
+        energy = np.maximum(energy * (1 + sigma * noise[..., 0]), 0)
+        particle_eta = eta(particles) + resolution["eta"] * noise[..., 1]
+        particle_phi = phi(particles) + resolution["phi"] * noise[..., 2]
+        momentum = np.sqrt(np.maximum(energy ** 2 - np.maximum(mass_squared(particles), 0), 0))
+    smeared[:, slots, E] = energy
+    smeared[:, slots, PX] = momentum * np.cos(particle_phi) / np.cosh(particle_eta)
+    smeared[:, slots, PY] = momentum * np.sin(particle_phi) / np.cosh(particle_eta)
+    smeared[:, slots, PZ] = momentum * np.tanh(particle_eta)
+    return smeared
+
+
+def merge_photons(p, threshold=merge_dr):
+    # (photons (n_events, 2, 4), merged) with the second photon NaN where the pair was merged
+    g1, g2 = p[:, gamma_slots[0]], p[:, gamma_slots[1]]
+    with np.errstate(invalid="ignore"):
+        merged = pair_dr(g1, g2) < threshold
+    photons = np.stack([np.where(merged[:, None], g1 + g2, g1), np.where(merged[:, None], np.nan, g2)], axis=1)
+    return photons, merged
+
+
+def fastsim_observables(p, event_index, rng, threshold=merge_dr):
+    # {name: (values, event_index)} of the smeared / merged events
+    for resolution in resolutions.values():
+        p = smear(p, resolution["slots"], resolution, rng)
+    photons, merged = merge_photons(p, threshold)
+    has_pair = np.isfinite(p[:, gamma_slots[1], E])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        photon_sum = np.where(np.isfinite(photons), photons, 0.0).sum(axis=1)
+        leptons = system(p, lepton_slots)
+        photon_event = np.repeat(event_index[:, None], 2, axis=1).ravel()
+        return {
+            "smeared_gamma_pt": (pt(photons).ravel(), photon_event),
+            "smeared_gamma_dr": (np.where(has_pair & ~merged, pair_dr(photons[:, 0], photons[:, 1]), np.nan),
+                                 event_index),
+            "smeared_gg_mass": (np.where(has_pair, mass(photon_sum), np.nan), event_index),
+            "smeared_ll_mass": (mass(leptons), event_index),
+            "smeared_llgg_mass": (np.where(has_pair, mass(leptons + photon_sum), np.nan), event_index),
+            # 1 = merged, 2 = resolved; NaN for events with a single photon in the LHE record
+            "reco_photons": (np.where(has_pair, np.where(merged, 1.0, 2.0), np.nan), event_index),
+        }
+
+
+def fastsim_file(file_path, label, specs, chunk=chunk_size, threshold=merge_dr, base_seed=seed, roles="fixed",
+                 validated=()):
+    # Histogram results of one file, chunk by chunk with one random stream per chunk;
+    # validated: ValidationCache.validated_branches of the file
+    with uproot.open(file_path) as file:
+        n_entries = file[tree_name].num_entries
+    results_list = []
+    seconds = 0.0
+    prefetcher = Prefetcher(lambda r: read_branches(file_path, entry_start=r[0], entry_stop=r[1], roles=roles),
+                            chunk_ranges(n_entries, chunk))
+    for (start, _), branches, error in prefetcher:
+        if error is not None:
+            raise error
+        begin = time.perf_counter()
+        p, _, event_index = four_vectors(branches, validated)
+        observables = fastsim_observables(p, event_index, shard_rng(label, start, base_seed), threshold)
+        results_list.append(histogram_results({name: [observables[name][0]] for name in specs}, [label], specs))
+        seconds += time.perf_counter() - begin
+    return merge_results(results_list), n_entries, seconds
+
+
+def merged_fraction(results, label):
+    # Fraction of the two-photon events reconstructed as one photon
+    counts = results["reco_photons"]["counts"][label]
+    total = counts.sum()
+    return counts[0] / total if total > 0 else np.nan
+
+
+def plot_merged_fraction(results, output_filename):
+    labels = list(results["reco_photons"]["counts"])
+    masses = [mass_from_label(label) for label in labels]
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(masses, [merged_fraction(results, label) for label in labels], marker='o', linewidth=2.0,
+            markersize=6, label="merged")
+    ax.plot(masses, [1 - merged_fraction(results, label) for label in labels], marker='s', linewidth=2.0,
+            markersize=6, label="resolved")
+    ax.set_xscale("log")
+    ax.set_xlabel("ALP Mass (GeV)", fontsize=24)
+    ax.set_ylabel("Fraction", fontsize=24)
+    ax.set_ylim(0, 1.05)
+    ax.legend(fontsize=14)
+    ax.grid(True)
+    plt.tight_layout()
+    save_figure(fig, output_filename)
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--merge-dr", type=float, default=merge_dr, help="merge photon pairs below this ΔR")
+    parser.add_argument("--seed", type=int, default=seed)
+    parser.add_argument("--chunk-size", type=int, default=chunk_size)
+    add_output_arguments(parser)
+    add_reader_arguments(parser)
+    args = parser.parse_args()
+    configure_output(args)
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    os.makedirs(output_dir, exist_ok=True)
+    validation = ValidationCache(args.campaign)
+    for group, file_list in discover_groups(base_path).items():
+        specs = fastsim_specs(groups[group]["alp_mass_range"])
+        results_list = []
+        for filename in file_list:
+            label = file_label(filename)
+            file_path = os.path.join(base_path, filename)
+            try:
+                results, n_events, seconds = fastsim_file(file_path, label, specs, args.chunk_size, args.merge_dr,
+                                                          args.seed, args.roles,
+                                                          validation.validated_branches(file_path))
+            except Exception as e:
+                print(f"Error processing {filename}: {e}")
+                continue
+            results_list.append(results)
+            print(f"{label}: {n_events} events smeared in {seconds:.2f} s, "
+                  f"merged fraction {merged_fraction(results, label):.3f}")
+        if not results_list:
+            continue
+        results = merge_results(results_list)
+        save_results(cache_path(args.campaign, f"{group}_fastsim"), results,
+                     meta={"campaign": args.campaign, "group": group, "ma_range": groups[group]["ma_range"],
+                           "seed": args.seed, "merge_dr": args.merge_dr, "chunk_size": args.chunk_size})
+        render_group(results, {"fastsim": f"fastsim_distributions_{group}.pdf"})
+        plot_merged_fraction(results, f"fastsim_merged_fraction_{group}.pdf")
+    validation.save()
+    finish_output()
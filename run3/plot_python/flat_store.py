@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import awkward as ak
+import uproot
+
+from event_reader import tree_name, variation_branch, weight_branch
+from samples import discover_groups, groups, rootfile_dir
+
+# Flat-array intermediate format of one ROOT file.
+#
+# <store>/meta.json            branches, dtypes, number of events, source file stamp
+# <store>/<branch>.values.npy  all values of the branch, contiguous and typed
+# <store>/<branch>.offsets.npy int64 offsets (n_events + 1) of a jagged branch;
+#                              branches with identical offsets share one file
+#
+# Stores are opened with np.load(mmap_mode="r"): nothing is read until used and
+# parallel workers share the same page cache pages (zero copies).
+
+store_dir = "flat"
+
+
+def store_path(campaign, filename, directory=store_dir):
+    return os.path.join(directory, campaign, filename.replace(".root", ""))
+
+
+def source_stamp(file_path):
+    stat = os.stat(file_path)
+    return {"path": os.path.abspath(file_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def flatten(array):
+    # (values, offsets) of an awkward branch array; offsets None for one value per event
+    if array.ndim > 1:
+        counts = ak.to_numpy(ak.num(array)).astype(np.int64)
+        return ak.to_numpy(ak.flatten(array)), np.concatenate(([0], np.cumsum(counts)))
+    return ak.to_numpy(array), None
+
+
+def read_flat(file_path, branches, entry_start=None, entry_stop=None):
+    # {branch: (values, offsets)} read straight into the store layout, without per-event arrays
+    with uproot.open(file_path) as file:
+        tree = file[tree_name]
+        return {branch: flatten(tree[branch].array(library="ak", entry_start=entry_start, entry_stop=entry_stop))
+                for branch in branches}
+
+
+def convert(file_path, path, branches=None, float32=False):
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        os.remove(os.path.join(path, "meta.json"))
+    meta = {"source": source_stamp(file_path), "float32": float32, "branches": {}}
+    written_offsets = {}
+    with uproot.open(file_path) as file:
+        tree = file[tree_name]
+        meta["n_events"] = tree.num_entries
+        for branch in branches or tree.keys():
+            values, offsets = flatten(tree[branch].array(library="ak"))
+            if offsets is not None:
+                shared = next((name for name, o in written_offsets.items() if np.array_equal(o, offsets)), None)
+                if shared is None:
+                    np.save(os.path.join(path, f"{branch}.offsets.npy"), offsets)
+                    written_offsets[branch] = offsets
+                    shared = branch
+            else:
+                shared = None
+            if float32 and values.dtype == np.float64:
+                values = values.astype(np.float32)
+            np.save(os.path.join(path, f"{branch}.values.npy"), np.ascontiguousarray(values))
+            meta["branches"][branch] = {"dtype": values.dtype.str, "offsets": shared}
+    # meta.json is written last: a store without it is incomplete
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    return FlatStore(path)
+
+
+class FlatStore:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.n_events = self.meta["n_events"]
+        self.branches = list(self.meta["branches"])
+        self._cache = {}
+
+    def _load(self, name):
+        if name not in self._cache:
+            self._cache[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+        return self._cache[name]
+
+    def values(self, branch):
+        return self._load(f"{branch}.values")
+
+    def offsets(self, branch):
+        shared = self.meta["branches"][branch]["offsets"]
+        if shared is None:
+            return None
+        return self._load(f"{shared}.offsets")
+
+    def counts(self, branch):
+        # Values per event of a jagged branch
+        offsets = self.offsets(branch)
+        if offsets is None:
+            raise ValueError(f"Branch {branch} of {self.path} has one value per event, no per-event counts")
+        return np.diff(offsets)
+
+    def padded(self, branch, width, fill=np.nan, selected=None):
+        # (n_events, width) array of the events (or the selected ones), padded with fill
+        counts = self.counts(branch)
+        offsets = self.offsets(branch)
+        if selected is None:
+            selected = np.ones(len(counts), dtype=bool)
+        padded = np.full((int(selected.sum()), width), fill)
+        index = offsets[:-1][selected][:, None] + np.arange(width)
+        inside = np.arange(width) < np.minimum(counts[selected], width)[:, None]
+        padded[inside] = self.values(branch)[index[inside]]
+        return padded
+
+    def jagged(self, branch):
+        # Same object array of per-event arrays as tree[branch].array(library="np")
+        values = self.values(branch)
+        offsets = self.offsets(branch)
+        if offsets is None:
+            return np.asarray(values)
+        result = np.empty(len(offsets) - 1, dtype=object)
+        result[:] = np.split(np.asarray(values), offsets[1:-1])
+        return result
+
+    def is_current(self, file_path):
+        stamp = source_stamp(file_path)
+        return all(self.meta["source"][key] == stamp[key] for key in ("size", "mtime"))
+
+
+class ArrayStore(FlatStore):
+    # In-memory store of {branch: (values, offsets)} (as read_flat), with the FlatStore interface
+    def __init__(self, arrays, n_events):
+        self.path = "<memory>"
+        self.meta = {"n_events": n_events, "float32": False,
+                     "branches": {branch: {"dtype": values.dtype.str, "offsets": None if offsets is None else branch}
+                                  for branch, (values, offsets) in arrays.items()}}
+        self.n_events = n_events
+        self.branches = list(arrays)
+        self._cache = {}
+        for branch, (values, offsets) in arrays.items():
+            self._cache[f"{branch}.values"] = values
+            if offsets is not None:
+                self._cache[f"{branch}.offsets"] = offsets
+
+
+def weight_matrix(store):
+    # Same (n_events, 1 + n_variations) matrix as event_reader.read_weights
+    if weight_branch in store.branches:
+        nominal = np.asarray(store.values(weight_branch), dtype=float)
+    else:
+        nominal = np.ones(store.n_events)
+    if variation_branch in store.branches and store.n_events > 0:
+        counts = store.counts(variation_branch)
+        n_variations = counts[0]
+        if np.any(counts != n_variations):
+            raise ValueError(f"{store.path}: the number of weight variations differs between events "
+                             f"({counts.min()} to {counts.max()})")
+        variations = np.asarray(store.values(variation_branch), dtype=float).reshape(store.n_events, n_variations)
+    else:
+        variations = np.empty((store.n_events, 0))
+    return np.column_stack([nominal, variations])
+
+
+def open_store(file_path, path, float32=False):
+    # Open the store of file_path, (re)converting it when missing or out of date
+    if os.path.exists(os.path.join(path, "meta.json")):
+        store = FlatStore(path)
+        if store.is_current(file_path) and store.meta["float32"] == float32:
+            return store
+    return convert(file_path, path, float32=float32)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--float32", action="store_true", help="store float64 branches as float32")
+    parser.add_argument("--fixed-lists", action="store_true", help="use the file lists of samples.py instead of the files found in base_path")
+    args = parser.parse_args()
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    file_lists = ({group: config["files"] for group, config in groups.items()} if args.fixed_lists
+                  else discover_groups(base_path))
+    for file_list in file_lists.values():
+        for filename in file_list:
+            file_path = os.path.join(base_path, filename)
+            if not os.path.exists(file_path):
+                print(f"Warning: {file_path} not found, skipping.")
+                continue
+            store = open_store(file_path, store_path(args.campaign, filename), args.float32)
+            print(f"{filename}: {store.n_events} events -> {store.path}")
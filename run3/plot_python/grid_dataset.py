@@ -0,0 +1,106 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from event_reader import add_reader_arguments, event_branches
+from flat_store import ArrayStore, read_flat
+from hist_fill import bin_index
+from kinematics import store_observables
+from prefetch import Prefetcher
+from render import figure_filenames, render_group
+from result_cache import cache_path, save_results
+from samples import discover_groups, file_label, groups, observable_specs, rootfile_dir
+
+# Whole-grid processing: all mass points of a group are concatenated into one
+# columnar dataset with a sample-id column, the observables are extracted
+# once for all events, and the histograms of every sample are filled in one
+# pass by grouping on (sample, bin). Branches are read straight into the
+# flat values + offsets layout of flat_store.py and concatenated file by file,
+# so no per-event Python objects are made. The output is the same histogram
+# cache and figures as plot_all_mass_pT_dR.py.
+
+
+def concatenate_flat(parts):
+    # One (values, offsets) from the (values, offsets) of consecutive files; offsets None for scalar branches
+    values = np.concatenate([part[0] for part in parts])
+    if parts[0][1] is None:
+        return values, None
+    shifts = np.cumsum([0] + [len(part[0]) for part in parts[:-1]])
+    return values, np.concatenate([[0]] + [part[1][1:] + shift for part, shift in zip(parts, shifts)])
+
+
+def load_grid(base_path, file_list, branches=None, roles="fixed"):
+    # -> (flat_store.ArrayStore of all events, sample_id per event, labels); branches: default event_branches(roles)
+    branches = event_branches(roles) if branches is None else branches
+    parts = {branch: [] for branch in branches}
+    n_events = []
+    labels = []
+    prefetcher = Prefetcher(lambda filename: read_flat(os.path.join(base_path, filename), branches), file_list)
+    for filename, data, error in prefetcher:
+        if error is not None:
+            print(f"Error processing {filename}: {error}")
+            continue
+        for branch in branches:
+            parts[branch].append(data[branch])
+        values, offsets = data[branches[0]]
+        n_events.append(len(values) if offsets is None else len(offsets) - 1)
+        labels.append(file_label(filename))
+    if not labels:
+        empty = {branch: (np.empty(0), np.zeros(1, dtype=np.int64)) for branch in branches}
+        return ArrayStore(empty, 0), np.empty(0, dtype=np.int64), labels
+    store = ArrayStore({branch: concatenate_flat(parts[branch]) for branch in branches}, sum(n_events))
+    return store, np.repeat(np.arange(len(labels)), n_events), labels
+
+
+def fill_grouped(values, sample, n_samples, edges):
+    # Counts of every sample at once: (n_samples, n_bins), np.histogram conventions
+    n_bins = len(edges) - 1
+    index = bin_index(values, edges)
+    inside = index >= 0
+    return np.bincount(sample[inside] * n_bins + index[inside], minlength=n_samples * n_bins).reshape(n_samples, n_bins)
+
+
+def grid_results(store, sample_id, labels, specs, roles="fixed"):
+    # Same results as result_cache.histogram_results of the per-file lists
+    observables, summary = store_observables(store, roles)
+    n_samples = len(labels)
+    results = {}
+    for name, (bins, hist_range) in specs.items():
+        values, event_index = observables[name]
+        sample = sample_id[event_index]
+        edges = np.linspace(hist_range[0], hist_range[1], bins + 1)
+        counts = fill_grouped(values, sample, n_samples, edges)
+        entries = np.bincount(sample[np.isfinite(values)], minlength=n_samples)
+        results[name] = {"edges": edges,
+                         "counts": {label: counts[i] for i, label in enumerate(labels)},
+                         "entries": {label: int(entries[i]) for i, label in enumerate(labels)}}
+    return results, summary
+
+
+def process_group(base_path, group, file_list, campaign, roles="fixed"):
+    config = groups[group]
+    start = time.perf_counter()
+    store, sample_id, labels = load_grid(base_path, file_list, roles=roles)
+    loaded = time.perf_counter()
+    results, summary = grid_results(store, sample_id, labels, observable_specs(config["alp_mass_range"]), roles)
+    filled = time.perf_counter()
+    print(f"{group}: {len(labels)} samples, {summary['total_events']} events, "
+          f"read {loaded - start:.2f} s, extract + fill {filled - loaded:.2f} s")
+    save_results(cache_path(campaign, group), results, meta=dict(summary, campaign=campaign, group=group,
+                                                                  ma_range=config["ma_range"]))
+    render_group(results, figure_filenames(f"mass_distributions_{group}.pdf", f"pt_distributions_{group}.pdf",
+                                           f"dr_distributions_{group}.pdf"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3", help="run2, run2_zebing or run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    add_reader_arguments(parser)
+    args = parser.parse_args()
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    for group, file_list in discover_groups(base_path).items():
+        if file_list:
+            process_group(base_path, group, file_list, args.campaign, args.roles)
@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+import uproot
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.lines import Line2D
+
+from event_reader import add_reader_arguments, read_branches, tree_name
+from hist_fill import bin_index
+from kinematics import four_vectors, pair_dr, pt
+from observables import alp_slot, gamma_slots, lepton_slots
+from prefetch import Prefetcher, chunk_ranges
+from result_cache import cache_path
+from samples import discover_groups, file_label, rootfile_dir, sample_colors
+from validate import ValidationCache
+
+# Two-dimensional histograms of correlated observables (e.g. ΔR(γγ) vs ALP
+# pT), filled chunk by chunk. Next to the counts every x bin keeps Σw, Σwy
+# and Σwy² of the unbinned y values, so the profile (mean of y per x bin)
+# is exact and two histograms merge by adding arrays.
+
+output_dir = "pic"
+plt.rcParams['xtick.labelsize'] = 20
+plt.rcParams['ytick.labelsize'] = 20
+
+# Pair -> (x observable, y observable, x (bins, range), y (bins, range), x label, y label)
+pair_specs = {
+    "gamma_dr_vs_alp_pt": ("alp_pt", "gamma_dr", (50, (0, 100)), (60, (0, 3)),
+                           "ALP pT (GeV)", r"$\Delta R(\gamma1, \gamma2)$"),
+    "gamma_pt_vs_lepton_pt": ("lepton_leading_pt", "gamma_leading_pt", (50, (0, 100)), (50, (0, 100)),
+                              r"leading $\ell$ pT (GeV)", r"leading $\gamma$ pT (GeV)"),
+}
+
+
+class Histogram2D:
+    def __init__(self, x_edges, y_edges):
+        self.x_edges = np.asarray(x_edges, dtype=float)
+        self.y_edges = np.asarray(y_edges, dtype=float)
+        n_x, n_y = len(self.x_edges) - 1, len(self.y_edges) - 1
+        self.counts = np.zeros((n_x, n_y))
+        # Profile sums over all y (also outside the y range) per x bin
+        self.sum_w = np.zeros(n_x)
+        self.sum_wy = np.zeros(n_x)
+        self.sum_wy2 = np.zeros(n_x)
+
+    def fill(self, x, y, weights=None):
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        weights = np.ones(len(x)) if weights is None else np.asarray(weights, dtype=float)
+        n_x, n_y = self.counts.shape
+        ix = bin_index(x, self.x_edges)
+        iy = bin_index(y, self.y_edges)
+        valid = (ix >= 0) & np.isfinite(y)
+        inside = valid & (iy >= 0)
+        self.counts += np.bincount(ix[inside] * n_y + iy[inside], weights[inside], minlength=n_x * n_y).reshape(n_x, n_y)
+        ix, y, weights = ix[valid], y[valid], weights[valid]
+        self.sum_w += np.bincount(ix, weights, minlength=n_x)
+        self.sum_wy += np.bincount(ix, weights * y, minlength=n_x)
+        self.sum_wy2 += np.bincount(ix, weights * y ** 2, minlength=n_x)
+
+    def merge(self, other):
+        if not (np.array_equal(self.x_edges, other.x_edges) and np.array_equal(self.y_edges, other.y_edges)):
+            raise ValueError("Cannot merge 2D histograms with different binning")
+        self.counts += other.counts
+        self.sum_w += other.sum_w
+        self.sum_wy += other.sum_wy
+        self.sum_wy2 += other.sum_wy2
+
+    def profile(self):
+        # (mean of y, error of the mean) per x bin; NaN for empty bins
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.sum_wy / self.sum_w
+            spread = np.sqrt(np.maximum(self.sum_wy2 / self.sum_w - mean ** 2, 0))
+            return mean, spread / np.sqrt(self.sum_w)
+
+    def to_dict(self):
+        return {name: getattr(self, name).tolist()
+                for name in ("x_edges", "y_edges", "counts", "sum_w", "sum_wy", "sum_wy2")}
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls(data["x_edges"], data["y_edges"])
+        for name in ("counts", "sum_w", "sum_wy", "sum_wy2"):
+            setattr(hist, name, np.asarray(data[name], dtype=float))
+        return hist
+
+
+def pair_values(branches, validated=()):
+    # {observable: (values of every selected event)} used by pair_specs
+    p, _, _ = four_vectors(branches, validated)
+    gamma1, gamma2 = p[:, gamma_slots[0]], p[:, gamma_slots[1]]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "alp_pt": pt(p[:, alp_slot]),
+            "gamma_dr": pair_dr(gamma1, gamma2),
+            "lepton_leading_pt": np.nanmax(pt(p[:, lepton_slots]), axis=1),
+            "gamma_leading_pt": np.nanmax(pt(p[:, gamma_slots]), axis=1),
+        }
+
+
+def new_histograms():
+    return {name: Histogram2D(np.linspace(x_range[0], x_range[1], x_bins + 1), np.linspace(y_range[0], y_range[1], y_bins + 1))
+            for name, (_, _, (x_bins, x_range), (y_bins, y_range), _, _) in pair_specs.items()}
+
+
+def fill_file(file_path, chunk_size=100000, roles="fixed", validated=()):
+    # {pair: Histogram2D} of one file, read in chunks of chunk_size events;
+    # validated: ValidationCache.validated_branches of the file
+    with uproot.open(file_path) as file:
+        n_entries = file[tree_name].num_entries
+    histograms = new_histograms()
+    prefetcher = Prefetcher(lambda r: read_branches(file_path, entry_start=r[0], entry_stop=r[1], roles=roles),
+                            chunk_ranges(n_entries, chunk_size))
+    for _, branches, error in prefetcher:
+        if error is not None:
+            raise error
+        values = pair_values(branches, validated)
+        for name, hist in histograms.items():
+            x_name, y_name = pair_specs[name][:2]
+            hist.fill(values[x_name], values[y_name])
+    return histograms
+
+
+def save_histograms(path, histograms_by_label):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({label: {name: hist.to_dict() for name, hist in histograms.items()}
+                   for label, histograms in histograms_by_label.items()}, f)
+    print(f"Saved 2D histograms: {path}")
+
+
+def load_histograms(path):
+    with open(path) as f:
+        return {label: {name: Histogram2D.from_dict(data) for name, data in histograms.items()}
+                for label, histograms in json.load(f).items()}
+
+
+def plot_pair(histograms_by_label, name, output_filename):
+    # One heatmap page per mass point with its profile, then all profiles overlaid
+    x_label, y_label = pair_specs[name][4:]
+    colors = sample_colors(len(histograms_by_label))
+    with PdfPages(os.path.join(output_dir, output_filename)) as pdf:
+        for label, histograms in histograms_by_label.items():
+            hist = histograms[name]
+            fig, ax = plt.subplots(figsize=(10, 8))
+            mesh = ax.pcolormesh(hist.x_edges, hist.y_edges, hist.counts.T, cmap="viridis")
+            fig.colorbar(mesh, ax=ax).set_label("Events", fontsize=20)
+            mean, error = hist.profile()
+            centers = 0.5 * (hist.x_edges[1:] + hist.x_edges[:-1])
+            ax.errorbar(centers, mean, yerr=error, fmt="o", color="red", markersize=3, label="profile")
+            ax.set_title(label, fontsize=24)
+            ax.set_xlabel(x_label, fontsize=24)
+            ax.set_ylabel(y_label, fontsize=24)
+            plt.tight_layout()
+            pdf.savefig(fig)
+            plt.close(fig)
+        fig, ax = plt.subplots(figsize=(10, 8))
+        handles = []
+        for i, (label, histograms) in enumerate(histograms_by_label.items()):
+            hist = histograms[name]
+            mean, error = hist.profile()
+            centers = 0.5 * (hist.x_edges[1:] + hist.x_edges[:-1])
+            ax.errorbar(centers, mean, yerr=error, fmt="o-", color=colors[i], markersize=3, linewidth=1.5)
+            handles.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=label))
+        ax.set_xlabel(x_label, fontsize=24)
+        ax.set_ylabel(f"mean {y_label}", fontsize=24)
+        ax.legend(handles=handles, fontsize=14, handlelength=2, ncol=2)
+        plt.tight_layout()
+        pdf.savefig(fig)
+        plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    add_reader_arguments(parser)
+    args = parser.parse_args()
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    os.makedirs(output_dir, exist_ok=True)
+    validation = ValidationCache(args.campaign)
+    for group, file_list in discover_groups(base_path).items():
+        histograms_by_label = {}
+        for filename in file_list:
+            file_path = os.path.join(base_path, filename)
+            try:
+                histograms_by_label[file_label(filename)] = fill_file(file_path, args.chunk_size, args.roles,
+                                                                       validation.validated_branches(file_path))
+                print(f"Filled {filename}")
+            except Exception as e:
+                print(f"Error processing {filename}: {e}")
+        if not histograms_by_label:
+            continue
+        save_histograms(cache_path(args.campaign, f"{group}_hist2d", fmt="json"), histograms_by_label)
+        for name in pair_specs:
+            plot_pair(histograms_by_label, name, f"hist2d_{name}_{group}.pdf")
+    validation.save()
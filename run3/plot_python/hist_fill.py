@@ -0,0 +1,51 @@
+import numpy as np
+
+# Histogram filling with many weight columns at once: the bin index of every
+# entry is computed once and all columns of the weight matrix (nominal, scale /
+# PDF variations, bootstrap replicas, ...) are accumulated in the same pass.
+
+
+def bin_index(values, edges):
+    # Bin of every value with np.histogram conventions (last bin closed); -1 outside / NaN
+    values = np.asarray(values, dtype=float)
+    n_bins = len(edges) - 1
+    index = np.searchsorted(edges, values, side="right") - 1
+    index[values == edges[-1]] = n_bins - 1
+    index[(index < 0) | (index >= n_bins) | ~np.isfinite(values)] = -1
+    return index
+
+
+def fill_weighted(values, weights, edges):
+    # values (n,), weights (n, n_columns) -> sums of weights per bin (n_bins, n_columns)
+    weights = np.asarray(weights, dtype=float)
+    if weights.ndim == 1:
+        weights = weights[:, None]
+    index = bin_index(values, edges)
+    inside = index >= 0
+    index, weights = index[inside], weights[inside]
+    sums = np.zeros((len(edges) - 1, weights.shape[1]))
+    if len(index) == 0:
+        return sums
+    order = np.argsort(index, kind="stable")
+    index, weights = index[order], weights[order]
+    filled_bins, starts = np.unique(index, return_index=True)
+    sums[filled_bins] = np.add.reduceat(weights, starts, axis=0)
+    return sums
+
+
+def envelope(variations):
+    # Bin-by-bin min / max over the variation columns (n_bins, n_variations)
+    if variations.shape[1] == 0:
+        return None, None
+    return variations.min(axis=1), variations.max(axis=1)
+
+
+def bootstrap_band(replicas, edges, quantiles=(0.16, 0.84)):
+    # Bin-by-bin quantiles of the unit-area shapes of the replica columns (n_bins, n_replicas)
+    totals = replicas.sum(axis=0)
+    shapes = np.divide(replicas, totals * np.diff(edges)[:, None], out=np.zeros_like(replicas, dtype=float),
+                       where=totals > 0)
+    if not (totals > 0).any():
+        return np.zeros(len(replicas)), np.zeros(len(replicas))
+    low, high = np.quantile(shapes[:, totals > 0], quantiles, axis=1)
+    return low, high
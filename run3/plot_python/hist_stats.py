@@ -0,0 +1,123 @@
+import numpy as np
+
+try:
+    from scipy.stats import chi2 as chi2_distribution
+except ImportError:  # p-values of the χ² test are optional
+    chi2_distribution = None
+
+# Two-sample comparison statistics on binned (unnormalised) histograms.
+
+
+def chi2_test(counts1, counts2):
+    # Unweighted-unweighted χ² test (as ROOT TH1::Chi2Test "UU"):
+    # χ² = Σ (N2·n1 - N1·n2)² / (n1 + n2) / (N1·N2), ndf = (non-empty bins) - 1
+    n1 = np.asarray(counts1, dtype=float)
+    n2 = np.asarray(counts2, dtype=float)
+    total1, total2 = n1.sum(), n2.sum()
+    used = (n1 + n2) > 0
+    if total1 == 0 or total2 == 0 or used.sum() < 2:
+        return np.nan, 0, np.nan
+    chi2 = np.sum((total2 * n1[used] - total1 * n2[used]) ** 2 / (n1[used] + n2[used])) / (total1 * total2)
+    ndf = int(used.sum()) - 1
+    p_value = chi2_distribution.sf(chi2, ndf) if chi2_distribution is not None else np.nan
+    return chi2, ndf, p_value
+
+
+def kolmogorov_sf(x):
+    # Asymptotic Kolmogorov survival function Q_KS(x) = 2 Σ (-1)^(k-1) exp(-2 k² x²)
+    x = np.asarray(x, dtype=float)
+    k = np.arange(1, 101).reshape((-1,) + (1,) * x.ndim)
+    terms = 2 * (-1.0) ** (k - 1) * np.exp(-2 * k ** 2 * x ** 2)
+    return np.clip(np.where(x > 0, terms.sum(axis=0), 1.0), 0.0, 1.0)
+
+
+def ks_test(counts1, counts2):
+    # Binned Kolmogorov-Smirnov distance between the two cumulative distributions
+    n1 = np.asarray(counts1, dtype=float)
+    n2 = np.asarray(counts2, dtype=float)
+    total1, total2 = n1.sum(), n2.sum()
+    if total1 == 0 or total2 == 0:
+        return np.nan, np.nan
+    distance = np.max(np.abs(np.cumsum(n1) / total1 - np.cumsum(n2) / total2))
+    effective_n = total1 * total2 / (total1 + total2)
+    return distance, float(kolmogorov_sf(np.sqrt(effective_n) * distance))
+
+
+def pairwise_distances(counts, edges):
+    # All-pairs distances between the rows of counts (n_samples, n_bins) at once:
+    #   chi2        χ²/ndf of chi2_test for every pair
+    #   ks          binned Kolmogorov-Smirnov distance
+    #   wasserstein binned earth mover's distance Σ |CDF_i - CDF_j| · Δx (in units of the observable)
+    n = np.asarray(counts, dtype=float)
+    totals = n.sum(axis=1)
+    safe_totals = np.where(totals > 0, totals, 1.0)
+    cdf = np.cumsum(n, axis=1) / safe_totals[:, None]
+    cdf_diff = np.abs(cdf[:, None, :] - cdf[None, :, :])
+    ks = cdf_diff.max(axis=2)
+    wasserstein = (cdf_diff * np.diff(edges)).sum(axis=2)
+
+    n1, n2 = n[:, None, :], n[None, :, :]
+    t1, t2 = totals[:, None, None], totals[None, :, None]
+    used = (n1 + n2) > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(used, (t2 * n1 - t1 * n2) ** 2 / np.where(used, n1 + n2, 1.0), 0.0)
+        chi2 = terms.sum(axis=2) / (t1[..., 0] * t2[..., 0])
+        ndf = used.sum(axis=2) - 1
+        chi2_ndf = np.where(ndf > 0, chi2 / ndf, np.nan)
+
+    empty = (totals[:, None] == 0) | (totals[None, :] == 0)
+    for matrix in (chi2_ndf, ks, wasserstein):
+        matrix[empty] = np.nan
+    return {"chi2": chi2_ndf, "ks": ks, "wasserstein": wasserstein}
+
+
+def binned_quantiles(counts, edges, probabilities):
+    # Quantiles from the linearly interpolated cumulative distribution of a histogram
+    counts = np.asarray(counts, dtype=float)
+    if counts.sum() == 0:
+        return np.full(len(probabilities), np.nan)
+    edges = np.asarray(edges, dtype=float)
+    cdf = np.concatenate(([0.0], np.cumsum(counts) / counts.sum()))
+    # Interpolate inside the bin where the CDF reaches p: cdf[j - 1] < p <= cdf[j].
+    # Empty bins never contain a quantile (p = 0 gives the first non-empty bin)
+    p = np.asarray(probabilities, dtype=float)
+    j = np.searchsorted(cdf, p, side="left")
+    j = np.clip(np.maximum(j, np.searchsorted(cdf, 0.0, side="right")), 1, len(counts))
+    step = cdf[j] - cdf[j - 1]
+    fraction = np.clip(np.divide(p - cdf[j - 1], step, out=np.zeros_like(p), where=step > 0), 0.0, 1.0)
+    return edges[j - 1] + fraction * (edges[j] - edges[j - 1])
+
+
+def binned_summary(counts, edges, probabilities=(0.025, 0.16, 0.5, 0.84, 0.975)):
+    counts = np.asarray(counts, dtype=float)
+    centers = 0.5 * (np.asarray(edges)[1:] + np.asarray(edges)[:-1])
+    total = counts.sum()
+    mean = np.sum(counts * centers) / total if total > 0 else np.nan
+    rms = np.sqrt(np.sum(counts * (centers - mean) ** 2) / total) if total > 0 else np.nan
+    return {"mean": mean, "rms": rms, "quantiles": dict(zip(probabilities, binned_quantiles(counts, edges, probabilities)))}
+
+
+def binned_efficiency(counts, edges, cut):
+    # Fraction of entries above cut, interpolated inside the bin containing the cut
+    counts = np.asarray(counts, dtype=float)
+    if counts.sum() == 0:
+        return np.nan
+    cdf = np.concatenate(([0.0], np.cumsum(counts) / counts.sum()))
+    return 1.0 - float(np.interp(cut, edges, cdf))
+
+
+if __name__ == "__main__":
+    # Self-check: binned quantiles of sampled data against np.quantile of the unbinned values
+    rng = np.random.default_rng(1)
+    probabilities = (0.025, 0.16, 0.5, 0.84, 0.975)
+    for name, values, edges in [
+        ("normal", rng.normal(125, 1, 100000), np.linspace(120, 130, 101)),
+        ("exponential", rng.exponential(0.3, 100000), np.linspace(0, 5, 26)),
+        ("empty leading bins", rng.uniform(2, 3, 100000), np.linspace(0, 4, 5)),
+    ]:
+        counts, _ = np.histogram(values, bins=edges)
+        binned = binned_quantiles(counts, edges, probabilities)
+        exact = np.quantile(values, probabilities)
+        worst = np.max(np.abs(binned - exact) / np.diff(edges).max())
+        print(f"{name}: max |binned - np.quantile| = {worst:.3f} bin widths")
+        assert worst < 0.5, f"{name}: binned quantiles {binned} differ from {exact}"
@@ -0,0 +1,187 @@
+import numpy as np
+
+from event_reader import event_branches
+from observables import (alp_slot, delta_r, event_counts, extract_from_store, gamma_slots, higgs_slot, lepton_slots,
+                         n_slots, pad_events, select_events, store_counts, z_slot)
+from topology import extract_branches, mother_branch, pdgid_branch, resolve_branches
+
+# Batched four-vector layer: every event of a file (or chunk) as one
+# (n_events, n_slots, 4) array of (E, px, py, pz). Particle systems are sums
+# over slot subsets, and all derived quantities work on the last axis, so no
+# per-event objects are created. Rest-frame quantities use the same layout:
+# boost() takes any (..., 4) array and the frame four-momentum per event.
+
+E, PX, PY, PZ = 0, 1, 2, 3
+
+# Particle slots of the systems used as observables
+systems = {
+    "gg": gamma_slots,
+    "ll": lepton_slots,
+    "llgg": lepton_slots + gamma_slots,
+}
+# Stored resonance slot each system is compared with (reconstructed - stored mass)
+stored_slots = {"gg": alp_slot, "ll": z_slot, "llgg": higgs_slot}
+# Particles whose η / φ / rapidity are observables (leptons and photons: both slots)
+particle_slots = {
+    "higgs": [higgs_slot],
+    "alp": [alp_slot],
+    "z": [z_slot],
+    "lepton": lepton_slots,
+    "gamma": gamma_slots,
+}
+
+
+def padded_four_vectors(masses, px, py, pz, energy, pdgid=None, mother=None, validated=()):
+    # (p, stored_mass, event_index) of the 8 / 9 particle events; missing particles are NaN.
+    # With pdgid / mother the particles are placed by their resolved role (topology.py);
+    # validated as in observables.event_counts
+    branches = {"mass": masses, "px": px, "py": py, "pz": pz, "energy": energy}
+    if pdgid is not None:
+        counts, consistent, layouts = resolve_branches(dict(branches, **{pdgid_branch: pdgid, mother_branch: mother}),
+                                                       validated)
+        selected = select_events(counts, consistent)
+        p = np.stack([layouts[name] for name in ("energy", "px", "py", "pz")], axis=-1)
+        return p, layouts["mass"], np.flatnonzero(selected)
+    counts, consistent = event_counts(branches, validated)
+    selected = select_events(counts, consistent)
+    p = np.stack([pad_events(branch, counts, selected) for branch in (energy, px, py, pz)], axis=-1)
+    return p, pad_events(masses, counts, selected), np.flatnonzero(selected)
+
+
+def four_vectors(branches, validated=()):
+    # padded_four_vectors of a read_branches dict; roles resolved if it holds the pdgid / mother columns
+    return padded_four_vectors(branches["mass"], branches["px"], branches["py"], branches["pz"], branches["energy"],
+                               branches.get(pdgid_branch), branches.get(mother_branch), validated)
+
+
+def system(p, slots):
+    # Four-momentum sum over the given slots (or a boolean (n_events, n_slots) mask)
+    slots = np.asarray(slots)
+    if slots.dtype == bool:
+        return np.where(slots[..., None], p, 0.0).sum(axis=1)
+    return p[:, slots, :].sum(axis=1)
+
+
+def mass_squared(p):
+    return p[..., E] ** 2 - p[..., PX] ** 2 - p[..., PY] ** 2 - p[..., PZ] ** 2
+
+
+def mass(p):
+    # Signed invariant mass: negative m² (numerical noise of massless particles) gives -sqrt(|m²|)
+    m2 = mass_squared(p)
+    return np.sign(m2) * np.sqrt(np.abs(m2))
+
+
+def pt(p):
+    return np.hypot(p[..., PX], p[..., PY])
+
+
+def eta(p):
+    return np.arcsinh(p[..., PZ] / pt(p))
+
+
+def phi(p):
+    return np.arctan2(p[..., PY], p[..., PX])
+
+
+def rapidity(p):
+    return 0.5 * np.log((p[..., E] + p[..., PZ]) / (p[..., E] - p[..., PZ]))
+
+
+def pair_dr(a, b):
+    # ΔR between two particles (..., 4), with the formula of observables.delta_r
+    return delta_r(a[..., PX], a[..., PY], a[..., PZ], b[..., PX], b[..., PY], b[..., PZ])
+
+
+def gamma_factor(p):
+    return p[..., E] / mass(p)
+
+
+def boost(p, frame):
+    # p (..., 4) seen in the rest frame of frame (..., 4), broadcast over leading axes
+    beta = frame[..., 1:] / frame[..., E:E + 1]
+    beta2 = np.sum(beta ** 2, axis=-1)
+    gamma = 1 / np.sqrt(1 - beta2)
+    beta_p = np.sum(beta * p[..., 1:], axis=-1)
+    energy = gamma * (p[..., E] - beta_p)
+    # (γ - 1) / β² → 0 for a frame at rest
+    factor = np.where(beta2 > 0, (gamma - 1) / np.where(beta2 > 0, beta2, 1), 0.0)
+    momentum = p[..., 1:] + ((factor * beta_p - gamma * p[..., E])[..., None]) * beta
+    return np.concatenate([energy[..., None], momentum], axis=-1)
+
+
+def cos_angle(p, axis):
+    # Cosine of the angle between the three-momenta of p and axis
+    dot = np.sum(p[..., 1:] * axis[..., 1:], axis=-1)
+    return dot / np.sqrt(np.sum(p[..., 1:] ** 2, axis=-1) * np.sum(axis[..., 1:] ** 2, axis=-1))
+
+
+def decay_angle(daughter, parent, grandparent):
+    # Helicity angle: daughter direction in the parent rest frame relative to the
+    # parent direction in the grandparent rest frame
+    return cos_angle(boost(daughter, parent), boost(parent, grandparent))
+
+
+def boost_observables(p, event_index):
+    # γ factors of the resonances, decay angles and ΔR(γγ) scaled by the ALP boost
+    higgs, alp, z = p[:, higgs_slot], p[:, alp_slot], p[:, z_slot]
+    gamma1, gamma2 = p[:, gamma_slots[0]], p[:, gamma_slots[1]]
+    observables = {
+        "higgs_gamma_factor": (gamma_factor(higgs), event_index),
+        "z_gamma_factor": (gamma_factor(z), event_index),
+        "alp_log_gamma_factor": (np.log10(gamma_factor(alp)), event_index),
+        "alp_cos_theta_star": (cos_angle(boost(alp, higgs), higgs), event_index),
+        "gamma_cos_theta_star": (decay_angle(gamma1, alp, higgs), event_index),
+        "lepton_cos_theta_star": (decay_angle(p[:, lepton_slots[0]], z, higgs), event_index),
+    }
+    # Collinear limit: ΔR(γγ) ≈ 2 m_a / pT_a, so ΔR · pT_a / m_a only depends on the decay angle
+    observables["gamma_dr_scaled"] = (pair_dr(gamma1, gamma2) * pt(alp) / mass(alp), event_index)
+    return observables
+
+
+def composite_observables(masses, px, py, pz, energy, pdgid=None, mother=None, validated=()):
+    # {name: (values, event_index)} in the format of observables.extract_observables
+    return observables_from_four_vectors(*padded_four_vectors(masses, px, py, pz, energy, pdgid, mother, validated))
+
+
+def event_observables(branches, validated=()):
+    # (observables, summary) of a read_branches dict: topology.extract_branches plus the composite observables
+    observables, summary = extract_branches(branches, validated)
+    observables.update(composite_observables(branches["mass"], branches["px"], branches["py"], branches["pz"],
+                                             branches["energy"], branches.get(pdgid_branch),
+                                             branches.get(mother_branch), validated))
+    return observables, summary
+
+
+def composite_from_store(store):
+    # Same as composite_observables, from a flat_store.FlatStore (as observables.extract_from_store)
+    counts, consistent = store_counts(store)
+    selected = select_events(counts, consistent)
+    p = np.stack([store.padded(branch, n_slots, selected=selected) for branch in ("energy", "px", "py", "pz")], axis=-1)
+    return observables_from_four_vectors(p, store.padded("mass", n_slots, selected=selected), np.flatnonzero(selected))
+
+
+def store_observables(store, roles="fixed"):
+    # (observables, summary) of a flat_store store, as event_observables of the same events
+    if roles == "resolved":
+        # The role resolver works on the per-event arrays
+        return event_observables({branch: store.jagged(branch) for branch in event_branches(roles)})
+    observables, summary = extract_from_store(store)
+    observables.update(composite_from_store(store))
+    return observables, summary
+
+
+def observables_from_four_vectors(p, stored_mass, event_index):
+    observables = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for name, slots in systems.items():
+            system_mass = mass(system(p, slots))
+            observables[f"{name}_mass"] = (system_mass, event_index)
+            observables[f"{name}_mass_residual"] = (system_mass - stored_mass[:, stored_slots[name]], event_index)
+        for name, slots in particle_slots.items():
+            particles = p[:, slots, :]
+            particle_event = np.repeat(event_index[:, None], len(slots), axis=1).ravel()
+            for quantity, function in (("eta", eta), ("phi", phi), ("rapidity", rapidity)):
+                observables[f"{name}_{quantity}"] = (function(particles).ravel(), particle_event)
+        observables.update(boost_observables(p, event_index))
+    return observables
@@ -0,0 +1,182 @@
+import argparse
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import uproot
+
+from event_reader import add_reader_arguments, read_branches, tree_name
+from hist2d import Histogram2D, new_histograms, pair_specs, pair_values, plot_pair, save_histograms
+from kinematics import event_observables
+from prefetch import chunk_ranges
+from render import figure_filenames, render_group
+from result_cache import cache_dir, cache_path, histogram_results, load_results, merge_results, save_results
+from samples import discover_groups, file_label, groups, mass_from_label, observable_specs, rootfile_dir
+from streaming_stats import ObservableSummary, export_summaries
+from validate import ValidationCache
+
+# Split / merge execution for large grids.
+#
+#   split:  list the shards (file, entry range) of every group in a JSON file
+#   map:    process one shard and write a partial-result file (histograms,
+#           event counters and quantile sketches in the histogram cache format)
+#   reduce: combine any number of partial files into the group caches,
+#           figures, summaries and 2D histograms
+#
+# Every partial can be produced by a separate batch job; the reduce is
+# associative, so partials can also be combined in stages. "local" runs all
+# maps in a process pool and then the reduce.
+
+partial_dir = os.path.join(cache_dir, "partials")
+events_per_shard = 200000
+counter_names = ["total_events", "skipped_events", "mismatched_events", "eight_particle_events", "unknown_lepton_count"]
+
+
+def shards_path(campaign):
+    return os.path.join(partial_dir, campaign, "shards.json")
+
+
+def partial_path(campaign, shard):
+    return os.path.join(partial_dir, campaign, shard["group"],
+                        f"{file_label(shard['filename'])}_{shard['entry_start']}_{shard['entry_stop']}.npz")
+
+
+def clear_partials(campaign):
+    # Partials of an earlier split would be counted twice by the reduce
+    for path in glob.glob(os.path.join(partial_dir, campaign, "*", "*.npz")):
+        os.remove(path)
+
+
+def make_shards(base_path, n_events=events_per_shard, roles="fixed", validation=None):
+    # validation: ValidationCache; the branches it validated go into the shards of each file
+    shards = []
+    for group, file_list in discover_groups(base_path).items():
+        for filename in file_list:
+            file_path = os.path.join(base_path, filename)
+            with uproot.open(file_path) as file:
+                n_entries = file[tree_name].num_entries
+            validated = validation.validated_branches(file_path) if validation is not None else []
+            for start, stop in chunk_ranges(n_entries, n_events):
+                shards.append({"group": group, "base_path": base_path, "filename": filename,
+                               "entry_start": start, "entry_stop": stop, "roles": roles, "validated": validated})
+    return shards
+
+
+def map_shard(shard, campaign):
+    # Process one shard and write its partial result; returns the partial path
+    file_path = os.path.join(shard["base_path"], shard["filename"])
+    label = file_label(shard["filename"])
+    # The roles are part of the shard (chosen at split time), so every map job reads the same branches
+    branches = read_branches(file_path, entry_start=shard["entry_start"], entry_stop=shard["entry_stop"],
+                             roles=shard.get("roles", "fixed"))
+    validated = shard.get("validated", [])
+    observables, summary = event_observables(branches, validated)
+    specs = observable_specs(groups[shard["group"]]["alp_mass_range"])
+    results = histogram_results({name: [observables[name][0]] for name in specs}, [label], specs)
+    sketches = {}
+    for name, (values, _) in observables.items():
+        sketches[name] = ObservableSummary()
+        sketches[name].update(values)
+    histograms = new_histograms()
+    values = pair_values(branches, validated)
+    for name, hist in histograms.items():
+        hist.fill(values[pair_specs[name][0]], values[pair_specs[name][1]])
+    path = partial_path(campaign, shard)
+    save_results(path, results, meta={
+        "campaign": campaign, "shard": shard, "counters": {label: {name: summary[name] for name in counter_names}},
+        "sketches": {label: {name: s.to_dict() for name, s in sketches.items()}},
+        "hist2d": {label: {name: hist.to_dict() for name, hist in histograms.items()}},
+    })
+    return path
+
+
+def reduce_partials(paths):
+    # Combine partial results -> (results, counters, sketches, 2D histograms), all keyed by label
+    results_list, counters, sketches, histograms = [], {}, {}, {}
+    for path in paths:
+        results, meta = load_results(path)
+        results_list.append(results)
+        for label, values in meta["counters"].items():
+            target = counters.setdefault(label, dict.fromkeys(counter_names, 0))
+            for name in counter_names:
+                target[name] += values[name]
+        for label, summaries in meta["sketches"].items():
+            for name, data in summaries.items():
+                summary = ObservableSummary.from_dict(data)
+                if name in sketches.setdefault(label, {}):
+                    sketches[label][name].merge(summary)
+                else:
+                    sketches[label][name] = summary
+        for label, pairs in meta["hist2d"].items():
+            for name, data in pairs.items():
+                hist = Histogram2D.from_dict(data)
+                if name in histograms.setdefault(label, {}):
+                    histograms[label][name].merge(hist)
+                else:
+                    histograms[label][name] = hist
+    return merge_results(results_list), counters, sketches, histograms
+
+
+def group_partials(campaign, group):
+    # Partial files of a group, in mass order, then entry order
+    def key(path):
+        label, start, _ = os.path.basename(path)[:-len(".npz")].rsplit("_", 2)
+        return mass_from_label(label), int(start)
+    return sorted(glob.glob(os.path.join(partial_dir, campaign, group, "*.npz")), key=key)
+
+
+def finish_group(campaign, group, paths):
+    results, counters, sketches, histograms = reduce_partials(paths)
+    totals = {name: sum(c[name] for c in counters.values()) for name in counter_names}
+    print(f"{group}: {len(paths)} partials, {len(counters)} mass points, {totals['total_events']} events, "
+          f"{totals['skipped_events']} skipped, {totals['unknown_lepton_count']} unknown leptons")
+    save_results(cache_path(campaign, group), results,
+                 meta=dict(totals, campaign=campaign, group=group, ma_range=groups[group]["ma_range"]))
+    render_group(results, figure_filenames(f"mass_distributions_{group}.pdf", f"pt_distributions_{group}.pdf",
+                                           f"dr_distributions_{group}.pdf"))
+    export_summaries(sketches, f"summary_{campaign}_{group}")
+    save_histograms(cache_path(campaign, f"{group}_hist2d", fmt="json"), histograms)
+    for name in pair_specs:
+        plot_pair(histograms, name, f"hist2d_{name}_{group}.pdf")
+
+
+def reduce_campaign(campaign):
+    for group in groups:
+        paths = group_partials(campaign, group)
+        if paths:
+            finish_group(campaign, group, paths)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("step", choices=["split", "map", "reduce", "local"])
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--events-per-shard", type=int, default=events_per_shard)
+    parser.add_argument("--shard", type=int, nargs="*", default=None, help="map: shard numbers (default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="local: size of the process pool")
+    add_reader_arguments(parser)
+    args = parser.parse_args()
+
+    if args.step in ("split", "local"):
+        validation = ValidationCache(args.campaign)
+        shards = make_shards(args.base_path or rootfile_dir(args.campaign), args.events_per_shard, args.roles,
+                             validation)
+        validation.save()
+        clear_partials(args.campaign)
+        os.makedirs(os.path.dirname(shards_path(args.campaign)), exist_ok=True)
+        with open(shards_path(args.campaign), "w") as f:
+            json.dump(shards, f, indent=1)
+        print(f"Wrote {len(shards)} shards to {shards_path(args.campaign)}")
+    if args.step == "map":
+        with open(shards_path(args.campaign)) as f:
+            shards = json.load(f)
+        for i in args.shard if args.shard is not None else range(len(shards)):
+            print(f"Wrote {map_shard(shards[i], args.campaign)}")
+    if args.step == "local":
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for path in pool.map(map_shard, shards, [args.campaign] * len(shards)):
+                print(f"Wrote {path}")
+    if args.step in ("reduce", "local"):
+        reduce_campaign(args.campaign)
@@ -0,0 +1,87 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+from hist_stats import pairwise_distances
+from result_cache import cache_dir, cache_formats, cache_path, find_cache, load_results
+
+# Pairwise χ² / KS / Wasserstein distances between all mass points of a group,
+# for every cached observable. Used to judge whether the mass grid is too
+# coarse (large neighbour distances) or too fine (neighbours indistinguishable).
+
+output_dir = "pic"
+metrics = ["chi2", "ks", "wasserstein"]
+metric_labels = {"chi2": r"$\chi^2$/ndf", "ks": "KS distance", "wasserstein": "Wasserstein distance"}
+
+
+def grid_distances(results):
+    distances = {}
+    for name, hist in results.items():
+        labels = list(hist["counts"])
+        if len(labels) < 2:
+            continue
+        counts = np.stack([hist["counts"][label] for label in labels])
+        distances[name] = (labels, pairwise_distances(counts, hist["edges"]))
+    return distances
+
+
+def plot_distance_matrices(distances, output_filename):
+    with PdfPages(os.path.join(output_dir, output_filename)) as pdf:
+        for name, (labels, matrices) in distances.items():
+            fig, axes = plt.subplots(1, 3, figsize=(24, 7))
+            for ax, metric in zip(axes, metrics):
+                image = ax.imshow(matrices[metric], cmap="viridis", origin="lower")
+                ax.set_xticks(np.arange(len(labels)))
+                ax.set_yticks(np.arange(len(labels)))
+                ax.set_xticklabels(labels, rotation=90, fontsize=10)
+                ax.set_yticklabels(labels, fontsize=10)
+                ax.set_title(f"{name}: {metric_labels[metric]}", fontsize=16)
+                fig.colorbar(image, ax=ax, fraction=0.046)
+            plt.tight_layout()
+            pdf.savefig(fig)
+            plt.close(fig)
+
+
+def save_distances(distances, stem):
+    arrays = {}
+    rows = []
+    for name, (labels, matrices) in distances.items():
+        arrays[f"{name}/labels"] = np.array(labels)
+        for metric in metrics:
+            arrays[f"{name}/{metric}"] = matrices[metric]
+        # Neighbouring mass points (the entries that matter for the grid spacing)
+        for k in range(len(labels) - 1):
+            rows.append(dict({"observable": name, "mass_point": labels[k], "next_mass_point": labels[k + 1]},
+                             **{metric: matrices[metric][k, k + 1] for metric in metrics}))
+    np.savez(os.path.join(output_dir, f"{stem}.npz"), **arrays)
+    with open(os.path.join(output_dir, f"{stem}_neighbours.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["observable", "mass_point", "next_mass_point"] + metrics)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def mass_grid_distances(campaign, group, directory=cache_dir, formats=cache_formats):
+    results, _ = load_results(find_cache(campaign, group, directory, formats) or cache_path(campaign, group, directory))
+    distances = grid_distances(results)
+    os.makedirs(output_dir, exist_ok=True)
+    stem = f"mass_grid_distances_{campaign}_{group}"
+    save_distances(distances, stem)
+    plot_distance_matrices(distances, f"{stem}.pdf")
+    print(f"Saved {stem}.pdf, {stem}.npz and {stem}_neighbours.csv ({len(distances)} observables)")
+    return distances
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--group", action="append", help="mass-point group (default: ma_0p1_0p9 and ma_1_30)")
+    parser.add_argument("--cache-dir", default=cache_dir)
+    parser.add_argument("--format", choices=cache_formats, default=None,
+                        help="only use caches of this format (default: the first one found)")
+    args = parser.parse_args()
+    for group in args.group or ["ma_0p1_0p9", "ma_1_30"]:
+        mass_grid_distances(args.campaign, group, args.cache_dir, [args.format] if args.format else cache_formats)
@@ -0,0 +1,158 @@
+import numpy as np
+
+# Vectorised version of the per-event loop of plot_all_mass_pT_dR.py.
+# Each observable is returned as (values, event_index) so that per-event
+# quantities (weights, cut masks, ...) can be attached to every entry.
+
+# 輕子質量範圍（電子和 μ子使用 MeV/c²，τ子使用 GeV/c²）
+electron_mass_range = (0.4, 0.6)  # ~0.511 MeV/c²
+muon_mass_range = (90, 120)       # ~105.66 MeV/c²
+tau_mass_range = (1.7, 1.9)       # ~1776.86 MeV/c² (GeV/c²)
+
+# Fixed particle slots of the HZa -> 2l2g LHE record
+higgs_slot, alp_slot, z_slot = 2, 3, 4
+lepton_slots = [5, 6]
+gamma_slots = [7, 8]
+n_slots = 9
+
+
+def pt(px, py):
+    return np.sqrt(px ** 2 + py ** 2)
+
+
+def eta(px, py, pz):
+    return np.arcsinh(pz / pt(px, py))
+
+
+def phi(px, py):
+    return np.arctan2(py, px)
+
+
+def delta_phi(phi1, phi2):
+    return (phi1 - phi2 + np.pi) % (2 * np.pi) - np.pi
+
+
+def delta_r(px1, py1, pz1, px2, py2, pz2):
+    # ΔR with Δφ folded into [-π, π); kinematics.pair_dr applies it to four-vectors
+    deta = eta(px1, py1, pz1) - eta(px2, py2, pz2)
+    dphi = delta_phi(phi(px1, py1), phi(px2, py2))
+    return np.sqrt(deta ** 2 + dphi ** 2)
+
+
+def event_counts(branches, validated=()):
+    # Number of particles per event of every branch and the events whose branches agree.
+    # validated: branches already known to agree in every event (clean verdict of validate.py),
+    # only the first of them is counted
+    known = [name for name in branches if name in validated]
+    counts = {name: np.fromiter((len(event) for event in branches[name]), dtype=np.int64, count=len(branches[name]))
+              for name in branches if name not in validated or name in known[:1]}
+    reference = counts[next(iter(branches))]
+    consistent = np.ones(len(reference), dtype=bool)
+    for c in counts.values():
+        consistent &= c == reference
+    return reference, consistent
+
+
+def pad_events(jagged, counts, selected, width=n_slots, fill=np.nan):
+    # (n_selected, width) array of the selected events, padded with fill
+    padded = np.full((int(selected.sum()), width), fill)
+    if len(padded) > 0:
+        mask = np.arange(width) < counts[selected][:, None]
+        padded[mask] = np.concatenate(jagged[selected])
+    return padded
+
+
+def classify_leptons(lepton_mass):
+    # 0 = electron, 1 = muon, 2 = tau, -1 = unknown (same order as the loop's checks)
+    lepton_mass_mev = lepton_mass * 1000
+    flavour = np.full(lepton_mass.shape, -1)
+    is_tau = (tau_mass_range[0] <= lepton_mass) & (lepton_mass <= tau_mass_range[1])
+    is_electron = ~is_tau & (electron_mass_range[0] <= lepton_mass_mev) & (lepton_mass_mev <= electron_mass_range[1])
+    is_muon = ~is_tau & ~is_electron & (muon_mass_range[0] <= lepton_mass_mev) & (lepton_mass_mev <= muon_mass_range[1])
+    flavour[is_electron] = 0
+    flavour[is_muon] = 1
+    flavour[is_tau] = 2
+    return flavour
+
+
+def select_events(counts, consistent):
+    return consistent & ((counts == 8) | (counts == 9))
+
+
+def extract_observables(masses, px, py, pz, energy, validated=()):
+    # From the object arrays of tree[branch].array(library="np"); validated as in event_counts
+    counts, consistent = event_counts({"mass": masses, "px": px, "py": py, "pz": pz, "energy": energy}, validated)
+    selected = select_events(counts, consistent)
+    padded = [pad_events(branch, counts, selected) for branch in (masses, px, py, pz)]
+    return observables_from_padded(counts, consistent, *padded)
+
+
+def store_counts(store):
+    # (counts, consistent) of a flat_store.FlatStore, as event_counts of the jagged branches
+    branch_counts = [store.counts(branch) for branch in ("mass", "px", "py", "pz", "energy")]
+    counts = branch_counts[0]
+    consistent = np.ones(len(counts), dtype=bool)
+    for c in branch_counts[1:]:
+        consistent &= c == counts
+    return counts, consistent
+
+
+def extract_from_store(store):
+    # From a flat_store.FlatStore (offsets + values, memory mapped)
+    counts, consistent = store_counts(store)
+    selected = select_events(counts, consistent)
+    padded = [store.padded(branch, n_slots, selected=selected) for branch in ("mass", "px", "py", "pz")]
+    return observables_from_padded(counts, consistent, *padded)
+
+
+def observables_from_padded(counts, consistent, m, x, y, z):
+    # m, x, y, z: (n_selected, n_slots) mass / px / py / pz of the selected events
+    selected = select_events(counts, consistent)
+    event_index = np.flatnonzero(selected)
+    n_particles = counts[selected]
+    particle_pt = pt(x, y)
+
+    observables = {}
+    for name, slot in [("higgs", higgs_slot), ("alp", alp_slot), ("z", z_slot)]:
+        observables[f"{name}_mass"] = (m[:, slot], event_index)
+        observables[f"{name}_pt"] = (particle_pt[:, slot], event_index)
+
+    # 輕子 (instance 5, 6): entries in event order, then slot order
+    lepton_mass = m[:, lepton_slots]
+    lepton_pt = particle_pt[:, lepton_slots]
+    lepton_event = np.repeat(event_index[:, None], len(lepton_slots), axis=1)
+    flavour = classify_leptons(lepton_mass)
+    for name, code, scale in [("electron", 0, 1000), ("muon", 1, 1000), ("tau", 2, 1)]:
+        is_flavour = flavour == code
+        observables[f"{name}_mass"] = (lepton_mass[is_flavour] * scale, lepton_event[is_flavour])
+        observables[f"{name}_pt"] = (lepton_pt[is_flavour], lepton_event[is_flavour])
+
+    # Gamma: 8 粒子事件的第二個光子記為 0
+    has_second_gamma = n_particles == 9
+    gamma_mass = m[:, gamma_slots]
+    gamma_pt = particle_pt[:, gamma_slots]
+    gamma_mass[~has_second_gamma, 1] = 0.0
+    gamma_pt[~has_second_gamma, 1] = 0.0
+    gamma_event = np.repeat(event_index[:, None], len(gamma_slots), axis=1)
+    observables["gamma_mass"] = (gamma_mass.ravel(), gamma_event.ravel())
+    observables["gamma_pt"] = (gamma_pt.ravel(), gamma_event.ravel())
+
+    g1, g2 = gamma_slots
+    gamma_dr = np.where(has_second_gamma, delta_r(x[:, g1], y[:, g1], z[:, g1], x[:, g2], y[:, g2], z[:, g2]), np.nan)
+    observables["gamma_dr"] = (gamma_dr, event_index)
+
+    l1, l2 = lepton_slots
+    lepton_dr = delta_r(x[:, l1], y[:, l1], z[:, l1], x[:, l2], y[:, l2], z[:, l2])
+    for name, code in [("electron", 0), ("muon", 1)]:
+        same_flavour = (flavour[:, 0] == code) & (flavour[:, 1] == code)
+        observables[f"{name}_dr"] = (lepton_dr[same_flavour], event_index[same_flavour])
+    observables["gamma_dr_zoom"] = observables["gamma_dr"]
+
+    summary = {
+        "total_events": len(counts),
+        "skipped_events": int(len(counts) - selected.sum()),
+        "mismatched_events": int((~consistent).sum()),
+        "eight_particle_events": int((selected & (counts == 8)).sum()),
+        "unknown_lepton_count": int((flavour == -1).sum()),
+    }
+    return observables, summary
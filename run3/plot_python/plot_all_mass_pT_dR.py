@@ -1,39 +1,51 @@
-import uproot
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
-from matplotlib.lines import Line2D
 import os
+import argparse
 import ROOT  # 導入 PyROOT 用於 TLorentzVector
+import result_cache
+from result_cache import cache_path, histogram_results, save_results
+from samples import discover_groups, observable_specs, groups, rootfile_dir
+from stage_cache import StageCache
+from event_reader import kinematic_branches, read_branches
+from prefetch import Prefetcher
+from render import add_output_arguments, configure_output, figure_filenames, finish_output, render_group
+from event_loop_jit import jit_observables
+from kinematics import composite_observables
+from anomaly_index import index_file
+from topology import extract_resolved, mother_branch, pdgid_branch, topology_branches
+from validate import ValidationCache
 
 # 檢查並創建 pic 文件夾
 output_dir = "pic"
 if not os.path.exists(output_dir):
     os.makedirs(output_dir)
 
-# 定義文件分組
-base_path = "/eos/home-p/pelai/HZa/ALP/gridpacks/check_LHE/run3/rootfile"
-ma_0p1_0p9_files = [
-    "ALP_M0p1.root", "ALP_M0p2.root", "ALP_M0p3.root", "ALP_M0p4.root", "ALP_M0p5.root",
-    "ALP_M0p6.root", "ALP_M0p7.root", "ALP_M0p8.root", "ALP_M0p9.root"
-]
-ma_1_30_files = [
-    "ALP_M1.root", "ALP_M2.root", "ALP_M3.root", "ALP_M4.root", "ALP_M5.root",
-    "ALP_M6.root", "ALP_M7.root", "ALP_M8.root", "ALP_M9.root", "ALP_M10.root",
-    "ALP_M15.root", "ALP_M20.root", "ALP_M25.root", "ALP_M30.root"
-]
+# 定義文件分組 (campaign: run2 / run2_zebing / run3)
+campaign = "run3"
+base_path = rootfile_dir(campaign)
+ma_0p1_0p9_files = groups["ma_0p1_0p9"]["files"]
+ma_1_30_files = groups["ma_1_30"]["files"]
+# 暫存到本地的文件路徑 (stage_cache.py); 未暫存或暫存失敗的文件直接讀 base_path
+staged_paths = {}
 
 # 設置全局刻度字體大小
 plt.rcParams['xtick.labelsize'] = 20
 plt.rcParams['ytick.labelsize'] = 20
 
-# 定義顏色
-colors = [
-    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
-    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
-    '#aec7e8', '#ffbb78', '#98df8a', '#ff9896'
+# 事件迴圈後端: "python" (逐事件 Python 迴圈)、"jit" (event_loop_jit.py, 無 numba 時以 Python 執行同一核心)
+# 或 "resolved" (粒子角色由 pdgid / mother1 決定, topology.py)
+backend = "python"
+observable_names = [
+    "higgs_mass", "alp_mass", "z_mass", "electron_mass", "muon_mass", "tau_mass", "gamma_mass",
+    "higgs_pt", "alp_pt", "z_pt", "electron_pt", "muon_pt", "tau_pt", "gamma_pt",
+    "gamma_dr", "electron_dr", "muon_dr",
 ]
 
+def input_path(filename):
+    return staged_paths.get(filename, os.path.join(base_path, filename))
+
 # 定義繪圖函數
 def plot_mass_and_pt_distributions(file_list, ma_range, mass_output_filename, pt_output_filename, dr_output_filename, alp_mass_range):
     # 初始化每個文件的質量、pT 和 ΔR 數據
@@ -54,6 +66,7 @@ def plot_mass_and_pt_distributions(file_list, ma_range, mass_output_filename, pt
     gamma_dr_list = []
     electron_dr_list = []
     muon_dr_list = []
+    composite_lists = {}  # 粒子系統質量及 η/φ/y (kinematics.py)
 
     # 輕子質量範圍（電子和 μ子使用 MeV/c²，τ子使用 GeV/c²）
     electron_mass_range = (0.4, 0.6)  # ~0.511 MeV/c²
@@ -64,8 +77,13 @@ def plot_mass_and_pt_distributions(file_list, ma_range, mass_output_filename, pt
     total_events = 0
     skipped_events = 0
     unknown_lepton_count = 0
-    for filename in file_list:
-        file_path = os.path.join(base_path, filename)
+    processed_labels = []
+    # 文件驗證結果 (validate.py), 按文件大小 / 修改時間緩存
+    validation = ValidationCache(campaign)
+    # 背景線程預先讀取下一個文件 (prefetch.py)
+    branch_names = kinematic_branches + topology_branches if backend == "resolved" else kinematic_branches
+    prefetcher = Prefetcher(lambda filename: read_branches(input_path(filename), branch_names), file_list)
+    for filename, branches, error in prefetcher:
         # 為該文件初始化數據列表
         higgs_mass = []
         alp_mass = []
@@ -85,19 +103,41 @@ def plot_mass_and_pt_distributions(file_list, ma_range, mass_output_filename, pt
         electron_dr = []
         muon_dr = []
         try:
-            with uproot.open(file_path) as file:
-                tree = file["events"]
-                masses = tree["mass"].array(library="np")
-                px = tree["px"].array(library="np")
-                py = tree["py"].array(library="np")
-                pz = tree["pz"].array(library="np")
-                energy = tree["energy"].array(library="np")  # 讀取 energy 分支
-                total_events += len(masses)
-                print(f"Processing {filename}: {len(masses)} events")
-
+            if error is not None:
+                raise error
+            masses = branches["mass"]
+            px = branches["px"]
+            py = branches["py"]
+            pz = branches["pz"]
+            energy = branches["energy"]  # 讀取 energy 分支
+            total_events += len(masses)
+            print(f"Processing {filename}: {len(masses)} events")
+            # 已驗證為乾淨的文件各分支長度一致，跳過逐事件的長度檢查
+            validated = validation.validated_branches(os.path.join(base_path, filename))
+            # 記錄異常事件 (8 粒子、未知輕子、長度不符) 的索引，之後可按位置取出 (anomaly_index.py);
+            # 文件未改變時沿用已有的索引
+            index_file(os.path.join(base_path, filename), filename, campaign, branches, validated)
+
+            pdgid = branches.get(pdgid_branch)
+            mother = branches.get(mother_branch)
+            if backend in ("jit", "resolved"):
+                if backend == "jit":
+                    # 編譯後端 (event_loop_jit.py)，結果與下面的 Python 迴圈相同
+                    file_observables, summary = jit_observables(masses, px, py, pz, energy, validated)
+                else:
+                    # 由 pdgid / mother1 決定粒子角色，不依賴 instance 位置 (topology.py)
+                    file_observables, summary = extract_resolved(branches, validated)
+                (higgs_mass, alp_mass, z_mass, electron_mass, muon_mass, tau_mass, gamma_mass,
+                 higgs_pt, alp_pt, z_pt, electron_pt, muon_pt, tau_pt, gamma_pt,
+                 gamma_dr, electron_dr, muon_dr) = [file_observables[name][0] for name in observable_names]
+                skipped_events += summary["skipped_events"]
+                unknown_lepton_count += summary["unknown_lepton_count"]
+                print(f"{filename}: {summary['eight_particle_events']} events with 8 masses, "
+                      f"{summary['mismatched_events']} with mismatched lengths, {summary['unknown_lepton_count']} unknown leptons")
+            else:
                 # 遍歷每個事件
                 for i, (event_masses, event_px, event_py, event_pz, event_energy) in enumerate(zip(masses, px, py, pz, energy)):
-                    if len(event_masses) != len(event_px) or len(event_masses) != len(event_py) or len(event_masses) != len(event_pz) or len(event_masses) != len(event_energy):
+                    if not validated and (len(event_masses) != len(event_px) or len(event_masses) != len(event_py) or len(event_masses) != len(event_pz) or len(event_masses) != len(event_energy)):
                         print(f"Warning: Event {i} in {filename} has mismatched lengths: masses={len(event_masses)}, px={len(event_px)}, py={len(event_py)}, pz={len(event_pz)}, energy={len(event_energy)}")
                         skipped_events += 1
                         continue
@@ -217,6 +257,9 @@ def plot_mass_and_pt_distributions(file_list, ma_range, mass_output_filename, pt
             gamma_dr_list.append(np.array(gamma_dr))
             electron_dr_list.append(np.array(electron_dr))
             muon_dr_list.append(np.array(muon_dr))
+            for name, (values, _) in composite_observables(masses, px, py, pz, energy, pdgid, mother, validated).items():
+                composite_lists.setdefault(name, []).append(values)
+            processed_labels.append(filename.replace("ALP_", "").replace(".root", ""))
         except Exception as e:
             print(f"Error processing {filename}: {e}")
 
@@ -224,262 +267,71 @@ def plot_mass_and_pt_distributions(file_list, ma_range, mass_output_filename, pt
     print(f"Total events processed: {total_events}")
     print(f"Total skipped events: {skipped_events}")
     print(f"Total unknown lepton masses: {unknown_lepton_count}")
-
-    # 繪製質量分布圖
-    fig_mass, axes_mass = plt.subplots(3, 3, figsize=(24, 18))
-    axes_mass = axes_mass.flatten()
-
-    # Higgs mass
-    handles_mass0 = []
-    for i, (higgs_mass, filename) in enumerate(zip(higgs_mass_list, file_list)):
-        if len(higgs_mass) > 0:
-            axes_mass[0].hist(higgs_mass, bins=100, range=(120, 130), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_mass0.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_mass[0].set_title("Higgs Mass Distribution", fontsize=18)
-    axes_mass[0].set_xlabel("Higgs Mass (GeV)", fontsize=24)
-    axes_mass[0].set_ylabel("A.U.", fontsize=24)
-    axes_mass[0].legend(handles=handles_mass0, fontsize=14, handlelength=2, ncol=2)
-
-    # ALP mass
-    handles_mass1 = []
-    for i, (alp_mass, filename) in enumerate(zip(alp_mass_list, file_list)):
-        if len(alp_mass) > 0:
-            axes_mass[1].hist(alp_mass, bins=100, range=alp_mass_range, histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_mass1.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_mass[1].set_title(f"ALP Mass Distribution (ma {ma_range})", fontsize=18)
-    axes_mass[1].set_xlabel("ALP Mass (GeV)", fontsize=24)
-    axes_mass[1].set_ylabel("A.U.", fontsize=24)
-    axes_mass[1].legend(handles=handles_mass1, fontsize=14, handlelength=2, ncol=2)
-
-    # Z mass
-    handles_mass2 = []
-    for i, (z_mass, filename) in enumerate(zip(z_mass_list, file_list)):
-        if len(z_mass) > 0:
-            axes_mass[2].hist(z_mass, bins=25, range=(70, 110), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_mass2.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_mass[2].set_title("Z Mass Distribution", fontsize=18)
-    axes_mass[2].set_xlabel("Z boson Mass (GeV)", fontsize=24)
-    axes_mass[2].set_ylabel("A.U.", fontsize=24)
-    axes_mass[2].legend(handles=handles_mass2, fontsize=14, handlelength=2, ncol=2)
-
-    # Electron mass
-    handles_mass3 = []
-    for i, (electron_mass, filename) in enumerate(zip(electron_mass_list, file_list)):
-        if len(electron_mass) > 0:
-            axes_mass[3].hist(electron_mass, bins=100, range=(0.4, 0.6), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_mass3.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_mass[3].set_title("Electron Mass Distribution", fontsize=18)
-    axes_mass[3].set_xlabel("e Mass (MeV)", fontsize=24)
-    axes_mass[3].set_ylabel("A.U.", fontsize=24)
-    axes_mass[3].legend(handles=handles_mass3, fontsize=14, handlelength=2, ncol=2)
-
-    # Muon mass
-    handles_mass4 = []
-    for i, (muon_mass, filename) in enumerate(zip(muon_mass_list, file_list)):
-        if len(muon_mass) > 0:
-            axes_mass[4].hist(muon_mass, bins=100, range=(90, 120), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_mass4.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_mass[4].set_title("Muon Mass Distribution", fontsize=18)
-    axes_mass[4].set_xlabel(r"$\mu \ Mass (MeV)$", fontsize=24)
-    axes_mass[4].set_ylabel("A.U.", fontsize=24)
-    axes_mass[4].legend(handles=handles_mass4, fontsize=14, handlelength=2, ncol=2)
-
-    # Tau mass
-    handles_mass5 = []
-    for i, (tau_mass, filename) in enumerate(zip(tau_mass_list, file_list)):
-        if len(tau_mass) > 0:
-            axes_mass[5].hist(tau_mass, bins=100, range=(1.7, 1.9), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_mass5.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_mass[5].set_title("Tau Mass Distribution", fontsize=24)
-    axes_mass[5].set_xlabel(r"$\tau \ Mass (GeV)$", fontsize=24)
-    axes_mass[5].set_ylabel("A.U.", fontsize=18)
-    axes_mass[5].legend(handles=handles_mass5, fontsize=14, handlelength=2, ncol=2)
-
-    # Gamma mass
-    handles_mass6 = []
-    for i, (gamma_mass, filename) in enumerate(zip(gamma_mass_list, file_list)):
-        if len(gamma_mass) > 0:
-            axes_mass[6].hist(gamma_mass, bins=100, range=(0, 1), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_mass6.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_mass[6].set_title("Gamma Mass Distribution", fontsize=18)
-    axes_mass[6].set_xlabel(r"$\gamma \ Mass (GeV)$", fontsize=24)
-    axes_mass[6].set_ylabel("A.U.", fontsize=24)
-    axes_mass[6].legend(handles=handles_mass6, fontsize=14, handlelength=2, ncol=2)
-
-    # 移除空白子圖
-    axes_mass[7].axis('off')
-    axes_mass[8].axis('off')
-
-    # 保存質量圖
-    plt.figure(fig_mass.number)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, mass_output_filename))
-    plt.close(fig_mass)
-
-    # 繪製 pT 分布圖
-    fig_pt, axes_pt = plt.subplots(3, 3, figsize=(24, 18))
-    axes_pt = axes_pt.flatten()
-
-    # Higgs pT
-    handles_pt0 = []
-    for i, (higgs_pt, filename) in enumerate(zip(higgs_pt_list, file_list)):
-        if len(higgs_pt) > 0:
-            axes_pt[0].hist(higgs_pt, bins=25, range=(0, 200), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_pt0.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_pt[0].set_title("Higgs pT Distribution", fontsize=18)
-    axes_pt[0].set_xlabel("Higgs pT (GeV)", fontsize=24)
-    axes_pt[0].set_ylabel("A.U.", fontsize=24)
-    axes_pt[0].legend(handles=handles_pt0, fontsize=14, handlelength=2, ncol=2)
-
-    # ALP pT
-    handles_pt1 = []
-    for i, (alp_pt, filename) in enumerate(zip(alp_pt_list, file_list)):
-        if len(alp_pt) > 0:
-            axes_pt[1].hist(alp_pt, bins=25, range=(0, 50), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_pt1.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_pt[1].set_title(f"ALP pT Distribution (ma {ma_range})", fontsize=18)
-    axes_pt[1].set_xlabel("ALP pT (GeV)", fontsize=24)
-    axes_pt[1].set_ylabel("A.U.", fontsize=24)
-    axes_pt[1].legend(handles=handles_pt1, fontsize=14, handlelength=2, ncol=2)
-
-    # Z pT
-    handles_pt2 = []
-    for i, (z_pt, filename) in enumerate(zip(z_pt_list, file_list)):
-        if len(z_pt) > 0:
-            axes_pt[2].hist(z_pt, bins=25, range=(0, 80), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_pt2.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_pt[2].set_title("Z pT Distribution", fontsize=18)
-    axes_pt[2].set_xlabel("Z boson pT (GeV)", fontsize=24)
-    axes_pt[2].set_ylabel("A.U.", fontsize=24)
-    axes_pt[2].legend(handles=handles_pt2, fontsize=14, handlelength=2, ncol=2)
-
-    # Electron pT
-    handles_pt3 = []
-    for i, (electron_pt, filename) in enumerate(zip(electron_pt_list, file_list)):
-        if len(electron_pt) > 0:
-            axes_pt[3].hist(electron_pt, bins=25, range=(0, 90), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_pt3.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_pt[3].set_title("Electron pT Distribution", fontsize=18)
-    axes_pt[3].set_xlabel("e pT (GeV)", fontsize=24)
-    axes_pt[3].set_ylabel("A.U.", fontsize=24)
-    axes_pt[3].legend(handles=handles_pt3, fontsize=14, handlelength=2, ncol=2)
-
-    # Muon pT
-    handles_pt4 = []
-    for i, (muon_pt, filename) in enumerate(zip(muon_pt_list, file_list)):
-        if len(muon_pt) > 0:
-            axes_pt[4].hist(muon_pt, bins=25, range=(0, 90), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_pt4.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_pt[4].set_title("Muon pT Distribution", fontsize=18)
-    axes_pt[4].set_xlabel(r"$\mu \ pT (GeV)$", fontsize=24)
-    axes_pt[4].set_ylabel("A.U.", fontsize=24)
-    axes_pt[4].legend(handles=handles_pt4, fontsize=14, handlelength=2, ncol=2)
-
-    # Tau pT
-    handles_pt5 = []
-    for i, (tau_pt, filename) in enumerate(zip(tau_pt_list, file_list)):
-        if len(tau_pt) > 0:
-            axes_pt[5].hist(tau_pt, bins=25, range=(0, 90), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_pt5.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_pt[5].set_title("Tau pT Distribution", fontsize=18)
-    axes_pt[5].set_xlabel(r"$\tau \ pT (GeV)$", fontsize=24)
-    axes_pt[5].set_ylabel("A.U.", fontsize=24)
-    axes_pt[5].legend(handles=handles_pt5, fontsize=14, handlelength=2, ncol=2)
-
-    # Gamma pT
-    handles_pt6 = []
-    for i, (gamma_pt, filename) in enumerate(zip(gamma_pt_list, file_list)):
-        if len(gamma_pt) > 0:
-            axes_pt[6].hist(gamma_pt, bins=25, range=(0, 30), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_pt6.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_pt[6].set_title("Gamma pT Distribution", fontsize=18)
-    axes_pt[6].set_xlabel(r"$\gamma \ pT (GeV)$", fontsize=24)
-    axes_pt[6].set_ylabel("A.U.", fontsize=24)
-    axes_pt[6].legend(handles=handles_pt6, fontsize=14, handlelength=2, ncol=2)
-
-    # 移除空白子圖
-    axes_pt[7].axis('off')
-    axes_pt[8].axis('off')
-
-    # 保存 pT 圖
-    plt.figure(fig_pt.number)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, pt_output_filename))
-    plt.close(fig_pt)
-
-    # 繪製 ΔR 分布圖
-    fig_dr, axes_dr = plt.subplots(1, 3, figsize=(24, 6))
-    axes_dr = axes_dr.flatten()
-
-    # Gamma ΔR
-    handles_dr0 = []
-    for i, (gamma_dr, filename) in enumerate(zip(gamma_dr_list, file_list)):
-        if len(gamma_dr) > 0:
-            axes_dr[0].hist(gamma_dr, bins=25, range=(0, 5), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_dr0.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_dr[0].set_title(f"Gamma ΔR Distribution (ma {ma_range})", fontsize=18)
-    axes_dr[0].set_xlabel(r"$\Delta R(\gamma1, \gamma2)$", fontsize=24)
-    axes_dr[0].set_ylabel("A.U.", fontsize=24)
-    axes_dr[0].legend(handles=handles_dr0, fontsize=14, handlelength=2, ncol=2)
-
-    # Electron ΔR
-    handles_dr1 = []
-    for i, (electron_dr, filename) in enumerate(zip(electron_dr_list, file_list)):
-        if len(electron_dr) > 0:
-            axes_dr[1].hist(electron_dr, bins=25, range=(0, 5), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_dr1.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_dr[1].set_title(f"Electron ΔR Distribution (ma {ma_range})", fontsize=18)
-    axes_dr[1].set_xlabel(r"$\Delta R(e1, e2)$", fontsize=24)
-    axes_dr[1].set_ylabel("A.U.", fontsize=24)
-    axes_dr[1].legend(handles=handles_dr1, fontsize=14, handlelength=2, ncol=2)
-
-    # Muon ΔR
-    handles_dr2 = []
-    for i, (muon_dr, filename) in enumerate(zip(muon_dr_list, file_list)):
-        if len(muon_dr) > 0:
-            axes_dr[2].hist(muon_dr, bins=25, range=(0, 5), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_dr2.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # axes_dr[2].set_title(f"Muon ΔR Distribution (ma {ma_range})", fontsize=18)
-    axes_dr[2].set_xlabel(r"$\Delta R(\mu1, \mu2)$", fontsize=24)
-    axes_dr[2].set_ylabel("A.U.", fontsize=24)
-    axes_dr[2].legend(handles=handles_dr2, fontsize=14, handlelength=2, ncol=2)
-
-    # 保存 ΔR 圖
-    plt.figure(fig_dr.number)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, dr_output_filename))
-    plt.close(fig_dr)
-
-    # 繪製 Gamma ΔR 放大圖 (範圍 0-1)
-    fig_gamma_dr_zoom, ax_gamma_dr_zoom = plt.subplots(figsize=(8, 6))
-    handles_gamma_dr_zoom = []
-    for i, (gamma_dr, filename) in enumerate(zip(gamma_dr_list, file_list)):
-        if len(gamma_dr) > 0:
-            ax_gamma_dr_zoom.hist(gamma_dr, bins=25, range=(0, 1), histtype='step', density=True, color=colors[i], linewidth=2.0)
-            handles_gamma_dr_zoom.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=filename.replace("ALP_", "").replace(".root", "")))
-    # ax_gamma_dr_zoom.set_title(f"Gamma ΔR Distribution (ma {ma_range}, Zoomed)", fontsize=18)
-    ax_gamma_dr_zoom.set_xlabel(r"$\Delta R(\gamma1, \gamma2)$", fontsize=24)
-    ax_gamma_dr_zoom.set_ylabel("A.U.", fontsize=24)
-    ax_gamma_dr_zoom.legend(handles=handles_gamma_dr_zoom, fontsize=14, handlelength=2, ncol=2)
-    plt.tight_layout()
-    gamma_zoom_output_filename = dr_output_filename.replace(".pdf", "_gamma_zoom.pdf")
-    plt.savefig(os.path.join(output_dir, gamma_zoom_output_filename))
-    plt.close(fig_gamma_dr_zoom)
-
-# 繪製質量、pT 和 ΔR 圖
-plot_mass_and_pt_distributions(
-    ma_0p1_0p9_files,
-    ma_range="0.1-0.9 GeV",
-    mass_output_filename="mass_distributions_ma_0p1_0p9.pdf",
-    pt_output_filename="pt_distributions_ma_0p1_0p9.pdf",
-    dr_output_filename="dr_distributions_ma_0p1_0p9.pdf",
-    alp_mass_range=(0, 1)
-)
-plot_mass_and_pt_distributions(
-    ma_1_30_files,
-    ma_range="1-30 GeV",
-    mass_output_filename="mass_distributions_ma_1_30.pdf",
-    pt_output_filename="pt_distributions_ma_1_30.pdf",
-    dr_output_filename="dr_distributions_ma_1_30.pdf",
-    alp_mass_range=(0, 35)
-)
\ No newline at end of file
+    prefetcher.report()
+    validation.save()
+
+    # 保存直方圖結果，供不同 campaign 比較 (compare_campaigns.py)
+    group = mass_output_filename.replace("mass_distributions_", "").replace(".pdf", "")
+    results = histogram_results({
+        "higgs_mass": higgs_mass_list, "alp_mass": alp_mass_list, "z_mass": z_mass_list,
+        "electron_mass": electron_mass_list, "muon_mass": muon_mass_list, "tau_mass": tau_mass_list,
+        "gamma_mass": gamma_mass_list,
+        "higgs_pt": higgs_pt_list, "alp_pt": alp_pt_list, "z_pt": z_pt_list,
+        "electron_pt": electron_pt_list, "muon_pt": muon_pt_list, "tau_pt": tau_pt_list,
+        "gamma_pt": gamma_pt_list,
+        "gamma_dr": gamma_dr_list, "electron_dr": electron_dr_list, "muon_dr": muon_dr_list,
+        "gamma_dr_zoom": gamma_dr_list,
+        **composite_lists,
+    }, processed_labels, observable_specs(alp_mass_range))
+    save_results(cache_path(campaign, group), results, meta={
+        "campaign": campaign, "group": group, "ma_range": ma_range,
+        "total_events": total_events, "skipped_events": skipped_events,
+        "unknown_lepton_count": unknown_lepton_count,
+    })
+
+    # 由直方圖結果繪製質量、pT 和 ΔR 圖 (render.py)
+    render_group(results, figure_filenames(mass_output_filename, pt_output_filename, dr_output_filename))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default=campaign, help="run2, run2_zebing or run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--stage", action="store_true", help="copy the input files to a local scratch cache first")
+    parser.add_argument("--backend", choices=["python", "jit", "resolved"], default=backend,
+                        help="event loop backend (resolved: particle roles from pdgid / mother1)")
+    parser.add_argument("--fixed-lists", action="store_true", help="use the file lists of samples.py instead of the files found in base_path")
+    parser.add_argument("--cache-format", choices=["npz", "root", "h5"], default=result_cache.cache_format,
+                        help="file format of the histogram cache")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    configure_output(args)
+    result_cache.cache_format = args.cache_format
+    campaign = args.campaign
+    backend = args.backend
+    base_path = args.base_path or rootfile_dir(campaign)
+    if not args.fixed_lists:
+        # 由文件名自動發現質量點 (ALP_M0p1.root ... ALP_M30.root)
+        discovered = discover_groups(base_path)
+        ma_0p1_0p9_files = discovered["ma_0p1_0p9"]
+        ma_1_30_files = discovered["ma_1_30"]
+    if args.stage:
+        staged_paths = StageCache().stage_files(base_path, ma_0p1_0p9_files + ma_1_30_files)
+
+    # 繪製質量、pT 和 ΔR 圖
+    plot_mass_and_pt_distributions(
+        ma_0p1_0p9_files,
+        ma_range="0.1-0.9 GeV",
+        mass_output_filename="mass_distributions_ma_0p1_0p9.pdf",
+        pt_output_filename="pt_distributions_ma_0p1_0p9.pdf",
+        dr_output_filename="dr_distributions_ma_0p1_0p9.pdf",
+        alp_mass_range=(0, 1)
+    )
+    plot_mass_and_pt_distributions(
+        ma_1_30_files,
+        ma_range="1-30 GeV",
+        mass_output_filename="mass_distributions_ma_1_30.pdf",
+        pt_output_filename="pt_distributions_ma_1_30.pdf",
+        dr_output_filename="dr_distributions_ma_1_30.pdf",
+        alp_mass_range=(0, 35)
+    )
+    finish_output()
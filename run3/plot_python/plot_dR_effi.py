@@ -1,41 +1,38 @@
 import uproot
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.lines import Line2D
 import os
+import argparse
 import ROOT
+from event_loop_jit import jit_gamma_dr
+from render import add_output_arguments, configure_output, finish_output, render_efficiency
+import result_cache
+from result_cache import cache_path, save_results
+from samples import discover_groups, groups, rootfile_dir
 
 # Create pic folder
 output_dir = "pic"
 if not os.path.exists(output_dir):
     os.makedirs(output_dir)
 
-# File groups
-base_path = "/eos/home-p/pelai/HZa/ALP/gridpacks/check_LHE/run3/rootfile"
-ma_0p1_0p9_files = [
-    "ALP_M0p1.root", "ALP_M0p2.root", "ALP_M0p3.root", "ALP_M0p4.root", "ALP_M0p5.root",
-    "ALP_M0p6.root", "ALP_M0p7.root", "ALP_M0p8.root", "ALP_M0p9.root"
-]
-ma_1_30_files = [
-    "ALP_M1.root", "ALP_M2.root", "ALP_M3.root", "ALP_M4.root", "ALP_M5.root",
-    "ALP_M6.root", "ALP_M7.root", "ALP_M8.root", "ALP_M9.root", "ALP_M10.root",
-    "ALP_M15.root", "ALP_M20.root", "ALP_M25.root", "ALP_M30.root"
-]
+# File groups (samples.py); by default replaced by the mass points found in base_path
+campaign = "run3"
+base_path = rootfile_dir(campaign)
+ma_0p1_0p9_files = groups["ma_0p1_0p9"]["files"]
+ma_1_30_files = groups["ma_1_30"]["files"]
 
 # Set global tick font size
 plt.rcParams['xtick.labelsize'] = 20
 plt.rcParams['ytick.labelsize'] = 20
 
-# Colors
-colors = [
-    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
-    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
-    '#aec7e8', '#ffbb78', '#98df8a', '#ff9896'
-]
+# Event loop backend: "python" or "jit" (event_loop_jit.py; runs the same kernel in Python without numba)
+backend = "python"
+
+# ΔR ranges of the proportion bar plot
+dr_ranges = [(0, 0.1), (0.1, 0.3), (0.3, np.inf)]
 
 def plot_gamma_dr_events_and_bins(file_list, ma_range, events_output_filename, events_extended_output_filename, bin_output_filename):
     gamma_dr_list = []
-    total_valid_events_list = []
     labels = [f.replace("ALP_", "").replace(".root", "") for f in file_list]
 
     # Process files
@@ -52,116 +49,97 @@ def plot_gamma_dr_events_and_bins(file_list, ma_range, events_output_filename, e
                 total_events = len(px)
                 print(f"Processing {filename}: {total_events} events")
 
-                for i, (event_px, event_py, event_pz, event_energy) in enumerate(zip(px, py, pz, energy)):
-                    if len(event_px) in [8, 9]:
-                        v1 = ROOT.TLorentzVector()
-                        v2 = ROOT.TLorentzVector()
-                        v1.SetPxPyPzE(event_px[7], event_py[7], event_pz[7], event_energy[7])
-                        if len(event_px) == 9:
-                            v2.SetPxPyPzE(event_px[8], event_py[8], event_pz[8], event_energy[8])
-                            gamma_dr.append(v1.DeltaR(v2))
+                if backend == "jit":
+                    # Compiled event loop (event_loop_jit.py), same result as the loop below
+                    gamma_dr, skipped = jit_gamma_dr(px, py, pz)
+                    if skipped:
+                        print(f"Warning: {skipped} events in {filename} do not have 8 or 9 particles, skipping.")
+                else:
+                    for i, (event_px, event_py, event_pz, event_energy) in enumerate(zip(px, py, pz, energy)):
+                        if len(event_px) in [8, 9]:
+                            v1 = ROOT.TLorentzVector()
+                            v2 = ROOT.TLorentzVector()
+                            v1.SetPxPyPzE(event_px[7], event_py[7], event_pz[7], event_energy[7])
+                            if len(event_px) == 9:
+                                v2.SetPxPyPzE(event_px[8], event_py[8], event_pz[8], event_energy[8])
+                                gamma_dr.append(v1.DeltaR(v2))
+                            else:
+                                gamma_dr.append(np.nan)  # Events with 8 particles have no second photon
                         else:
-                            gamma_dr.append(np.nan)  # Events with 8 particles have no second photon
-                    else:
-                        print(f"Warning: Event {i} in {filename} has {len(event_px)} particles, skipping.")
-                        continue
+                            print(f"Warning: Event {i} in {filename} has {len(event_px)} particles, skipping.")
+                            continue
             gamma_dr_array = np.array(gamma_dr)
             total_valid_events = np.sum(~np.isnan(gamma_dr_array))  # Count events with valid gamma_dr
             print(f"Valid events with gamma_dr in {filename}: {total_valid_events}")
             gamma_dr_list.append(gamma_dr_array)
-            total_valid_events_list.append(total_valid_events)
         except Exception as e:
             print(f"Error processing {filename}: {e}")
             gamma_dr_list.append(np.array([]))
-            total_valid_events_list.append(0)
-
-    # 1. Line plot for efficiency with points (ΔR range 0 to 1.1)
-    dr_bins = np.arange(0, 1.1, 0.1)  # 0 to 1 with step 0.1
-    plt.figure(figsize=(10, 6))
-    handles = []
-    for i, (gamma_dr, label, total_valid) in enumerate(zip(gamma_dr_list, labels, total_valid_events_list)):
-        if len(gamma_dr) > 0 and total_valid > 0:
-            hist, bin_edges = np.histogram(gamma_dr, bins=dr_bins, density=False)
-            events_remaining = total_valid - np.cumsum(hist)  # Events remaining after cut
-            efficiency = events_remaining / total_valid  # Efficiency = remaining events / valid events
-            # Prepend point at ΔR = 0 with efficiency = 1
-            plot_x = np.concatenate(([0], bin_edges[1:]))
-            plot_y = np.concatenate(([1], efficiency))
-            plt.plot(plot_x, plot_y, marker='o', linestyle='-', color=colors[i], linewidth=2.0, markersize=6)
-            handles.append(Line2D([0], [0], color=colors[i], linewidth=2.0, marker='o', markersize=6, label=label))
-    plt.xlabel(r"$\Delta R(\gamma_1, \gamma_2)$ Cut", fontsize=24)
-    plt.ylabel("Efficiency", fontsize=24)
-    plt.legend(handles=handles, fontsize=14, ncol=2)
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, events_output_filename))
-    plt.close()
 
-    # 2. Line plot for efficiency with points (ΔR range 0 to 3.0)
-    dr_bins_extended = np.arange(0, 3.1, 0.1)  # 0 to 3 with step 0.1
-    plt.figure(figsize=(10, 6))
-    handles = []
-    for i, (gamma_dr, label, total_valid) in enumerate(zip(gamma_dr_list, labels, total_valid_events_list)):
-        if len(gamma_dr) > 0 and total_valid > 0:
-            hist, bin_edges = np.histogram(gamma_dr, bins=dr_bins_extended, density=False)
-            events_remaining = total_valid - np.cumsum(hist)  # Events remaining after cut
-            efficiency = events_remaining / total_valid  # Efficiency = remaining events / valid events
-            # Prepend point at ΔR = 0 with efficiency = 1
-            plot_x = np.concatenate(([0], bin_edges[1:]))
-            plot_y = np.concatenate(([1], efficiency))
-            plt.plot(plot_x, plot_y, marker='o', linestyle='-', color=colors[i], linewidth=2.0, markersize=6)
-            handles.append(Line2D([0], [0], color=colors[i], linewidth=2.0, marker='o', markersize=6, label=label))
-    plt.xlabel(r"$\Delta R(\gamma_1, \gamma_2)$ Cut", fontsize=24)
-    plt.ylabel("Efficiency", fontsize=24)
-    plt.legend(handles=handles, fontsize=14, ncol=2)
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, events_extended_output_filename))
-    plt.close()
+    # Cache the ΔR histograms behind the plots, so they can be redrawn without event data (replot.py)
+    results = efficiency_results(gamma_dr_list, labels)
+    group = events_output_filename.replace("gamma_dr_efficiency_", "").replace(".pdf", "")
+    save_results(cache_path(campaign, f"{group}_effi"), results, meta={"campaign": campaign, "group": group, "ma_range": ma_range})
+    render_efficiency(results, {"efficiency": events_output_filename,
+                                "efficiency_extended": events_extended_output_filename,
+                                "bins": bin_output_filename})
 
-    # 3. Bar plot for proportions
-    ranges = [(0, 0.1), (0.1, 0.3), (0.3, np.inf)]
-    range_labels = ["ΔR ≤ 0.1", "0.1 < ΔR ≤ 0.3", "ΔR > 0.3"]
-    proportions = []
-    for gamma_dr in gamma_dr_list:
-        if len(gamma_dr) > 0:
-            valid_dr = gamma_dr[~np.isnan(gamma_dr)]
-            props = []
-            for r_min, r_max in ranges:
-                count = np.sum((valid_dr > r_min) & (valid_dr <= r_max)) if r_max != np.inf else np.sum(valid_dr > r_min)
-                props.append(count / len(valid_dr))
-            proportions.append(props)
-        else:
-            proportions.append([0, 0, 0])
 
-    proportions = np.array(proportions).T  # [range, file]
+def efficiency_results(gamma_dr_list, labels):
+    # ΔR histograms of the efficiency curves (cumulative over the bins) and the
+    # ΔR range proportions, in the format of result_cache.histogram_results.
+    # entries = events with a valid ΔR
+    results = {}
+    for name, dr_bins in [("gamma_dr_effi", np.arange(0, 1.1, 0.1)),  # 0 to 1 with step 0.1
+                          ("gamma_dr_effi_extended", np.arange(0, 3.1, 0.1))]:  # 0 to 3 with step 0.1
+        results[name] = {"edges": dr_bins, "counts": {}, "entries": {}}
+        for gamma_dr, label in zip(gamma_dr_list, labels):
+            results[name]["counts"][label], _ = np.histogram(gamma_dr, bins=dr_bins, density=False)
+            results[name]["entries"][label] = int(np.sum(~np.isnan(gamma_dr)))
+    # Ranges are (r_min, r_max]
+    results["gamma_dr_ranges"] = {"edges": np.array([r[0] for r in dr_ranges] + [dr_ranges[-1][1]]), "counts": {}, "entries": {}}
+    for gamma_dr, label in zip(gamma_dr_list, labels):
+        valid_dr = gamma_dr[~np.isnan(gamma_dr)]
+        results["gamma_dr_ranges"]["counts"][label] = np.array(
+            [np.sum((valid_dr > r_min) & (valid_dr <= r_max)) if r_max != np.inf else np.sum(valid_dr > r_min)
+             for r_min, r_max in dr_ranges])
+        results["gamma_dr_ranges"]["entries"][label] = len(valid_dr)
+    return results
 
-    fig, ax = plt.subplots(figsize=(12, 6))
-    x = np.arange(len(labels))
-    width = 0.25
-    for i, (props, label) in enumerate(zip(proportions, range_labels)):
-        ax.bar(x + i * width, props, width, label=label, color=colors[i % len(colors)])
-    ax.set_xlabel("ALP Mass (GeV)", fontsize=24)
-    ax.set_ylabel("Proportion", fontsize=24)
-    ax.set_xticks(x + width)
-    ax.set_xticklabels(labels, rotation=45)
-    ax.legend(fontsize=14)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, bin_output_filename))
-    plt.close()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["python", "jit"], default=backend, help="event loop backend")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--campaign", default=campaign, help="campaign name of the histogram cache")
+    parser.add_argument("--fixed-lists", action="store_true", help="use the file lists of samples.py instead of the files found in base_path")
+    parser.add_argument("--cache-format", choices=["npz", "root", "h5"], default=result_cache.cache_format,
+                        help="file format of the histogram cache")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    configure_output(args)
+    result_cache.cache_format = args.cache_format
+    backend = args.backend
+    campaign = args.campaign
+    base_path = args.base_path or rootfile_dir(campaign)
+    if not args.fixed_lists:
+        # Mass points found from the file names (ALP_M0p1.root ... ALP_M30.root)
+        discovered = discover_groups(base_path)
+        ma_0p1_0p9_files = discovered["ma_0p1_0p9"]
+        ma_1_30_files = discovered["ma_1_30"]
 
-# Generate plots
-plot_gamma_dr_events_and_bins(
-    ma_0p1_0p9_files,
-    ma_range="0.1-0.9 GeV",
-    events_output_filename="gamma_dr_efficiency_ma_0p1_0p9.pdf",
-    events_extended_output_filename="gamma_dr_efficiency_extended_ma_0p1_0p9.pdf",
-    bin_output_filename="gamma_dr_bins_ma_0p1_0p9.pdf"
-)
-plot_gamma_dr_events_and_bins(
-    ma_1_30_files,
-    ma_range="1-30 GeV",
-    events_output_filename="gamma_dr_efficiency_ma_1_30.pdf",
-    events_extended_output_filename="gamma_dr_efficiency_extended_ma_1_30.pdf",
-    bin_output_filename="gamma_dr_bins_ma_1_30.pdf"
-)
\ No newline at end of file
+    # Generate plots
+    plot_gamma_dr_events_and_bins(
+        ma_0p1_0p9_files,
+        ma_range="0.1-0.9 GeV",
+        events_output_filename="gamma_dr_efficiency_ma_0p1_0p9.pdf",
+        events_extended_output_filename="gamma_dr_efficiency_extended_ma_0p1_0p9.pdf",
+        bin_output_filename="gamma_dr_bins_ma_0p1_0p9.pdf"
+    )
+    plot_gamma_dr_events_and_bins(
+        ma_1_30_files,
+        ma_range="1-30 GeV",
+        events_output_filename="gamma_dr_efficiency_ma_1_30.pdf",
+        events_extended_output_filename="gamma_dr_efficiency_extended_ma_1_30.pdf",
+        bin_output_filename="gamma_dr_bins_ma_1_30.pdf"
+    )
+    finish_output()
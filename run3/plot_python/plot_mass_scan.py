@@ -0,0 +1,103 @@
+import argparse
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+from hist_stats import binned_efficiency, binned_summary
+from render import mass_panels, pt_panels, dr_panels
+from result_cache import cache_dir, cache_formats, find_cache, load_results
+from samples import groups, mass_from_label
+
+# Summary of a dense mass scan: per-observable statistics (mean, median with
+# 68% / 95% bands) and ΔR(γγ) cut efficiencies against the ALP mass, instead
+# of overlaying hundreds of curves. Reads the histogram caches of all groups.
+
+output_dir = "pic"
+dr_cuts = [0.1, 0.2, 0.3, 0.4]
+
+
+def scan_results(campaign, directory=cache_dir, formats=cache_formats):
+    # Observable -> list of (mass, counts, edges) over all groups, sorted by mass
+    scan = {}
+    for group in groups:
+        path = find_cache(campaign, group, directory, formats)
+        if path is None:
+            print(f"Warning: no {group} cache of {campaign} in {directory}, skipping.")
+            continue
+        results, _ = load_results(path)
+        for name, hist in results.items():
+            for label, counts in hist["counts"].items():
+                scan.setdefault(name, []).append((mass_from_label(label), counts, hist["edges"]))
+    for entries in scan.values():
+        entries.sort(key=lambda entry: entry[0])
+    return scan
+
+
+def scan_summary(scan):
+    summary = {}
+    for name, entries in scan.items():
+        masses = np.array([mass for mass, _, _ in entries])
+        stats = [binned_summary(counts, edges) for _, counts, edges in entries]
+        summary[name] = {
+            "mass": masses,
+            "mean": np.array([s["mean"] for s in stats]),
+            "quantiles": {p: np.array([s["quantiles"][p] for s in stats]) for p in stats[0]["quantiles"]},
+        }
+    if "gamma_dr" in scan:
+        summary["gamma_dr"]["efficiency"] = {
+            cut: np.array([binned_efficiency(counts, edges, cut) for _, counts, edges in scan["gamma_dr"]])
+            for cut in dr_cuts
+        }
+    return summary
+
+
+def plot_scan_summary(summary, output_filename):
+    # Observables without entries at any mass point (e.g. muon_mass of an electron-only grid) have
+    # only NaN statistics, which cannot be drawn on the log mass axis
+    panels = [(name, xlabel) for name, xlabel, _ in mass_panels + pt_panels + dr_panels
+              if name in summary and np.isfinite(summary[name]["mean"]).any()]
+    with PdfPages(os.path.join(output_dir, output_filename)) as pdf:
+        for name, ylabel in panels:
+            s = summary[name]
+            fig, ax = plt.subplots(figsize=(10, 7))
+            q = s["quantiles"]
+            ax.fill_between(s["mass"], q[0.025], q[0.975], color="#1f77b4", alpha=0.2, label="95%")
+            ax.fill_between(s["mass"], q[0.16], q[0.84], color="#1f77b4", alpha=0.4, label="68%")
+            ax.plot(s["mass"], q[0.5], color="#1f77b4", linewidth=2.0, label="median")
+            ax.plot(s["mass"], s["mean"], color="#d62728", linestyle="--", linewidth=2.0, label="mean")
+            ax.set_xscale("log")
+            ax.set_xlabel("ALP Mass (GeV)", fontsize=24)
+            ax.set_ylabel(ylabel, fontsize=24)
+            ax.legend(fontsize=14)
+            ax.grid(True)
+            plt.tight_layout()
+            pdf.savefig(fig)
+            plt.close(fig)
+        efficiency = summary.get("gamma_dr", {}).get("efficiency", {})
+        if any(np.isfinite(values).any() for values in efficiency.values()):
+            fig, ax = plt.subplots(figsize=(10, 7))
+            for cut, values in efficiency.items():
+                ax.plot(summary["gamma_dr"]["mass"], values, marker='o', linewidth=2.0, markersize=4, label=rf"$\Delta R > {cut}$")
+            ax.set_xscale("log")
+            ax.set_xlabel("ALP Mass (GeV)", fontsize=24)
+            ax.set_ylabel("Efficiency", fontsize=24)
+            ax.legend(fontsize=14)
+            ax.grid(True)
+            plt.tight_layout()
+            pdf.savefig(fig)
+            plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--cache-dir", default=cache_dir)
+    parser.add_argument("--format", choices=cache_formats, default=None,
+                        help="only use caches of this format (default: the first one found)")
+    args = parser.parse_args()
+    os.makedirs(output_dir, exist_ok=True)
+    summary = scan_summary(scan_results(args.campaign, args.cache_dir, [args.format] if args.format else cache_formats))
+    plot_scan_summary(summary, f"mass_scan_summary_{args.campaign}.pdf")
+    print(f"Saved mass_scan_summary_{args.campaign}.pdf ({len(summary)} observables)")
@@ -0,0 +1,110 @@
+import argparse
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.lines import Line2D
+
+from event_reader import add_reader_arguments, read_branches, read_weights
+from flat_store import open_store, store_path, weight_matrix
+from hist_fill import envelope, fill_weighted
+from kinematics import event_observables, store_observables
+from prefetch import Prefetcher
+from result_cache import cache_path, save_results
+from samples import colors, discover_groups, file_label, groups, observable_specs, rootfile_dir
+from validate import ValidationCache
+
+# Weighted histograms with the LHE scale / PDF weight variations of every
+# event. The bin index of each entry is computed once and the nominal weight
+# and all variations are accumulated together (hist_fill.fill_weighted).
+
+output_dir = "pic"
+plt.rcParams['xtick.labelsize'] = 20
+plt.rcParams['ytick.labelsize'] = 20
+
+
+def weighted_results(base_path, file_list, specs, campaign=None, roles="fixed", validation=None):
+    # campaign: read through the flat-array stores of flat_store.py instead of uproot;
+    # validation: ValidationCache, files with a clean verdict skip the per-event length check
+    results = {name: {"edges": np.linspace(r[0], r[1], bins + 1), "counts": {}, "entries": {}, "variations": {}}
+               for name, (bins, r) in specs.items()}
+    def load(filename):
+        # Runs in the prefetch thread: reading and extraction of the next file
+        file_path = os.path.join(base_path, filename)
+        if campaign is not None:
+            store = open_store(file_path, store_path(campaign, filename))
+            observables, summary = store_observables(store, roles)
+            return observables, summary, weight_matrix(store)
+        validated = validation.validated_branches(file_path) if validation is not None else ()
+        observables, summary = event_observables(read_branches(file_path, roles=roles), validated)
+        return observables, summary, read_weights(file_path)
+
+    prefetcher = Prefetcher(load, file_list)
+    for filename, data, error in prefetcher:
+        label = file_label(filename)
+        if error is not None:
+            print(f"Error processing {filename}: {error}")
+            continue
+        observables, summary, weights = data
+        print(f"Processing {filename}: {summary['total_events']} events, {weights.shape[1] - 1} weight variations")
+        for name, hist in results.items():
+            values, event_index = observables[name]
+            sums = fill_weighted(values, weights[event_index], hist["edges"])
+            hist["counts"][label] = sums[:, 0]
+            hist["variations"][label] = sums[:, 1:]
+            hist["entries"][label] = int(np.isfinite(values).sum())
+    prefetcher.report()
+    return results
+
+
+def shape(sums, edges):
+    # Normalise every column to unit area ("A.U.")
+    totals = sums.sum(axis=0)
+    return np.divide(sums, totals * np.diff(edges)[:, None], out=np.zeros_like(sums), where=totals > 0)
+
+
+def plot_envelopes(results, output_filename):
+    with PdfPages(os.path.join(output_dir, output_filename)) as pdf:
+        for name, hist in results.items():
+            edges = hist["edges"]
+            fig, ax = plt.subplots(figsize=(10, 7))
+            handles = []
+            for i, label in enumerate(hist["counts"]):
+                color = colors[i % len(colors)]
+                nominal = shape(hist["counts"][label][:, None], edges)[:, 0]
+                ax.hist(edges[:-1], bins=edges, weights=nominal, histtype='step', color=color, linewidth=2.0)
+                low, high = envelope(shape(hist["variations"][label], edges))
+                if low is not None:
+                    ax.fill_between(edges, np.append(low, low[-1]), np.append(high, high[-1]), step="post", color=color, alpha=0.25, linewidth=0)
+                handles.append(Line2D([0], [0], color=color, linewidth=2.0, label=label))
+            ax.set_xlabel(name, fontsize=24)
+            ax.set_ylabel("A.U.", fontsize=24)
+            ax.legend(handles=handles, fontsize=14, handlelength=2, ncol=2)
+            plt.tight_layout()
+            pdf.savefig(fig)
+            plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--flat", action="store_true", help="read through the flat-array stores (flat_store.py)")
+    parser.add_argument("--fixed-lists", action="store_true", help="use the file lists of samples.py instead of the files found in base_path")
+    add_reader_arguments(parser)
+    args = parser.parse_args()
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    os.makedirs(output_dir, exist_ok=True)
+    file_lists = ({group: config["files"] for group, config in groups.items()} if args.fixed_lists
+                  else discover_groups(base_path))
+    validation = ValidationCache(args.campaign)
+    for group, config in groups.items():
+        if not file_lists[group]:
+            continue
+        results = weighted_results(base_path, file_lists[group], observable_specs(config["alp_mass_range"]),
+                                   args.campaign if args.flat else None, args.roles, validation)
+        save_results(cache_path(args.campaign, f"{group}_weighted"), results,
+                     meta={"campaign": args.campaign, "group": group, "ma_range": config["ma_range"], "weighted": True})
+        plot_envelopes(results, f"syst_envelope_{group}.pdf")
+    validation.save()
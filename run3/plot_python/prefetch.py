@@ -0,0 +1,74 @@
+import queue
+import threading
+import time
+
+# Pipelined reading: the next file (or chunk) is loaded in a background thread
+# while the current one is processed. The bounded queue caps the number of
+# loaded-but-unprocessed items, and therefore the memory.
+
+
+class Prefetcher:
+    def __init__(self, loader, items, depth=1):
+        # loader(item) -> data; depth = number of items loaded ahead
+        self.loader = loader
+        self.items = list(items)
+        self.queue = queue.Queue(maxsize=depth)
+        self.load_seconds = 0.0     # time spent in loader (background thread)
+        self.wait_seconds = 0.0     # time the consumer was blocked waiting for data
+        self.process_seconds = 0.0  # time the consumer spent between items
+        self._stop = threading.Event()
+
+    def _produce(self):
+        for item in self.items:
+            if self._stop.is_set():
+                break
+            start = time.perf_counter()
+            try:
+                data, error = self.loader(item), None
+            except Exception as e:
+                data, error = None, e
+            self.load_seconds += time.perf_counter() - start
+            self.queue.put((item, data, error))
+        self.queue.put(None)
+
+    def __iter__(self):
+        # Yields (item, data, error); error is the loader's exception or None
+        thread = threading.Thread(target=self._produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                entry = self.queue.get()
+                self.wait_seconds += time.perf_counter() - start
+                if entry is None:
+                    break
+                start = time.perf_counter()
+                yield entry
+                self.process_seconds += time.perf_counter() - start
+        finally:
+            # Unblock the producer if the consumer stopped early
+            self._stop.set()
+            while thread.is_alive():
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    thread.join(0.05)
+
+    def metrics(self):
+        # Serial reading would have waited load_seconds; the pipeline only waited wait_seconds
+        return {
+            "load_seconds": self.load_seconds,
+            "wait_seconds": self.wait_seconds,
+            "process_seconds": self.process_seconds,
+            "hidden_io_seconds": max(self.load_seconds - self.wait_seconds, 0.0),
+        }
+
+    def report(self):
+        m = self.metrics()
+        print(f"Prefetch: I/O {m['load_seconds']:.2f} s, waited {m['wait_seconds']:.2f} s, "
+              f"processing {m['process_seconds']:.2f} s, I/O wait removed {m['hidden_io_seconds']:.2f} s")
+
+
+def chunk_ranges(n_entries, chunk_size):
+    # (entry_start, entry_stop) pairs covering n_entries
+    return [(start, min(start + chunk_size, n_entries)) for start in range(0, n_entries, chunk_size)]
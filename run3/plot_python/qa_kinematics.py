@@ -0,0 +1,109 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from event_reader import add_reader_arguments, read_branches
+from kinematics import E, four_vectors, mass_squared, system
+from observables import alp_slot, gamma_slots, higgs_slot, lepton_slots, z_slot
+from prefetch import Prefetcher
+from samples import discover_files, file_label, rootfile_dir
+
+# Kinematic QA of the LHE samples, for all events of a file at once:
+#   mass shell:   E² - p² of every particle against its stored mass
+#   conservation: four-momentum of every decay (H -> Z a, a -> γγ, Z -> ℓℓ)
+#                 against the sum of its decay products
+# Residuals are relative to the particle (parent) energy, so the tolerances
+# only have to cover the precision of the LHE record.
+
+output_dir = "pic"
+shell_tolerance = 1e-4         # |m²(E, p) - m²(stored)| / E²
+conservation_tolerance = 1e-6  # max |Σp(daughters) - p(parent)| / E(parent)
+n_worst = 5
+
+particles = {
+    "higgs": [higgs_slot], "alp": [alp_slot], "z": [z_slot],
+    "lepton": lepton_slots, "gamma": gamma_slots,
+}
+decays = {
+    "higgs_to_z_alp": (higgs_slot, [z_slot, alp_slot]),
+    "alp_to_gamma_gamma": (alp_slot, gamma_slots),
+    "z_to_lepton_lepton": (z_slot, lepton_slots),
+}
+
+
+def mass_shell_residuals(p, stored_mass):
+    # (n_events, n_slots) |m²(E, p) - m²(stored)| / E²
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.abs(mass_squared(p) - stored_mass ** 2) / p[..., E] ** 2
+
+
+def conservation_residuals(p, parent, daughters):
+    # (n_events,) max component of Σp(daughters) - p(parent) relative to E(parent);
+    # NaN where a daughter is missing (the second photon of 8-particle events)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        difference = system(p, daughters) - p[:, parent]
+        residual = np.abs(difference).max(axis=-1) / p[:, parent, E]
+    missing = np.isnan(p[:, daughters, E]).any(axis=1)
+    return np.where(missing, np.nan, residual)
+
+
+def check(name, residuals, event_index, tolerance):
+    # Violation summary of one check; residuals (n_events,) or (n_events, n_particles)
+    residuals = residuals.reshape(len(event_index), -1)
+    worst_per_event = np.where(np.isnan(residuals), -np.inf, residuals).max(axis=1)
+    checked = np.isfinite(worst_per_event)
+    violating = checked & (worst_per_event > tolerance)
+    order = np.argsort(-np.where(checked, worst_per_event, -np.inf))[:n_worst]
+    return {
+        "check": name,
+        "checked_events": int(checked.sum()),
+        "violations": int(violating.sum()),
+        "violation_rate": float(violating.sum() / checked.sum()) if checked.any() else np.nan,
+        "max_residual": float(worst_per_event[checked].max()) if checked.any() else np.nan,
+        "worst_events": [(int(event_index[i]), float(worst_per_event[i])) for i in order if checked[i]],
+    }
+
+
+def qa_file(branches):
+    p, stored_mass, event_index = four_vectors(branches)
+    shell = mass_shell_residuals(p, stored_mass)
+    rows = [check(f"mass_shell_{name}", shell[:, slots], event_index, shell_tolerance)
+            for name, slots in particles.items()]
+    rows += [check(name, conservation_residuals(p, parent, daughters), event_index, conservation_tolerance)
+             for name, (parent, daughters) in decays.items()]
+    return rows
+
+
+def export_qa(rows, output_filename):
+    with open(os.path.join(output_dir, output_filename), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(dict(row, worst_events=" ".join(f"{i}:{r:.3g}" for i, r in row["worst_events"])))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    add_reader_arguments(parser)
+    args = parser.parse_args()
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    os.makedirs(output_dir, exist_ok=True)
+    rows = []
+    prefetcher = Prefetcher(lambda filename: read_branches(os.path.join(base_path, filename), roles=args.roles),
+                            discover_files(base_path))
+    for filename, branches, error in prefetcher:
+        if error is not None:
+            print(f"Error processing {filename}: {error}")
+            continue
+        for row in qa_file(branches):
+            rows.append(dict({"mass_point": file_label(filename)}, **row))
+            flag = "" if row["violations"] == 0 else f"  worst: {row['worst_events']}"
+            print(f"{file_label(filename)} {row['check']}: {row['violations']}/{row['checked_events']} "
+                  f"violations, max residual {row['max_residual']:.2e}{flag}")
+    if rows:
+        export_qa(rows, f"qa_kinematics_{args.campaign}.csv")
+        print(f"Saved qa_kinematics_{args.campaign}.csv")
@@ -0,0 +1,275 @@
+import os
+import time
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.lines import Line2D
+
+from hist_fill import bootstrap_band
+from samples import sample_colors
+
+# Drawing of the mass / pT / ΔR overlays of plot_all_mass_pT_dR.py from
+# histogram results (result_cache.histogram_results), so figures can be
+# re-rendered without touching event data.
+
+output_dir = "pic"
+
+# Output backends of save_figure:
+#   "pdf"       one vector PDF per figure (default)
+#   "multipage" all figures of the run as pages of bundle_filename
+#   "png"       PNG thumbnails in pic/thumbnails for quick browsing
+# rasterize: draw histograms / lines / markers as an embedded image (at
+# raster_dpi) while axes, labels and legends stay vector, which keeps PDFs
+# with many overlaid curves small and fast to open.
+output_backends = ["pdf"]
+rasterize = False
+raster_dpi = 150
+bundle_filename = "all_figures.pdf"
+thumbnail_dir = "thumbnails"
+thumbnail_dpi = 40
+backend_timings = {}
+bundle = None
+
+# 設置全局刻度字體大小
+plt.rcParams['xtick.labelsize'] = 20
+plt.rcParams['ytick.labelsize'] = 20
+
+# (observable, x label, y label font size) of each panel
+mass_panels = [
+    ("higgs_mass", "Higgs Mass (GeV)", 24),
+    ("alp_mass", "ALP Mass (GeV)", 24),
+    ("z_mass", "Z boson Mass (GeV)", 24),
+    ("electron_mass", "e Mass (MeV)", 24),
+    ("muon_mass", r"$\mu \ Mass (MeV)$", 24),
+    ("tau_mass", r"$\tau \ Mass (GeV)$", 18),
+    ("gamma_mass", r"$\gamma \ Mass (GeV)$", 24),
+]
+pt_panels = [
+    ("higgs_pt", "Higgs pT (GeV)", 24),
+    ("alp_pt", "ALP pT (GeV)", 24),
+    ("z_pt", "Z boson pT (GeV)", 24),
+    ("electron_pt", "e pT (GeV)", 24),
+    ("muon_pt", r"$\mu \ pT (GeV)$", 24),
+    ("tau_pt", r"$\tau \ pT (GeV)$", 24),
+    ("gamma_pt", r"$\gamma \ pT (GeV)$", 24),
+]
+dr_panels = [
+    ("gamma_dr", r"$\Delta R(\gamma1, \gamma2)$", 24),
+    ("electron_dr", r"$\Delta R(e1, e2)$", 24),
+    ("muon_dr", r"$\Delta R(\mu1, \mu2)$", 24),
+]
+gamma_zoom_panels = [
+    ("gamma_dr_zoom", r"$\Delta R(\gamma1, \gamma2)$", 24),
+]
+composite_panels = [
+    ("gg_mass", r"$m(\gamma\gamma)$ (GeV)", 24),
+    ("ll_mass", r"$m(\ell\ell)$ (GeV)", 24),
+    ("llgg_mass", r"$m(\ell\ell\gamma\gamma)$ (GeV)", 24),
+    ("gg_mass_residual", r"$m(\gamma\gamma) - m_{a}$ (GeV)", 24),
+    ("ll_mass_residual", r"$m(\ell\ell) - m_{Z}$ (GeV)", 24),
+    ("llgg_mass_residual", r"$m(\ell\ell\gamma\gamma) - m_{H}$ (GeV)", 24),
+]
+boost_panels = [
+    ("higgs_gamma_factor", r"Higgs $\gamma = E/m$", 24),
+    ("z_gamma_factor", r"Z boson $\gamma = E/m$", 24),
+    ("alp_log_gamma_factor", r"ALP $\log_{10}\gamma$", 24),
+    ("alp_cos_theta_star", r"$\cos\theta^{*}_{a}$ (H frame)", 24),
+    ("gamma_cos_theta_star", r"$\cos\theta^{*}_{\gamma}$ (a frame)", 24),
+    ("lepton_cos_theta_star", r"$\cos\theta^{*}_{\ell}$ (Z frame)", 24),
+    ("gamma_dr_scaled", r"$\Delta R(\gamma1, \gamma2) \cdot p_T^{a} / m_{a}$", 24),
+]
+fastsim_panels = [
+    ("smeared_gamma_pt", r"smeared $\gamma$ pT (GeV)", 24),
+    ("smeared_gamma_dr", r"smeared $\Delta R(\gamma1, \gamma2)$ (resolved)", 24),
+    ("smeared_gg_mass", r"smeared $m(\gamma\gamma)$ (GeV)", 24),
+    ("smeared_ll_mass", r"smeared $m(\ell\ell)$ (GeV)", 24),
+    ("smeared_llgg_mass", r"smeared $m(\ell\ell\gamma\gamma)$ (GeV)", 24),
+    ("reco_photons", r"reconstructed $\gamma$ (1 = merged)", 24),
+]
+particle_labels = {"higgs": "Higgs", "alp": "ALP", "z": "Z boson", "lepton": r"$\ell$", "gamma": r"$\gamma$"}
+angular_panels = [
+    (f"{particle}_{quantity}", f"{label} {symbol}", 24)
+    for quantity, symbol in (("eta", r"$\eta$"), ("phi", r"$\phi$"), ("rapidity", "$y$"))
+    for particle, label in particle_labels.items()
+]
+
+
+def figure_filenames(mass_output_filename, pt_output_filename, dr_output_filename):
+    # Figure name -> output file of one mass-point group
+    return {
+        "mass": mass_output_filename,
+        "pt": pt_output_filename,
+        "dr": dr_output_filename,
+        "gamma_zoom": dr_output_filename.replace(".pdf", "_gamma_zoom.pdf"),
+        "composite": mass_output_filename.replace("mass_distributions", "composite_distributions"),
+        "angular": mass_output_filename.replace("mass_distributions", "angular_distributions"),
+        "boost": mass_output_filename.replace("mass_distributions", "boost_distributions"),
+    }
+
+
+def save_figure(fig, output_filename):
+    global bundle
+    if rasterize:
+        for ax in fig.axes:
+            for artist in list(ax.patches) + list(ax.lines) + list(ax.collections):
+                artist.set_rasterized(True)
+    dpi = {"dpi": raster_dpi} if rasterize else {}
+    for backend in output_backends:
+        start = time.perf_counter()
+        if backend == "pdf":
+            fig.savefig(os.path.join(output_dir, output_filename), **dpi)
+        elif backend == "multipage":
+            if bundle is None:
+                bundle = PdfPages(os.path.join(output_dir, bundle_filename))
+            bundle.savefig(fig, **dpi)
+        elif backend == "png":
+            os.makedirs(os.path.join(output_dir, thumbnail_dir), exist_ok=True)
+            fig.savefig(os.path.join(output_dir, thumbnail_dir, os.path.splitext(output_filename)[0] + ".png"),
+                        dpi=thumbnail_dpi)
+        else:
+            raise ValueError(f"Unknown output backend {backend}")
+        timing = backend_timings.setdefault(backend, [0, 0.0])
+        timing[0] += 1
+        timing[1] += time.perf_counter() - start
+
+
+def finish_output():
+    # Close the multi-page bundle and report the time spent in every backend
+    global bundle
+    if bundle is not None:
+        start = time.perf_counter()
+        bundle.close()
+        backend_timings["multipage"][1] += time.perf_counter() - start
+        print(f"Saved {os.path.join(output_dir, bundle_filename)}")
+        bundle = None
+    for backend, (n_figures, seconds) in backend_timings.items():
+        print(f"Output {backend}{' (rasterized)' if rasterize else ''}: {n_figures} figures in {seconds:.2f} s")
+
+
+def add_output_arguments(parser):
+    parser.add_argument("--output", default=",".join(output_backends),
+                        help="comma separated output backends: pdf, multipage, png")
+    parser.add_argument("--rasterize", action="store_true", help="rasterize the plot contents, keep text as vectors")
+    parser.add_argument("--bundle", default=bundle_filename, help="file name of the multi-page PDF")
+
+
+def configure_output(args):
+    global output_backends, rasterize, bundle_filename
+    output_backends = args.output.split(",")
+    rasterize = args.rasterize
+    bundle_filename = args.bundle
+
+
+def draw_overlay(ax, hist, xlabel, ylabel_fontsize=24):
+    # Normalised step histogram of every mass point ("A.U.")
+    edges = hist["edges"]
+    handles = []
+    colors = sample_colors(len(hist["counts"]))
+    for i, (label, counts) in enumerate(hist["counts"].items()):
+        # In-range entries: density=True divides by counts.sum()
+        if counts.sum() > 0:
+            ax.hist(edges[:-1], bins=edges, weights=counts, histtype='step', density=True, color=colors[i], linewidth=2.0)
+            if label in hist.get("replicas", {}):
+                # Poisson-bootstrap band (bootstrap.py)
+                low, high = bootstrap_band(np.asarray(hist["replicas"][label], dtype=float), edges)
+                ax.fill_between(edges, np.append(low, low[-1]), np.append(high, high[-1]), step="post",
+                                color=colors[i], alpha=0.25, linewidth=0)
+            handles.append(Line2D([0], [0], color=colors[i], linewidth=2.0, label=label))
+    ax.set_xlabel(xlabel, fontsize=24)
+    ax.set_ylabel("A.U.", fontsize=ylabel_fontsize)
+    ax.legend(handles=handles, fontsize=14, handlelength=2, ncol=2)
+
+
+# Figure -> (panels, subplot rows, columns, figure size)
+figure_layouts = {
+    "mass": (mass_panels, 3, 3, (24, 18)),
+    "pt": (pt_panels, 3, 3, (24, 18)),
+    "dr": (dr_panels, 1, 3, (24, 6)),
+    "gamma_zoom": (gamma_zoom_panels, 1, 1, (8, 6)),
+    "composite": (composite_panels, 2, 3, (24, 12)),
+    "angular": (angular_panels, 3, 5, (40, 18)),
+    "boost": (boost_panels, 3, 3, (24, 18)),
+    "fastsim": (fastsim_panels, 2, 3, (24, 12)),
+}
+
+
+def render_figure(results, figure, output_filename):
+    panels, nrows, ncols, figsize = figure_layouts[figure]
+    fig, axes = plt.subplots(nrows, ncols, figsize=figsize)
+    axes = np.atleast_1d(axes).flatten()
+    for ax, (name, xlabel, ylabel_fontsize) in zip(axes, panels):
+        draw_overlay(ax, results[name], xlabel, ylabel_fontsize)
+    # 移除空白子圖
+    for ax in axes[len(panels):]:
+        ax.axis('off')
+    plt.figure(fig.number)
+    plt.tight_layout()
+    save_figure(fig, output_filename)
+    plt.close(fig)
+
+
+def render_group(results, filenames):
+    # filenames: figure_filenames(...) of the group
+    os.makedirs(output_dir, exist_ok=True)
+    for figure, output_filename in filenames.items():
+        # Skip figures whose observables were not produced (e.g. older caches)
+        if all(name in results for name, _, _ in figure_layouts[figure][0]):
+            render_figure(results, figure, output_filename)
+
+
+# ΔR(γγ) cut efficiency and ΔR range proportions of plot_dR_effi.py
+dr_range_labels = ["ΔR ≤ 0.1", "0.1 < ΔR ≤ 0.3", "ΔR > 0.3"]
+
+
+def render_efficiency_curve(hist, output_filename):
+    # Efficiency = events remaining after the cut / valid events, from the ΔR histogram
+    edges = hist["edges"]
+    colors = sample_colors(len(hist["counts"]))
+    plt.figure(figsize=(10, 6))
+    handles = []
+    for i, (label, counts) in enumerate(hist["counts"].items()):
+        total_valid = hist["entries"].get(label, 0)
+        if total_valid > 0:
+            events_remaining = total_valid - np.cumsum(counts)  # Events remaining after cut
+            efficiency = events_remaining / total_valid
+            # Prepend point at ΔR = 0 with efficiency = 1
+            plot_x = np.concatenate(([0], edges[1:]))
+            plot_y = np.concatenate(([1], efficiency))
+            plt.plot(plot_x, plot_y, marker='o', linestyle='-', color=colors[i], linewidth=2.0, markersize=6)
+            handles.append(Line2D([0], [0], color=colors[i], linewidth=2.0, marker='o', markersize=6, label=label))
+    plt.xlabel(r"$\Delta R(\gamma_1, \gamma_2)$ Cut", fontsize=24)
+    plt.ylabel("Efficiency", fontsize=24)
+    plt.legend(handles=handles, fontsize=14, ncol=2)
+    plt.grid(True)
+    plt.tight_layout()
+    save_figure(plt.gcf(), output_filename)
+    plt.close()
+
+
+def render_range_proportions(hist, output_filename):
+    labels = list(hist["counts"])
+    proportions = np.array([hist["counts"][label] / hist["entries"][label] if hist["entries"].get(label, 0) > 0
+                            else np.zeros(len(dr_range_labels)) for label in labels]).T  # [range, file]
+    colors = sample_colors(len(dr_range_labels))
+    fig, ax = plt.subplots(figsize=(12, 6))
+    x = np.arange(len(labels))
+    width = 0.25
+    for i, (props, label) in enumerate(zip(proportions, dr_range_labels)):
+        ax.bar(x + i * width, props, width, label=label, color=colors[i])
+    ax.set_xlabel("ALP Mass (GeV)", fontsize=24)
+    ax.set_ylabel("Proportion", fontsize=24)
+    ax.set_xticks(x + width)
+    ax.set_xticklabels(labels, rotation=45)
+    ax.legend(fontsize=14)
+    plt.tight_layout()
+    save_figure(plt.gcf(), output_filename)
+    plt.close()
+
+
+def render_efficiency(results, filenames):
+    # filenames: {"efficiency", "efficiency_extended", "bins"} output files of the group
+    os.makedirs(output_dir, exist_ok=True)
+    render_efficiency_curve(results["gamma_dr_effi"], filenames["efficiency"])
+    render_efficiency_curve(results["gamma_dr_effi_extended"], filenames["efficiency_extended"])
+    render_range_proportions(results["gamma_dr_ranges"], filenames["bins"])
@@ -0,0 +1,96 @@
+import argparse
+import glob
+import os
+import time
+
+from acceptance import load_maps, plot_acceptance
+from fastsim import plot_merged_fraction
+from hist2d import load_histograms, pair_specs, plot_pair
+from plot_systematics import plot_envelopes
+from render import (add_output_arguments, configure_output, figure_filenames, finish_output, render_efficiency,
+                    render_group)
+from result_cache import cache_dir, cache_formats, cache_path, find_cache, load_results
+from samples import groups
+
+# Plot-only mode: rebuild the figures in pic/ from the histogram caches
+# written by plot_all_mass_pT_dR.py, plot_dR_effi.py, plot_systematics.py,
+# bootstrap.py, cutflow.py, hist2d.py, acceptance.py and fastsim.py, without
+# reading any event data.
+# Use it after changing styles (rcParams, legends, axis labels) in render.py.
+
+
+def cutflow_stages(campaign, group, directory, formats):
+    # Histogram stages cached by cutflow.py: preselection, selected and the N-1 stages no_<cut>
+    # (found by name, as the cuts can come from a --cuts file)
+    stages = set()
+    for fmt in formats:
+        for path in glob.glob(cache_path(campaign, f"{group}_no_*", directory, fmt)):
+            stages.add(os.path.splitext(os.path.basename(path))[0][len(group) + 1:])
+    return ["preselection", "selected"] + sorted(stages)
+
+
+def replot(campaign, directory=cache_dir, formats=cache_formats):
+    for group in groups:
+        path = find_cache(campaign, group, directory, formats)
+        if path is not None:
+            start = time.perf_counter()
+            results, _ = load_results(path)
+            render_group(results, figure_filenames(f"mass_distributions_{group}.pdf", f"pt_distributions_{group}.pdf",
+                                                   f"dr_distributions_{group}.pdf"))
+            print(f"Re-rendered {group} from {path} in {time.perf_counter() - start:.2f} s")
+        path = find_cache(campaign, f"{group}_effi", directory, formats)
+        if path is not None:
+            results, _ = load_results(path)
+            render_efficiency(results, {"efficiency": f"gamma_dr_efficiency_{group}.pdf",
+                                        "efficiency_extended": f"gamma_dr_efficiency_extended_{group}.pdf",
+                                        "bins": f"gamma_dr_bins_{group}.pdf"})
+            print(f"Re-rendered ΔR efficiency of {group} from {path}")
+        path = find_cache(campaign, f"{group}_weighted", directory, formats)
+        if path is not None:
+            results, _ = load_results(path)
+            plot_envelopes(results, f"syst_envelope_{group}.pdf")
+            print(f"Re-rendered weight envelopes of {group} from {path}")
+        path = find_cache(campaign, f"{group}_bootstrap", directory, formats)
+        if path is not None:
+            results, _ = load_results(path)
+            render_group(results, figure_filenames(f"mass_distributions_{group}_bootstrap.pdf",
+                                                   f"pt_distributions_{group}_bootstrap.pdf",
+                                                   f"dr_distributions_{group}_bootstrap.pdf"))
+            print(f"Re-rendered bootstrap bands of {group} from {path}")
+        for stage in cutflow_stages(campaign, group, directory, formats):
+            path = find_cache(campaign, f"{group}_{stage}", directory, formats)
+            if path is not None:
+                results, _ = load_results(path)
+                render_group(results, figure_filenames(f"mass_distributions_{group}_{stage}.pdf",
+                                                       f"pt_distributions_{group}_{stage}.pdf",
+                                                       f"dr_distributions_{group}_{stage}.pdf"))
+                print(f"Re-rendered cut-flow stage {stage} of {group} from {path}")
+        path = find_cache(campaign, f"{group}_hist2d", directory, ["json"])
+        if path is not None:
+            histograms_by_label = load_histograms(path)
+            for name in pair_specs:
+                plot_pair(histograms_by_label, name, f"hist2d_{name}_{group}.pdf")
+            print(f"Re-rendered 2D histograms of {group} from {path}")
+        path = find_cache(campaign, f"{group}_acceptance", directory, ["json"])
+        if path is not None:
+            plot_acceptance(load_maps(path), f"acceptance_{group}.pdf")
+            print(f"Re-rendered acceptance maps of {group} from {path}")
+        path = find_cache(campaign, f"{group}_fastsim", directory, formats)
+        if path is not None:
+            results, _ = load_results(path)
+            render_group(results, {"fastsim": f"fastsim_distributions_{group}.pdf"})
+            plot_merged_fraction(results, f"fastsim_merged_fraction_{group}.pdf")
+            print(f"Re-rendered fast simulation of {group} from {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--cache-dir", default=cache_dir)
+    parser.add_argument("--format", choices=cache_formats, default=None,
+                        help="only use caches of this format (default: the first one found)")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    configure_output(args)
+    replot(args.campaign, args.cache_dir, [args.format] if args.format else cache_formats)
+    finish_output()
@@ -0,0 +1,186 @@
+import json
+import os
+
+import numpy as np
+import uproot
+
+# Cached histogram results of one campaign / mass-point group.
+#
+# Layout of the .npz file:
+#   "<observable>/edges"   bin edges
+#   "<observable>/<label>" raw (unnormalised) bin counts of one mass point
+#   "<observable>/<label>/variations" optional (n_bins, n_variations) weight-variation sums
+#   "<observable>/<label>/replicas"   optional (n_bins, n_replicas) bootstrap replica sums
+#   "__meta__"             JSON string with campaign, labels, entries per label, ...
+#
+# The same content can be stored as a ROOT file (one TH1 per observable and
+# label, metadata as a JSON TObjString) or as HDF5; save_results and
+# load_results choose the format from the file extension.
+cache_dir = "cache"
+cache_format = "npz"  # "npz", "root" or "h5"
+cache_formats = ("npz", "root", "h5")  # looked up in this order by find_cache
+matrix_keys = ["variations", "replicas"]  # optional (n_bins, n_columns) matrices per label
+
+
+def cache_path(campaign, group, directory=cache_dir, fmt=None):
+    return os.path.join(directory, campaign, f"{group}.{fmt or cache_format}")
+
+
+def find_cache(campaign, name, directory=cache_dir, formats=cache_formats):
+    # First existing cache file of the given formats, None if there is none
+    for fmt in formats:
+        path = cache_path(campaign, name, directory, fmt)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def histogram_results(observables, labels, specs):
+    # observables: {name: [values of label 0, values of label 1, ...]}
+    # specs:       {name: (bins, range)}
+    results = {}
+    for name, values_list in observables.items():
+        bins, hist_range = specs[name]
+        edges = np.linspace(hist_range[0], hist_range[1], bins + 1)
+        counts = {}
+        entries = {}
+        for label, values in zip(labels, values_list):
+            values = np.asarray(values, dtype=float)
+            values = values[np.isfinite(values)]
+            counts[label], _ = np.histogram(values, bins=edges)
+            entries[label] = int(len(values))
+        results[name] = {"edges": edges, "counts": counts, "entries": entries}
+    return results
+
+
+def save_results(path, results, meta=None):
+    # Format by extension: .npz (numpy), .root (TH1 / TH2 via uproot) or .h5 (h5py)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arrays = {}
+    entries = {}
+    for name, hist in results.items():
+        arrays[f"{name}/edges"] = np.asarray(hist["edges"])
+        for label, counts in hist["counts"].items():
+            arrays[f"{name}/{label}"] = np.asarray(counts)
+        for key in matrix_keys:
+            for label, matrix in hist.get(key, {}).items():
+                arrays[f"{name}/{label}/{key}"] = np.asarray(matrix)
+        entries[name] = hist.get("entries", {})
+    meta = dict(meta or {})
+    meta["observables"] = list(results)
+    meta.setdefault("labels", list(next(iter(results.values()))["counts"]) if results else [])
+    meta["entries"] = entries
+    if path.endswith(".root"):
+        save_root(path, results, meta)
+    elif path.endswith(".h5"):
+        save_hdf5(path, arrays, meta)
+    else:
+        arrays["__meta__"] = np.array(json.dumps(meta))
+        np.savez(path, **arrays)
+    print(f"Saved histogram cache: {path}")
+
+
+def store_key(key):
+    # ROOT / HDF5 objects cannot have children: "<obs>/<label>/variations" -> "<obs>/variations/<label>"
+    for matrix_key in matrix_keys:
+        if key.endswith(f"/{matrix_key}"):
+            name, label = key[:-len(matrix_key) - 1].split("/", 1)
+            return f"{name}/{matrix_key}/{label}"
+    return key
+
+
+def save_root(path, results, meta):
+    # One TH1 per observable and label (TH2 bins x variations / replicas), metadata as a JSON TObjString
+    meta = dict(meta, edges={name: np.asarray(hist["edges"]).tolist() for name, hist in results.items()})
+    with uproot.recreate(path) as file:
+        for name, hist in results.items():
+            edges = np.asarray(hist["edges"], dtype=float)
+            for label, counts in hist["counts"].items():
+                file[f"{name}/{label}"] = (np.asarray(counts, dtype=float), edges)
+            for key in matrix_keys:
+                for label, matrix in hist.get(key, {}).items():
+                    matrix = np.asarray(matrix, dtype=float)
+                    if matrix.shape[1] > 0:
+                        file[store_key(f"{name}/{label}/{key}")] = (matrix, edges, np.arange(matrix.shape[1] + 1.0))
+        file["__meta__"] = json.dumps(meta)
+
+
+def save_hdf5(path, arrays, meta):
+    import h5py  # optional, only needed for .h5 caches
+    with h5py.File(path, "w") as file:
+        for key, array in arrays.items():
+            file.create_dataset(store_key(key), data=array)
+        file.attrs["__meta__"] = json.dumps(meta)
+
+
+def load_results(path):
+    if path.endswith(".root"):
+        with uproot.open(path) as file:
+            meta = json.loads(str(file["__meta__"]))
+            keys = set(key.rsplit(";", 1)[0] for key in file.keys())
+            edges = meta.pop("edges")
+            return build_results(meta, lambda key: np.asarray(edges[key[:-len("/edges")]]) if key.endswith("/edges")
+                                 else file[store_key(key)].values(),
+                                 lambda key: key.endswith("/edges") or store_key(key) in keys), meta
+    if path.endswith(".h5"):
+        import h5py
+        with h5py.File(path, "r") as file:
+            meta = json.loads(file.attrs["__meta__"])
+            return build_results(meta, lambda key: file[store_key(key)][()], lambda key: store_key(key) in file), meta
+    with np.load(path) as data:
+        meta = json.loads(str(data["__meta__"]))
+        return build_results(meta, lambda key: data[key], lambda key: key in data.files), meta
+
+
+def build_results(meta, get, has):
+    # get(key) / has(key) with the .npz key layout described at the top
+    results = {}
+    for name in meta["observables"]:
+        prefix = f"{name}/"
+        counts = {
+            label: get(prefix + label)
+            for label in meta["labels"]
+            if has(prefix + label)
+        }
+        results[name] = {
+            "edges": get(f"{name}/edges"),
+            "counts": counts,
+            "entries": meta["entries"].get(name, {}),
+        }
+        for key in matrix_keys:
+            matrices = {
+                label: get(f"{prefix}{label}/{key}")
+                for label in counts
+                if has(f"{prefix}{label}/{key}")
+            }
+            if matrices:
+                results[name][key] = matrices
+    return results
+
+
+def merge_results(results_list):
+    # Combine results of different files / shards: new labels are added,
+    # counts of labels present in several inputs are summed
+    merged = {}
+    for results in results_list:
+        for name, hist in results.items():
+            if name not in merged:
+                merged[name] = {"edges": np.asarray(hist["edges"]), "counts": {}, "entries": {}}
+            target = merged[name]
+            if not np.array_equal(target["edges"], hist["edges"]):
+                raise ValueError(f"Cannot merge {name}: different binning")
+            for label, counts in hist["counts"].items():
+                if label in target["counts"]:
+                    target["counts"][label] = target["counts"][label] + counts
+                    target["entries"][label] = target["entries"].get(label, 0) + hist["entries"].get(label, 0)
+                else:
+                    target["counts"][label] = np.array(counts)
+                    target["entries"][label] = hist["entries"].get(label, 0)
+            for key in matrix_keys:
+                for label, matrix in hist.get(key, {}).items():
+                    target_matrices = target.setdefault(key, {})
+                    if label in target_matrices:
+                        target_matrices[label] = target_matrices[label] + matrix
+                    else:
+                        target_matrices[label] = np.array(matrix)
+    return merged
@@ -0,0 +1,137 @@
+import os
+import re
+
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+
+# Shared sample configuration of the plotting tools (file groups, colours, binning)
+
+eos_base = "/eos/home-p/pelai/HZa/ALP/gridpacks/check_LHE"
+
+
+def rootfile_dir(campaign):
+    return f"{eos_base}/{campaign}/rootfile"
+
+
+# 文件分組 (手動列表; discover_groups 由文件名自動生成, 按 mass_window 分組)
+groups = {
+    "ma_0p1_0p9": {
+        "files": [
+            "ALP_M0p1.root", "ALP_M0p2.root", "ALP_M0p3.root", "ALP_M0p4.root", "ALP_M0p5.root",
+            "ALP_M0p6.root", "ALP_M0p7.root", "ALP_M0p8.root", "ALP_M0p9.root"
+        ],
+        "ma_range": "0.1-0.9 GeV",
+        "alp_mass_range": (0, 1),
+        "mass_window": (0, 1),
+    },
+    "ma_1_30": {
+        "files": [
+            "ALP_M1.root", "ALP_M2.root", "ALP_M3.root", "ALP_M4.root", "ALP_M5.root",
+            "ALP_M6.root", "ALP_M7.root", "ALP_M8.root", "ALP_M9.root", "ALP_M10.root",
+            "ALP_M15.root", "ALP_M20.root", "ALP_M25.root", "ALP_M30.root"
+        ],
+        "ma_range": "1-30 GeV",
+        "alp_mass_range": (0, 35),
+        "mass_window": (1, np.inf),
+    },
+}
+
+# 超過 14 個樣本時改用 colormap (sample_colors)
+colors = [
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
+    '#aec7e8', '#ffbb78', '#98df8a', '#ff9896'
+]
+
+# 直方圖設定 (bins, range); ALP 質量範圍依分組而定 (alp_mass_range)
+hist_specs = {
+    "higgs_mass": (100, (120, 130)),
+    "z_mass": (25, (70, 110)),
+    "electron_mass": (100, (0.4, 0.6)),
+    "muon_mass": (100, (90, 120)),
+    "tau_mass": (100, (1.7, 1.9)),
+    "gamma_mass": (100, (0, 1)),
+    "higgs_pt": (25, (0, 200)),
+    "alp_pt": (25, (0, 50)),
+    "z_pt": (25, (0, 80)),
+    "electron_pt": (25, (0, 90)),
+    "muon_pt": (25, (0, 90)),
+    "tau_pt": (25, (0, 90)),
+    "gamma_pt": (25, (0, 30)),
+    "gamma_dr": (25, (0, 5)),
+    "electron_dr": (25, (0, 5)),
+    "muon_dr": (25, (0, 5)),
+    "gamma_dr_zoom": (25, (0, 1)),
+    # 粒子系統 (kinematics.py): 重建質量及與 LHE 中 Higgs / ALP / Z 質量之差
+    "ll_mass": (25, (70, 110)),
+    "llgg_mass": (100, (120, 130)),
+    "gg_mass_residual": (100, (-0.05, 0.05)),
+    "ll_mass_residual": (100, (-0.05, 0.05)),
+    "llgg_mass_residual": (100, (-0.05, 0.05)),
+}
+# 洛倫茲變換 (kinematics.boost_observables)
+hist_specs.update({
+    "higgs_gamma_factor": (50, (1, 1.5)),
+    "z_gamma_factor": (50, (1, 2)),
+    "alp_log_gamma_factor": (50, (0, 4)),
+    "alp_cos_theta_star": (40, (-1, 1)),
+    "gamma_cos_theta_star": (40, (-1, 1)),
+    "lepton_cos_theta_star": (40, (-1, 1)),
+    "gamma_dr_scaled": (50, (0, 10)),
+})
+for particle in ["higgs", "alp", "z", "lepton", "gamma"]:
+    hist_specs[f"{particle}_eta"] = (50, (-5, 5))
+    hist_specs[f"{particle}_phi"] = (50, (-np.pi, np.pi))
+    hist_specs[f"{particle}_rapidity"] = (50, (-5, 5))
+
+
+def observable_specs(alp_mass_range):
+    return dict(hist_specs, alp_mass=(100, alp_mass_range), gg_mass=(100, alp_mass_range))
+
+
+def file_label(filename):
+    return filename.replace("ALP_", "").replace(".root", "")
+
+
+# ALP_M<mass>.root, decimal point written as "p" (ALP_M0p1.root = 0.1 GeV)
+mass_pattern = re.compile(r"^ALP_M(\d+(?:p\d+)?)\.root$")
+
+
+def mass_from_filename(filename):
+    match = mass_pattern.match(os.path.basename(filename))
+    return float(match.group(1).replace("p", ".")) if match else None
+
+
+def mass_from_label(label):
+    return mass_from_filename(f"ALP_{label}.root")
+
+
+def discover_files(base_path):
+    # All ALP_M*.root files of base_path, sorted by ALP mass
+    files = [f for f in os.listdir(base_path) if mass_from_filename(f) is not None]
+    return sorted(files, key=mass_from_filename)
+
+
+def group_of_mass(mass):
+    for group, config in groups.items():
+        low, high = config["mass_window"]
+        if low <= mass < high:
+            return group
+    return None
+
+
+def discover_groups(base_path):
+    discovered = {group: [] for group in groups}
+    for filename in discover_files(base_path):
+        group = group_of_mass(mass_from_filename(filename))
+        if group is not None:
+            discovered[group].append(filename)
+    return discovered
+
+
+def sample_colors(n):
+    if n <= len(colors):
+        return colors[:n]
+    cmap = plt.get_cmap("viridis")
+    return [mcolors.to_hex(cmap(x)) for x in np.linspace(0, 1, n)]
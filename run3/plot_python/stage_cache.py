@@ -0,0 +1,144 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from samples import groups, rootfile_dir
+
+# Local staging cache for input files on EOS (or any other slow directory).
+#
+# Files are copied in parallel into a scratch directory, verified by size and
+# checksum, and reused as long as the source size / mtime are unchanged.
+# The least recently used files are evicted when the cache exceeds its budget.
+
+scratch_dir = os.path.join(os.environ.get("TMPDIR", "/tmp"), f"check_LHE_stage_{os.getuid()}")
+manifest_name = "manifest.json"
+chunk_size = 1 << 22
+
+
+def file_checksum(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_with_checksum(source, destination):
+    # Single read of the (slow) source; returns the checksum of the bytes read
+    digest = hashlib.sha1()
+    with open(source, "rb") as fin, open(destination, "wb") as fout:
+        for chunk in iter(lambda: fin.read(chunk_size), b""):
+            digest.update(chunk)
+            fout.write(chunk)
+    return digest.hexdigest()
+
+
+class StageCache:
+    def __init__(self, cache_dir=scratch_dir, budget_bytes=20 * 1024 ** 3, workers=8):
+        self.cache_dir = cache_dir
+        self.budget_bytes = budget_bytes
+        self.workers = workers
+        os.makedirs(cache_dir, exist_ok=True)
+        self.manifest_path = os.path.join(cache_dir, manifest_name)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def local_dir(self, source_dir):
+        # One local directory per source directory (same file names exist in every campaign)
+        key = hashlib.sha1(os.path.abspath(source_dir).encode()).hexdigest()[:12]
+        return os.path.join(self.cache_dir, key)
+
+    def local_path(self, source):
+        return os.path.join(self.local_dir(os.path.dirname(os.path.abspath(source))), os.path.basename(source))
+
+    def is_valid(self, source):
+        entry = self.manifest.get(os.path.abspath(source))
+        if entry is None or not os.path.exists(entry["local"]):
+            return False
+        stat = os.stat(source)
+        return (entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime
+                and os.path.getsize(entry["local"]) == stat.st_size)
+
+    def _copy(self, source):
+        # Copy to a temporary name and rename only after the checksum matched
+        local = self.local_path(source)
+        os.makedirs(os.path.dirname(local), exist_ok=True)
+        partial = f"{local}.part"
+        stat = os.stat(source)
+        start = time.time()
+        checksum = copy_with_checksum(source, partial)
+        if os.path.getsize(partial) != stat.st_size or checksum != file_checksum(partial):
+            os.remove(partial)
+            raise IOError(f"Staging of {source} failed validation")
+        os.replace(partial, local)
+        return os.path.abspath(source), {
+            "local": local, "size": stat.st_size, "mtime": stat.st_mtime,
+            "sha1": checksum, "last_used": time.time(), "copy_seconds": time.time() - start,
+        }
+
+    def stage(self, sources):
+        # Local paths of sources (same order); missing / stale files are copied in parallel
+        sources = [os.path.abspath(s) for s in sources]
+        to_copy = [s for s in sources if os.path.exists(s) and not self.is_valid(s)]
+        if to_copy:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for future in [pool.submit(self._copy, s) for s in to_copy]:
+                    try:
+                        key, entry = future.result()
+                        self.manifest[key] = entry
+                    except Exception as e:
+                        print(f"Warning: {e}")
+        local_paths = []
+        now = time.time()
+        for s in sources:
+            if s in self.manifest and self.is_valid(s):
+                self.manifest[s]["last_used"] = now
+                local_paths.append(self.manifest[s]["local"])
+            else:
+                local_paths.append(s)  # fall back to the source itself
+        self.evict(keep=set(sources))
+        self.save()
+        print(f"Staged {len(sources)} files ({len(to_copy)} copied) in {self.cache_dir}")
+        return local_paths
+
+    def stage_files(self, base_path, filenames):
+        # {filename: path to read}: the local copy, or base_path/filename itself where staging failed
+        return dict(zip(filenames, self.stage([os.path.join(base_path, f) for f in filenames])))
+
+    def evict(self, keep=()):
+        # Drop least recently used files until the cache fits in the budget
+        total = sum(entry["size"] for entry in self.manifest.values())
+        for source, entry in sorted(self.manifest.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.budget_bytes:
+                break
+            if source in keep:
+                continue
+            if os.path.exists(entry["local"]):
+                os.remove(entry["local"])
+            total -= entry["size"]
+            del self.manifest[source]
+
+    def save(self):
+        with open(f"{self.manifest_path}.tmp", "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="source directory (default: EOS path of the campaign)")
+    parser.add_argument("--cache-dir", default=scratch_dir)
+    parser.add_argument("--budget-gb", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    cache = StageCache(args.cache_dir, int(args.budget_gb * 1024 ** 3), args.workers)
+    sources = [os.path.join(base_path, f) for config in groups.values() for f in config["files"]]
+    for source, local in zip(sources, cache.stage(sources)):
+        print(f"{source} -> {local}")
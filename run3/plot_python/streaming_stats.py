@@ -0,0 +1,253 @@
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+import uproot
+
+from event_reader import add_reader_arguments, read_branches, tree_name
+from prefetch import Prefetcher, chunk_ranges
+from samples import discover_files, file_label, rootfile_dir
+from topology import extract_branches
+from validate import ValidationCache
+
+# Streaming per-observable summaries: running moments plus a mergeable quantile
+# sketch, filled chunk by chunk so raw values never have to be kept.
+#
+# The sketch is a DDSketch: values are counted in logarithmic buckets of
+# relative width 2·alpha, so every quantile is returned with relative error
+# below alpha, independently of the number of entries. Two sketches merge by
+# adding their bucket counts.
+
+output_dir = "pic"
+probabilities = [0.025, 0.16, 0.5, 0.84, 0.975]
+dr_cuts = [0.1, 0.2, 0.3, 0.4]
+
+
+def json_value(value):
+    # NaN / ±inf are not valid JSON: written as null
+    return float(value) if np.isfinite(value) else None
+
+
+class RunningMoments:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Σ (x - mean)²
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        other = RunningMoments()
+        other.count = len(values)
+        other.mean = values.mean()
+        other.m2 = np.sum((values - other.mean) ** 2)
+        other.min = values.min()
+        other.max = values.max()
+        self.merge(other)
+
+    def merge(self, other):
+        # Chan et al. pairwise combination of (count, mean, M2)
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def rms(self):
+        return np.sqrt(self.m2 / self.count) if self.count > 0 else np.nan
+
+    def to_dict(self):
+        # min / max of an empty summary (±inf) are written as null
+        return {"count": self.count, "mean": self.mean, "m2": self.m2,
+                "min": json_value(self.min), "max": json_value(self.max)}
+
+    @classmethod
+    def from_dict(cls, data):
+        moments = cls()
+        moments.count, moments.mean, moments.m2 = data["count"], data["mean"], data["m2"]
+        moments.min = np.inf if data["min"] is None else data["min"]
+        moments.max = -np.inf if data["max"] is None else data["max"]
+        return moments
+
+
+class QuantileSketch:
+    def __init__(self, alpha=0.01, min_value=1e-9):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = np.log(self.gamma)
+        self.min_value = min_value  # |x| below this counts as zero
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _add(self, store, magnitudes):
+        index, counts = np.unique(np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64), return_counts=True)
+        for i, c in zip(index.tolist(), counts.tolist()):
+            store[i] = store.get(i, 0) + c
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        self.count += len(values)
+        self.zero_count += int(np.sum(np.abs(values) < self.min_value))
+        self._add(self.positive, values[values >= self.min_value])
+        self._add(self.negative, -values[values <= -self.min_value])
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for i, c in other_store.items():
+                store[i] = store.get(i, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def _buckets(self):
+        # (representative value, count) in increasing value order
+        values = [-2 * self.gamma ** i / (self.gamma + 1) for i in sorted(self.negative, reverse=True)]
+        counts = [self.negative[i] for i in sorted(self.negative, reverse=True)]
+        values.append(0.0)
+        counts.append(self.zero_count)
+        values += [2 * self.gamma ** i / (self.gamma + 1) for i in sorted(self.positive)]
+        counts += [self.positive[i] for i in sorted(self.positive)]
+        return np.array(values), np.array(counts)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        values, counts = self._buckets()
+        rank = q * (self.count - 1)
+        return float(values[np.searchsorted(np.cumsum(counts), rank, side="right")])
+
+    def fraction_above(self, cut):
+        # Fraction of entries above cut (e.g. ΔR cut efficiency), up to the bucket width
+        if self.count == 0:
+            return np.nan
+        values, counts = self._buckets()
+        return float(counts[values > cut].sum() / self.count)
+
+    def to_dict(self):
+        return {"alpha": self.alpha, "min_value": self.min_value, "zero_count": self.zero_count, "count": self.count,
+                "positive": {str(i): c for i, c in self.positive.items()},
+                "negative": {str(i): c for i, c in self.negative.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["alpha"], data["min_value"])
+        sketch.zero_count, sketch.count = data["zero_count"], data["count"]
+        sketch.positive = {int(i): c for i, c in data["positive"].items()}
+        sketch.negative = {int(i): c for i, c in data["negative"].items()}
+        return sketch
+
+
+class ObservableSummary:
+    def __init__(self, alpha=0.01):
+        self.moments = RunningMoments()
+        self.sketch = QuantileSketch(alpha)
+
+    def update(self, values):
+        self.moments.update(values)
+        self.sketch.update(values)
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+
+    def row(self):
+        row = {"count": self.moments.count, "mean": self.moments.mean if self.moments.count else np.nan,
+               "rms": self.moments.rms, "min": self.moments.min, "max": self.moments.max}
+        for p in probabilities:
+            row[f"q{p}"] = self.sketch.quantile(p)
+        return row
+
+    def to_dict(self):
+        return {"moments": self.moments.to_dict(), "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        summary.moments = RunningMoments.from_dict(data["moments"])
+        summary.sketch = QuantileSketch.from_dict(data["sketch"])
+        return summary
+
+
+def summarize_file(file_path, chunk_size=100000, alpha=0.01, roles="fixed", validated=()):
+    # {observable: ObservableSummary} of one file, read in chunks of chunk_size events;
+    # validated: ValidationCache.validated_branches of the file
+    with uproot.open(file_path) as file:
+        n_entries = file[tree_name].num_entries
+    summaries = {}
+    prefetcher = Prefetcher(lambda r: read_branches(file_path, entry_start=r[0], entry_stop=r[1], roles=roles),
+                            chunk_ranges(n_entries, chunk_size))
+    for _, branches, error in prefetcher:
+        if error is not None:
+            raise error
+        observables, _ = extract_branches(branches, validated)
+        for name, (values, _) in observables.items():
+            summaries.setdefault(name, ObservableSummary(alpha)).update(values)
+    return summaries
+
+
+def summary_rows(summaries_by_label):
+    rows = []
+    for label, summaries in summaries_by_label.items():
+        for name, summary in summaries.items():
+            row = dict({"mass_point": label, "observable": name}, **summary.row())
+            if name == "gamma_dr":
+                for cut in dr_cuts:
+                    row[f"eff_dr_gt_{cut}"] = summary.sketch.fraction_above(cut)
+            rows.append(row)
+    return rows
+
+
+def export_summaries(summaries_by_label, stem):
+    rows = summary_rows(summaries_by_label)
+    fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+    with open(os.path.join(output_dir, f"{stem}.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    # JSON keeps the sketches, so summaries of different files / shards can be merged later
+    with open(os.path.join(output_dir, f"{stem}.json"), "w") as f:
+        json.dump({"rows": [{key: json_value(value) if isinstance(value, float) else value
+                             for key, value in row.items()} for row in rows],
+                   "sketches": {label: {name: s.to_dict() for name, s in summaries.items()}
+                                for label, summaries in summaries_by_label.items()}},
+                  f, default=float, allow_nan=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--alpha", type=float, default=0.01, help="relative accuracy of the quantiles")
+    add_reader_arguments(parser)
+    args = parser.parse_args()
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    os.makedirs(output_dir, exist_ok=True)
+    summaries_by_label = {}
+    validation = ValidationCache(args.campaign)
+    for filename in discover_files(base_path):
+        file_path = os.path.join(base_path, filename)
+        try:
+            summaries_by_label[file_label(filename)] = summarize_file(file_path, args.chunk_size, args.alpha,
+                                                                      args.roles, validation.validated_branches(file_path))
+            print(f"Summarised {filename}")
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+    validation.save()
+    export_summaries(summaries_by_label, f"summary_{args.campaign}")
+    print(f"Saved summary_{args.campaign}.csv and summary_{args.campaign}.json")
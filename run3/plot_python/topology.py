@@ -0,0 +1,113 @@
+import numpy as np
+
+from observables import (alp_slot, event_counts, extract_observables, gamma_slots, higgs_slot, lepton_slots, n_slots,
+                         observables_from_padded, pad_events, z_slot)
+
+# Particle roles resolved per event from the PDG id and mother index columns
+# of the LHE record, instead of the fixed instance positions (2 = Higgs,
+# 3 = ALP, 4 = Z, 5/6 = leptons, 7/8 = photons). The lookup works on the
+# padded (n_events, max_particles) arrays of a whole file or chunk and gives
+# a role -> particle index table, which is then used to rearrange any branch
+# into the fixed slot layout the observables are written for.
+
+pdgid_branch = "pdgid"
+mother_branch = "mother1"
+topology_branches = [pdgid_branch, mother_branch]
+mother_offset = 1  # LHE MOTHUP counts particles from 1, 0 = no mother
+
+higgs_pdgid, z_pdgid, gamma_pdgid = 25, 23, 22
+alp_pdgids = [36, 9000005]  # MadGraph ALP models use either
+lepton_pdgids = [11, 13, 15]
+
+roles = ["higgs", "alp", "z", "lepton1", "lepton2", "gamma1", "gamma2"]
+# Slot of each role in the fixed layout of observables.py
+role_slots = {
+    "higgs": higgs_slot, "alp": alp_slot, "z": z_slot,
+    "lepton1": lepton_slots[0], "lepton2": lepton_slots[1],
+    "gamma1": gamma_slots[0], "gamma2": gamma_slots[1],
+}
+missing = -1
+
+
+def nth_match(mask, n):
+    # Index of the n-th (0-based) True entry of every row, missing if there is none
+    rank = np.cumsum(mask, axis=1)
+    hit = mask & (rank == n + 1)
+    return np.where(hit.any(axis=1), hit.argmax(axis=1), missing)
+
+
+def take(padded, index):
+    # padded[i, index[i]] with NaN for missing indices
+    values = np.take_along_axis(padded, np.maximum(index, 0)[:, None], axis=1)[:, 0]
+    return np.where(index != missing, values, np.nan)
+
+
+def resolve_roles(pdgid, mother):
+    # pdgid, mother: (n_events, width) padded arrays (NaN beyond the event's particles)
+    # -> (n_events, len(roles)) particle indices, missing where a role is not found
+    n_events, width = pdgid.shape
+    table = np.full((n_events, len(roles)), missing, dtype=np.int64)
+    if n_events == 0 or width == 0:
+        return table
+    parent = np.nan_to_num(mother, nan=0).astype(np.int64) - mother_offset
+
+    def is_child_of(column):
+        return (parent == table[:, [column]]) & (table[:, [column]] != missing)
+
+    higgs, alp, z = roles.index("higgs"), roles.index("alp"), roles.index("z")
+    table[:, higgs] = nth_match(pdgid == higgs_pdgid, 0)
+    table[:, alp] = nth_match(np.isin(pdgid, alp_pdgids) & is_child_of(higgs), 0)
+    table[:, z] = nth_match((pdgid == z_pdgid) & is_child_of(higgs), 0)
+    is_lepton = np.isin(np.abs(pdgid), lepton_pdgids) & is_child_of(z)
+    is_photon = (pdgid == gamma_pdgid) & is_child_of(alp)
+    for k in range(2):
+        table[:, roles.index(f"lepton{k + 1}")] = nth_match(is_lepton, k)
+        table[:, roles.index(f"gamma{k + 1}")] = nth_match(is_photon, k)
+    return table
+
+
+def resolved_counts(table):
+    # Particle count in the fixed layout: 9 with both photons, 8 without the
+    # second one (the 8-particle events of the fixed-slot code), 0 if any
+    # other role is missing (the event is skipped)
+    complete = (table[:, :-1] != missing).all(axis=1)
+    return np.where(complete, np.where(table[:, -1] != missing, 9, 8), 0)
+
+
+def fixed_layout(padded, table):
+    # (n_events, n_slots) array with every role at its fixed slot, NaN elsewhere
+    layout = np.full((len(padded), n_slots), np.nan)
+    for column, role in enumerate(roles):
+        layout[:, role_slots[role]] = take(padded, table[:, column])
+    return layout
+
+
+def resolve_branches(branches, validated=()):
+    # branches: object arrays of tree[branch].array(library="np") including the
+    # pdgid and mother columns; validated as in observables.event_counts.
+    # -> (counts, consistent, {branch: (n_selected, n_slots)}) in the fixed layout
+    branch_counts, consistent = event_counts(branches, validated)
+    width = int(branch_counts.max()) if len(branch_counts) else 0
+    padded = {name: pad_events(array, branch_counts, consistent, width) for name, array in branches.items()}
+    table = resolve_roles(padded[pdgid_branch], padded[mother_branch])
+    counts = np.zeros(len(branch_counts), dtype=np.int64)
+    counts[consistent] = resolved_counts(table)
+    keep = counts[consistent] > 0
+    layouts = {name: fixed_layout(array[keep], table[keep]) for name, array in padded.items()
+               if name not in topology_branches}
+    return counts, consistent, layouts
+
+
+def extract_resolved(branches, validated=()):
+    # Same (observables, summary) as observables.extract_observables, with roles
+    # resolved from pdgid / mother1 instead of instance positions
+    counts, consistent, layouts = resolve_branches(branches, validated)
+    return observables_from_padded(counts, consistent, *(layouts[name] for name in ("mass", "px", "py", "pz")))
+
+
+def extract_branches(branches, validated=()):
+    # extract_resolved if the branches include the pdgid / mother columns, else the fixed slots
+    if pdgid_branch in branches:
+        return extract_resolved(branches, validated)
+    return extract_observables(branches["mass"], branches["px"], branches["py"], branches["pz"], branches["energy"],
+                               validated)
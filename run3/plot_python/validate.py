@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import awkward as ak
+import uproot
+
+from event_reader import kinematic_branches, tree_name
+from flat_store import source_stamp
+from result_cache import cache_dir
+from samples import discover_files, rootfile_dir
+
+# Whole-file consistency validation. The per-event counts of all kinematic
+# branches are compared as arrays (ak.num) in one step, values are checked for
+# NaN / inf, and multiplicities other than 8 / 9 particles are counted. The
+# verdict is cached per file with its size / mtime stamp, so a file is only
+# checked again when it changes.
+
+expected_multiplicities = [8, 9]
+
+
+def validation_path(campaign, directory=cache_dir):
+    return os.path.join(directory, campaign, "validation.json")
+
+
+def validate_file(file_path, branches=kinematic_branches):
+    with uproot.open(file_path) as file:
+        arrays = file[tree_name].arrays(branches, library="ak")
+    counts = {branch: ak.to_numpy(ak.num(arrays[branch])) for branch in branches}
+    reference = counts[branches[0]]
+    mismatched = np.zeros(len(reference), dtype=bool)
+    for branch in branches[1:]:
+        mismatched |= counts[branch] != reference
+    unexpected = ~mismatched & ~np.isin(reference, expected_multiplicities)
+    non_finite = {}
+    for branch in branches:
+        bad = ~np.isfinite(ak.to_numpy(ak.flatten(arrays[branch])))
+        if bad.any():
+            # Events containing at least one non-finite value
+            event = np.repeat(np.arange(len(reference)), counts[branch])
+            non_finite[branch] = int(len(np.unique(event[bad])))
+    multiplicities, n = np.unique(reference[~mismatched], return_counts=True)
+    verdict = {
+        "events": int(len(reference)),
+        "mismatched_events": int(mismatched.sum()),
+        "unexpected_multiplicity_events": int(unexpected.sum()),
+        "multiplicities": {str(m): int(c) for m, c in zip(multiplicities, n)},
+        "non_finite_events": non_finite,
+        "first_bad_events": np.flatnonzero(mismatched | unexpected)[:10].tolist(),
+    }
+    verdict["clean"] = not (verdict["mismatched_events"] or verdict["unexpected_multiplicity_events"] or non_finite)
+    return verdict
+
+
+class ValidationCache:
+    def __init__(self, campaign, directory=cache_dir):
+        self.path = validation_path(campaign, directory)
+        self.verdicts = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.verdicts = json.load(f)
+
+    def verdict(self, file_path):
+        # Cached verdict if the file is unchanged, otherwise validate it again
+        stamp = source_stamp(file_path)
+        cached = self.verdicts.get(stamp["path"])
+        if cached is not None and cached["stamp"] == stamp:
+            return cached["verdict"]
+        verdict = validate_file(file_path)
+        self.verdicts[stamp["path"]] = {"stamp": stamp, "verdict": verdict}
+        return verdict
+
+    def validated_branches(self, file_path):
+        # Branches whose per-event lengths are known to agree, for the validated argument of
+        # observables.event_counts: the kinematic branches of a clean file, none otherwise
+        return kinematic_branches if self.verdict(file_path)["clean"] else []
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.verdicts, f, indent=1)
+
+
+def describe(filename, verdict):
+    if verdict["clean"]:
+        return f"{filename}: clean, {verdict['events']} events {verdict['multiplicities']}"
+    problems = []
+    if verdict["mismatched_events"]:
+        problems.append(f"{verdict['mismatched_events']} with mismatched branch lengths")
+    if verdict["unexpected_multiplicity_events"]:
+        problems.append(f"{verdict['unexpected_multiplicity_events']} without 8 or 9 particles")
+    for branch, n in verdict["non_finite_events"].items():
+        problems.append(f"{n} with NaN/inf {branch}")
+    return f"{filename}: {verdict['events']} events, " + ", ".join(problems) + f" (first: {verdict['first_bad_events']})"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    args = parser.parse_args()
+    base_path = args.base_path or rootfile_dir(args.campaign)
+    cache = ValidationCache(args.campaign)
+    for filename in discover_files(base_path):
+        try:
+            print(describe(filename, cache.verdict(os.path.join(base_path, filename))))
+        except Exception as e:
+            print(f"Error validating {filename}: {e}")
+    cache.save()
@@ -0,0 +1,131 @@
+import argparse
+import os
+import time
+
+import uproot
+
+from event_reader import add_reader_arguments, read_branches, tree_name
+from kinematics import event_observables
+from render import figure_filenames, render_group
+from result_cache import cache_dir, cache_path, histogram_results, load_results, merge_results, save_results
+from samples import file_label, group_of_mass, groups, mass_from_filename, mass_from_label, observable_specs, rootfile_dir
+from validate import ValidationCache, describe
+
+# Watch mode: poll the rootfile directory while 2_convert_LHEfile2rootfile.sh
+# is still writing ALP_M*.root files. Every new or modified file is processed
+# once it is complete, its histograms are cached per file, and only the
+# figures of the group containing it are re-rendered.
+
+poll_seconds = 30
+settle_polls = 2  # polls with unchanged size / mtime before a file counts as complete
+
+
+def file_cache_path(campaign, group, filename):
+    return os.path.join(cache_dir, campaign, "files", group, f"{file_label(filename)}.npz")
+
+
+def is_readable(file_path):
+    try:
+        with uproot.open(file_path) as file:
+            return file[tree_name].num_entries > 0
+    except Exception:
+        return False
+
+
+def process_file(file_path, filename, group, campaign, roles="fixed", validated=()):
+    # validated: ValidationCache.validated_branches of the file
+    config = groups[group]
+    branches = read_branches(file_path, roles=roles)
+    observables, summary = event_observables(branches, validated)
+    specs = observable_specs(config["alp_mass_range"])
+    results = histogram_results({name: [observables[name][0]] for name in specs}, [file_label(filename)], specs)
+    save_results(file_cache_path(campaign, group, filename), results, meta=dict(summary, campaign=campaign, group=group))
+    print(f"Processed {filename}: {summary['total_events']} events")
+
+
+def update_group(group, campaign):
+    # Merge the per-file caches (in the group's file order) and re-render the group's figures
+    config = groups[group]
+    directory = os.path.dirname(file_cache_path(campaign, group, "ALP_M0.root"))
+    labels = sorted((f[:-len(".npz")] for f in os.listdir(directory) if f.endswith(".npz")), key=mass_from_label)
+    results = merge_results([load_results(os.path.join(directory, f"{label}.npz"))[0] for label in labels])
+    if not results:
+        return
+    save_results(cache_path(campaign, group), results, meta={"campaign": campaign, "group": group, "ma_range": config["ma_range"]})
+    render_group(results, figure_filenames(f"mass_distributions_{group}.pdf", f"pt_distributions_{group}.pdf",
+                                           f"dr_distributions_{group}.pdf"))
+    print(f"Re-rendered figures of {group}")
+
+
+def file_groups(filename):
+    mass = mass_from_filename(filename)
+    group = group_of_mass(mass) if mass is not None else None
+    return [group] if group is not None else []
+
+
+def watch(base_path, campaign, once=False, roles="fixed"):
+    seen = {}       # filename -> (size, mtime) at the previous poll
+    stable = {}     # filename -> number of polls without change
+    processed = {}  # filename -> (size, mtime) that was processed
+    validation = ValidationCache(campaign)
+    # Files already cached from a previous session count as processed
+    for filename in os.listdir(base_path):
+        for group in file_groups(filename):
+            path = os.path.join(base_path, filename)
+            if os.path.exists(file_cache_path(campaign, group, filename)) and os.path.exists(path):
+                cached = os.path.getmtime(file_cache_path(campaign, group, filename))
+                if cached >= os.path.getmtime(path):
+                    processed[filename] = (os.path.getsize(path), os.path.getmtime(path))
+    while True:
+        affected = set()
+        for filename in sorted(os.listdir(base_path)):
+            if mass_from_filename(filename) is None:
+                continue
+            path = os.path.join(base_path, filename)
+            stat = os.stat(path)
+            stamp = (stat.st_size, stat.st_mtime)
+            stable[filename] = stable.get(filename, 0) + 1 if seen.get(filename) == stamp else 0
+            seen[filename] = stamp
+            if processed.get(filename) == stamp:
+                continue
+            if not once and stable[filename] < settle_polls:
+                continue
+            if not is_readable(path):
+                continue
+            if not file_groups(filename):
+                print(f"Warning: {filename} is not in any file group, skipping.")
+                processed[filename] = stamp
+                continue
+            validated = []
+            try:
+                verdict = validation.verdict(path)
+                if not verdict["clean"]:
+                    print(f"Warning: {describe(filename, verdict)}")
+                validated = validation.validated_branches(path)
+            except Exception as e:
+                print(f"Error validating {filename}: {e}")
+            for group in file_groups(filename):
+                try:
+                    process_file(path, filename, group, campaign, roles, validated)
+                    affected.add(group)
+                except Exception as e:
+                    print(f"Error processing {filename}: {e}")
+            processed[filename] = stamp
+        validation.save()
+        for group in sorted(affected):
+            update_group(group, campaign)
+        if once:
+            break
+        time.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaign", default="run3")
+    parser.add_argument("--base-path", default=None, help="rootfile directory (default: EOS path of the campaign)")
+    parser.add_argument("--poll", type=float, default=poll_seconds, help="seconds between directory scans")
+    parser.add_argument("--once", action="store_true", help="process the files present now and exit")
+    add_reader_arguments(parser)
+    args = parser.parse_args()
+    poll_seconds = args.poll
+    watch(args.base_path or rootfile_dir(args.campaign), args.campaign, args.once, args.roles)